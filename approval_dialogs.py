@@ -0,0 +1,57 @@
+from tkinter import messagebox
+
+
+def show_order_approval(order_id, result, retry):
+    """Tell the user how an OrderService.approve_order job went.
+
+    `result` is the job's (outcome, detail). For a cancelled order the user
+    is asked whether to approve anyway; on yes, retry() is called to queue
+    the job again with allow_cancelled=True. Returns False in that case, so
+    the caller skips its refresh until the retried job reports back, and
+    True otherwise.
+    """
+    outcome, detail = result
+    if outcome == 'approved':
+        messagebox.showinfo("Success", f"Order ID: {order_id} Approved!")
+    elif outcome == 'not_found':
+        messagebox.showerror("Not Found", f"Order ID: {order_id} cannot be found")
+    elif outcome == 'product_not_approved':
+        prod_id, prod_status = detail
+        if prod_status == "Pending":
+            messagebox.showinfo("Pending Product", f"Order ID: {order_id}, Product ID {prod_id} Status: {prod_status}")
+        else:
+            messagebox.showwarning("Cancelled Product", f"Order ID: {order_id}, Product ID {prod_id} Status: {prod_status}")
+    elif outcome == 'already_approved':
+        messagebox.showinfo("Already Approved", f"Order ID: {order_id} has been already approved.")
+    elif outcome == 'cancelled':
+        if messagebox.askyesno('Order Cancelled', 'Order has been cancelled. Do you want to approve?'):
+            retry()
+            return False
+    elif outcome == 'insufficient':
+        messagebox.showerror("Insufficient Materials", "Order cannot be approved:\n" + "\n".join(detail))
+    elif outcome == 'status_changed':
+        messagebox.showwarning("Order Changed", f"Order ID: {order_id} is now {detail or 'deleted'} and was not approved.")
+    else:
+        messagebox.showerror('Error', f'Order ID: {order_id} has no materials recorded')
+    return True
+
+
+def show_product_approval(prod_id, result):
+    """Tell the user how a ProductService.approve_product job went.
+
+    `result` is the job's (outcome, detail), where detail is the product
+    name, or the list of shortages for 'insufficient'.
+    """
+    outcome, detail = result
+    if outcome == 'approved':
+        messagebox.showinfo("Success", f"✅ Approved product {detail} (ID: {prod_id}) successfully!")
+    elif outcome == 'not_found':
+        messagebox.showerror("Error", f"Product ID {prod_id} not found in the database.")
+    elif outcome == 'already_approved':
+        messagebox.showinfo("Info", f"Product {detail} (ID: {prod_id}) has been already approved.")
+    elif outcome == 'no_materials':
+        messagebox.showerror("Error", f"Product {detail} (ID: {prod_id}) has no materials recorded.")
+    else:
+        messagebox.showerror("Insufficient Materials",
+                             f"❌ Cannot approve product ID: {prod_id} due to:\n\n" +
+                             "\n".join(f"- {item}" for item in detail))
@@ -0,0 +1,80 @@
+"""Per-change cost of the incremental JSON exports versus a full rebuild.
+
+Builds throwaway databases of increasing size, then times a full rebuild
+and an incremental refresh after changing a single order, checking that
+each patched file is identical to a rebuild. Judge the change on the
+refresh total: the output is one JSON list, so every refresh still
+rewrites the whole file and its cost grows with the table. The query
+and serialize share is reported separately. Run from the repository
+root:
+
+    python benchmarks/bench_exports.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import connect
+from exports import IncrementalJsonExport, load_order_totals
+
+
+def build_database(path, n_orders):
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE orders (order_id INTEGER PRIMARY KEY, order_name TEXT, product_id TEXT,
+                    client_id TEXT, quantity INTEGER, order_date TEXT, deadline TEXT, mats_need TEXT, status_quo TEXT)''')
+    conn.execute('CREATE TABLE products (product_id TEXT PRIMARY KEY, product_name TEXT, materials TEXT, created_date TEXT, status_quo TEXT)')
+    conn.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     ((i, f'Order {i}', 'P1', 'C1', i % 50 + 1, '2024-01-01 00:00:00', '01/31/2024',
+                       json.dumps({'Steel': float(i % 7 + 1), 'Bolt': float(i % 13 + 1)}), 'Pending')
+                      for i in range(1, n_orders + 1)))
+    conn.commit()
+    conn.close()
+
+
+def run(sizes, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            database = os.path.join(tmp, f'bench_{n}.db')
+            path = os.path.join(tmp, f'order_mats_ttl_{n}.json')
+            build_database(database, n)
+            export = IncrementalJsonExport(database, path, 'orders', 'order_id', load_order_totals)
+            export.refresh()
+            full = export.last_timings['total']
+
+            patches = []
+            for i in range(repeat):
+                conn = connect(database)
+                conn.execute('UPDATE orders SET mats_need = ? WHERE order_id = ?',
+                             (json.dumps({'Steel': float(i)}), n // 2))
+                conn.commit()
+                conn.close()
+                export.refresh()
+                patches.append(export.last_timings)
+                with open(path) as f:
+                    patched = f.read()
+                export.rebuild()
+                with open(path) as f:
+                    assert f.read() == patched, "patched export differs from a full rebuild"
+
+            best = min(patches, key=lambda t: t['total'])
+            results.append({'orders': n, 'full_ms': full * 1000, 'refresh_ms': best['total'] * 1000,
+                            'query_ms': best['patch'] * 1000, 'write_ms': best['write'] * 1000})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'orders':>10} {'full ms':>10} {'refresh ms':>11} {'query ms':>10} {'write ms':>10}")
+    for row in run(args.sizes, args.repeat):
+        print(f"{row['orders']:>10} {row['full_ms']:>10.2f} {row['refresh_ms']:>11.2f} "
+              f"{row['query_ms']:>10.2f} {row['write_ms']:>10.2f}")
@@ -0,0 +1,98 @@
+"""MRP across every open order: vectorized plan versus checking orders one at a time.
+
+Generates a synth_db database per size, then times compute_mrp() (one
+pass of queries plus NumPy/pandas aggregation) against what finding the
+same shortfalls through the approval path costs: for each Pending order,
+read its materials (get_order_materials) and its stock (as
+reserve_materials does) and add them up in Python. Both must agree on
+demand per material. Run from the repository root:
+
+    python benchmarks/bench_mrp.py --orders 10000 100000 --materials 1000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from db_pool import connect, get_pool
+from inventory import _load_stock
+from mrp import compute_mrp, load_mrp_inputs, plan
+from order_materials import get_order_materials
+from synth_db import generate
+
+
+def per_order_demand(database):
+    conn = connect(database, readonly=True)
+    try:
+        demand = {}
+        stock = {}
+        c = conn.cursor()
+        for (order_id,) in conn.execute("SELECT order_id FROM orders WHERE status_quo = 'Pending'").fetchall():
+            mats_need = get_order_materials(conn, order_id)
+            stock.update((name, entry[1]) for name, entry in _load_stock(c, mats_need).items() if entry)
+            for name, qty in mats_need.items():
+                demand[name] = demand.get(name, 0.0) + float(qty)
+        return demand, {name: qty - stock.get(name, 0.0) for name, qty in demand.items() if qty > stock.get(name, 0.0)}
+    finally:
+        conn.close()
+
+
+def best_of(repeat, fn, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def run(sizes, materials, products, repeat):
+    results = []
+    for n_orders in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database = os.path.join(tmp, 'main.db')
+            generate(database, orders=n_orders, products=products, materials=materials)
+            try:
+                (legacy, legacy_short), legacy_s = best_of(repeat, per_order_demand, database)
+                result, total_s = best_of(repeat, compute_mrp, database)
+                conn = connect(database, readonly=True)
+                try:
+                    inputs, load_s = best_of(repeat, load_mrp_inputs, conn)
+                finally:
+                    conn.close()
+                _, plan_s = best_of(repeat, plan, *inputs)
+            finally:
+                get_pool(database).close_all()
+        demand = result.materials.set_index('mat_name')['demand']
+        assert all(abs(demand[name] - qty) < 1e-6 * max(1.0, qty) for name, qty in legacy.items())
+        assert set(legacy_short) == set(result.shortages()['mat_name'])
+        results.append({'orders': n_orders, 'materials': len(result.materials), 'lines': int(len(inputs[0])),
+                        'per_order_ms': legacy_s * 1000, 'mrp_ms': total_s * 1000, 'load_ms': load_s * 1000,
+                        'plan_ms': plan_s * 1000, 'short_materials': int(len(result.shortages())),
+                        'short_orders': len(result.short_orders)})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--materials', type=int, default=1000)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = run(args.orders, args.materials, args.products, args.repeat)
+    print(f"{'orders':>8} {'materials':>9} {'lines':>8} {'per-order':>11} {'mrp':>10} {'(load':>10} {'plan)':>9} {'short':>6}")
+    for r in results:
+        print(f"{r['orders']:>8} {r['materials']:>9} {r['lines']:>8} {r['per_order_ms']:>8.0f} ms {r['mrp_ms']:>7.0f} ms "
+              f"{r['load_ms']:>7.0f} ms {r['plan_ms']:>6.0f} ms {r['short_materials']:>6}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,114 @@
+"""Product list load time versus catalogue size: per-product creator lookups vs one bulk query.
+
+Builds throwaway databases with products, users and user_logs (a CREATE
+PRODUCT entry per product plus unrelated activity), then times fetching
+every product with its creator the old way (one creator query per product,
+as get_product_creator does) and with load_product_creators(). Run from
+the repository root:
+
+    python benchmarks/bench_product_list.py --sizes 500 2000 5000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from product_creators import UNKNOWN_CREATOR, ensure_creator_index, load_product_creators
+
+
+# Unrelated user_logs rows per product (logins, order actions, ...)
+NOISE_PER_PRODUCT = 4
+
+
+def build_database(path, n_products, n_users=25):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE products (product_id TEXT PRIMARY KEY, product_name TEXT, materials TEXT, created_date TEXT, status_quo TEXT)')
+    conn.execute('CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, f_name TEXT, usertype TEXT)')
+    conn.execute('CREATE TABLE user_logs (log_id INTEGER PRIMARY KEY, user_id INTEGER, action TEXT, timestamp TEXT)')
+    conn.executemany('INSERT INTO users VALUES (?, ?, ?, ?)',
+                     [(i, f'user{i}', f'First{i}', 'admin') for i in range(1, n_users + 1)])
+    conn.executemany('INSERT INTO products VALUES (?, ?, ?, ?, ?)',
+                     ((f'P{i}', f'Product {i}', 'Steel - 2; Bolt - 4', '2024-01-01 00:00:00', 'Pending')
+                      for i in range(1, n_products + 1)))
+    logs = []
+    for i in range(1, n_products + 1):
+        logs.extend((i % n_users + 1, f'LOGIN {i}-{k}', '2024-01-01 00:00:00') for k in range(NOISE_PER_PRODUCT))
+        logs.append((i % n_users + 1, f'CREATE PRODUCT P{i}', '2024-01-01 00:00:00'))
+    conn.executemany('INSERT INTO user_logs (user_id, action, timestamp) VALUES (?, ?, ?)', logs)
+    conn.commit()
+    conn.close()
+
+
+def get_product_creator(conn, product_id):
+    # Stand-in for DatabaseManager.get_product_creator: two lookups per product
+    row = conn.execute('SELECT user_id FROM user_logs WHERE action = ? ORDER BY rowid DESC LIMIT 1',
+                       (f'CREATE PRODUCT {product_id}',)).fetchone()
+    if not row:
+        return UNKNOWN_CREATOR
+    user = conn.execute('SELECT f_name, username FROM users WHERE user_id = ?', (row[0],)).fetchone()
+    return (user[0] or user[1]) if user else str(row[0])
+
+
+def load_per_product(conn):
+    products = conn.execute('SELECT * FROM products').fetchall()
+    return [(product, get_product_creator(conn, product[0])) for product in products], len(products) + 1
+
+
+def load_bulk(conn):
+    products = conn.execute('SELECT * FROM products').fetchall()
+    creators = load_product_creators(conn)
+    return [(product, creators.get(str(product[0]), UNKNOWN_CREATOR)) for product in products], 2
+
+
+def timed(fn, conn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows, queries = fn(conn)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return rows, queries, best
+
+
+def run(sizes, repeat):
+    results = []
+    for n in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database = os.path.join(tmp, 'main.db')
+            build_database(database, n)
+            conn = sqlite3.connect(database)
+            try:
+                legacy_rows, legacy_queries, legacy_s = timed(load_per_product, conn, repeat)
+                ensure_creator_index(conn)
+                conn.commit()
+                indexed_rows, _, indexed_s = timed(load_per_product, conn, repeat)
+                bulk_rows, bulk_queries, bulk_s = timed(load_bulk, conn, repeat)
+            finally:
+                conn.close()
+        assert legacy_rows == indexed_rows == bulk_rows
+        results.append({'products': n, 'per_product_queries': legacy_queries, 'per_product_ms': legacy_s * 1000,
+                        'per_product_indexed_ms': indexed_s * 1000, 'bulk_queries': bulk_queries,
+                        'bulk_ms': bulk_s * 1000})
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    print(f"{'products':>9} {'queries':>8} {'per-product':>12} {'+ index':>10} {'bulk':>10} {'speedup':>8}")
+    for r in results:
+        print(f"{r['products']:>9} {r['per_product_queries']:>8} {r['per_product_ms']:>9.1f} ms "
+              f"{r['per_product_indexed_ms']:>7.1f} ms {r['bulk_ms']:>7.1f} ms {r['per_product_ms'] / r['bulk_ms']:>7.0f}x")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
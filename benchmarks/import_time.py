@@ -0,0 +1,99 @@
+"""Cold import time of the page modules, with a budget.
+
+Imports each module in a fresh interpreter under `python -X importtime`,
+takes the best of several runs and fails if it exceeds the budget or if
+any of the heavy libraries that should only load on first use (pandas,
+matplotlib, ...) was pulled in at import time. Run from the repository
+root:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --modules order --budget-ms 150 --runs 10
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ['order_crud', 'order', 'product']
+
+# Loaded lazily by the pages; importing any of these up front is a regression
+LAZY = ('pandas', 'numpy', 'matplotlib', 'pyarrow', 'tkcalendar', 'pytz',
+        'order_import', 'mrp', 'product_crud')
+
+DEFAULT_BUDGET_MS = 300
+
+# "import time:   self [us] | cumulative | imported package"
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_once(module):
+    """Import `module` in a new interpreter; returns (cumulative_ms, imported names) or raises."""
+    code = f'import sys; sys.path.insert(0, {ROOT!r}); import {module}'
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise ImportError(proc.stderr.strip().splitlines()[-1])
+
+    total_us = None
+    imported = set()
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        _, cumulative, indent, name = match.groups()
+        imported.add(name)
+        if name == module and len(indent) == 1:
+            total_us = int(cumulative)
+    if total_us is None:
+        raise ImportError(f"{module} missing from -X importtime output")
+    return total_us / 1000, imported
+
+
+def measure(module, runs):
+    times = []
+    imported = set()
+    for _ in range(runs):
+        ms, imported = import_once(module)
+        times.append(ms)
+    return {'module': module, 'best_ms': min(times), 'median_ms': sorted(times)[len(times) // 2],
+            'eager_heavy': sorted(name for name in imported if name in LAZY and name != module)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modules', nargs='+', default=MODULES)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help='maximum best-of-runs cumulative import time per module')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = []
+    failed = False
+    for module in args.modules:
+        try:
+            result = measure(module, args.runs)
+        except ImportError as e:
+            print(f"{module:<12} could not be imported: {e}")
+            results.append({'module': module, 'error': str(e)})
+            failed = True
+            continue
+
+        over = result['best_ms'] > args.budget_ms
+        failed = failed or over or bool(result['eager_heavy'])
+        result['budget_ms'] = args.budget_ms
+        results.append(result)
+        print(f"{module:<12} best {result['best_ms']:8.1f} ms   median {result['median_ms']:8.1f} ms   "
+              f"budget {args.budget_ms:.0f} ms{'   OVER BUDGET' if over else ''}")
+        if result['eager_heavy']:
+            print(f"{'':<12} imported at startup: {', '.join(result['eager_heavy'])}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,208 @@
+"""Load test for the order API on localhost.
+
+Builds a synthetic main.db (see synth_db.py), starts OrderAPI on an
+ephemeral localhost port in a background thread and drives it with
+concurrent keep-alive clients running a scanner-like mix of searches,
+lookups, inventory reads, approvals, cancellations, deliveries and new
+orders. Prints client-side latency per operation, throughput and status
+codes, then the server's own /metrics. Pass --url and --token to load a
+server that is already running instead (it must serve a synth_db
+database, and the token's user must be allowed to manage orders). Run
+from the repository root:
+
+    python benchmarks/load_api.py --clients 16 --requests 200
+    python benchmarks/load_api.py --url http://127.0.0.1:8765 --token ... --clients 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import get_pool, write
+from order_api import API_WORKERS, MAX_PENDING, OrderAPI, issue_token_job
+from synth_db import generate
+
+
+# (operation, weight)
+MIX = [('search', 40), ('list_status', 10), ('get', 20), ('inventory', 5),
+       ('approve', 10), ('cancel', 5), ('deliver', 5), ('create', 5)]
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection sending JSON requests."""
+
+    def __init__(self, host, port, token):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.writer.write((f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nAuthorization: Bearer {self.token}\r\n'
+                           f'Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n').encode('latin-1') + data)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            if name.strip().lower() == 'content-length':
+                length = int(value)
+        payload = json.loads(await self.reader.readexactly(length)) if length else None
+        return status, payload
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+def _operation(rng, counts):
+    op = rng.choices([name for name, _ in MIX], [weight for _, weight in MIX])[0]
+    order_id = rng.randint(1, counts['orders'])
+    if op == 'search':
+        return op, 'GET', f"/orders?q=Order%20{rng.randint(1, 999)}", None
+    if op == 'list_status':
+        return op, 'GET', f"/orders?status={rng.choice(['Pending', 'Approved', 'Delivered', 'Cancelled'])}&limit=50", None
+    if op == 'get':
+        return op, 'GET', f'/orders/{order_id}', None
+    if op == 'inventory':
+        return op, 'GET', '/inventory', None
+    if op == 'approve':
+        return op, 'POST', f'/orders/{order_id}/approve', {}
+    if op == 'cancel':
+        return op, 'POST', f'/orders/{order_id}/cancel', {}
+    if op == 'deliver':
+        return op, 'POST', f'/orders/{order_id}/deliver', {'timestamp': '2026-01-01 12:00:00'}
+    return op, 'POST', '/orders', {'order_name': f'Load {rng.random():.6f}', 'quantity': rng.randint(1, 50),
+                                   'product_id': f"P{rng.randint(1, counts['products'])}",
+                                   'client_id': f"C{rng.randint(1, counts['clients'])}", 'deadline': '12/31/2026',
+                                   'order_date': '2026-01-01 12:00:00'}
+
+
+async def _client(host, port, token, n_requests, seed, counts, samples, statuses):
+    rng = random.Random(seed)
+    client = Client(host, port, token)
+    try:
+        for _ in range(n_requests):
+            op, method, path, body = _operation(rng, counts)
+            start = time.perf_counter()
+            status, _ = await client.request(method, path, body)
+            samples.setdefault(op, []).append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        await client.close()
+
+
+async def drive(host, port, token, clients, n_requests, seed, counts):
+    samples = {}
+    statuses = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, token, n_requests, f'{seed}-{i}', counts, samples, statuses)
+                           for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    client = Client(host, port, token)
+    try:
+        _, metrics = await client.request('GET', '/metrics')
+    finally:
+        await client.close()
+    return samples, statuses, elapsed, metrics
+
+
+def start_server(database, workers, max_pending):
+    # The API gets its own event loop thread so the clients' loop does not time its work
+    ready = threading.Event()
+    state = {}
+
+    async def serve():
+        api = OrderAPI(database, workers, max_pending, order_totals_export=None)
+        stopped = asyncio.Event()
+        state['address'] = await api.start('127.0.0.1', 0)
+        state['stop'] = lambda: loop.call_soon_threadsafe(stopped.set)
+        ready.set()
+        await stopped.wait()
+        await api.close()
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_until_complete, args=(serve(),), name='order-api', daemon=True)
+    thread.start()
+    ready.wait()
+    return state['address'], state['stop'], thread, loop
+
+
+def report(samples, statuses, elapsed, metrics):
+    total = sum(len(values) for values in samples.values())
+    print(f"{total} requests in {elapsed:.2f} s: {total / elapsed:.0f} req/s; statuses "
+          + ', '.join(f'{status}: {n}' for status, n in sorted(statuses.items())))
+    print(f"\n{'operation':<12} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    results = {}
+    for op, values in sorted(samples.items()):
+        ms = sorted(v * 1000 for v in values)
+        row = {'n': len(ms), 'p50_ms': ms[len(ms) // 2], 'p95_ms': ms[int(len(ms) * 0.95)],
+               'p99_ms': ms[min(len(ms) - 1, int(len(ms) * 0.99))], 'max_ms': ms[-1]}
+        results[op] = row
+        print(f"{op:<12} {row['n']:>6} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['max_ms']:>9.2f}")
+    print(f"\nserver /metrics (workers {metrics['workers']}, rejected {metrics['rejected']}):")
+    for route, row in sorted(metrics['routes'].items()):
+        print(f"  {route:<28} {row['count']:>6}  p50 {row['p50_ms']:7.2f} ms  p95 {row['p95_ms']:7.2f} ms  "
+              f"p99 {row['p99_ms']:7.2f} ms")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help='requests per client')
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--clients-rows', type=int, default=200, help='rows in the clients table')
+    parser.add_argument('--workers', type=int, default=API_WORKERS)
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='load an already running API instead of starting one')
+    parser.add_argument('--token', help='API token for --url')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    counts = {'orders': args.orders, 'products': args.products, 'clients': args.clients_rows}
+    if args.url:
+        if not args.token:
+            parser.error('--url needs --token')
+        url = urlsplit(args.url)
+        samples, statuses, elapsed, metrics = asyncio.run(
+            drive(url.hostname, url.port, args.token, args.clients, args.requests, args.seed, counts))
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            database = os.path.join(tmp, 'main.db')
+            generate(database, orders=args.orders, products=args.products, clients=args.clients_rows, seed=args.seed)
+            # synth_db users are all admins
+            token = write(issue_token_job, 1, database=database)
+            (host, port), stop, thread, loop = start_server(database, args.workers, args.max_pending)
+            try:
+                samples, statuses, elapsed, metrics = asyncio.run(
+                    drive(host, port, token, args.clients, args.requests, args.seed, counts))
+            finally:
+                stop()
+                thread.join()
+                loop.close()
+                get_pool(database).close_all()
+
+    results = report(samples, statuses, elapsed, metrics)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'clients': args.clients, 'requests_per_client': args.requests, 'workers': args.workers,
+                       'elapsed_s': elapsed, 'statuses': statuses, 'operations': results, 'server': metrics}, f, indent=2)
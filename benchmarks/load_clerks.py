@@ -0,0 +1,210 @@
+"""Several clerk processes approving, cancelling and searching one shared database.
+
+Each clerk is a separate process running a random mix of the OrdersPage
+operations against the same throwaway main.db and counting "database is
+locked" failures. The pooled mode calls the production OrderService jobs
+through db_pool (WAL, busy timeout, serialized writer queue) on the
+current schema. The legacy mode builds the original schema (raw_mats as a
+plain table) and runs the original OrdersPage statements on a plain
+connection per operation in the default rollback-journal mode: a read of
+each material's stock, then an absolute UPDATE, with no guard in between.
+Run from the repository root:
+
+    python benchmarks/load_clerks.py --clerks 8 --ops 300
+    python benchmarks/load_clerks.py --clerks 8 --ops 300 --mode legacy
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_pool import connect, get_pool
+from order_materials import ensure_order_materials
+from order_search import ensure_order_search_index, search_orders
+from order_service import OrderService
+from order_status import ensure_row_versions
+from stock_ledger import ensure_stock_ledger
+
+
+MATERIALS = ['Steel', 'Bolt', 'Paint', 'Wire', 'Glass']
+PRODUCTS = 20
+
+
+STOCK = 5000
+
+
+def build_database(path, n_orders, mode, stock=STOCK):
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE orders (order_id INTEGER PRIMARY KEY, order_name TEXT, product_id TEXT,
+                    client_id TEXT, quantity INTEGER, order_date TEXT, deadline TEXT, mats_need TEXT, status_quo TEXT)''')
+    conn.execute('CREATE TABLE products (product_id TEXT PRIMARY KEY, product_name TEXT, materials TEXT, status_quo TEXT)')
+    conn.execute('CREATE TABLE raw_mats (mat_id INTEGER PRIMARY KEY, mat_name TEXT, mat_volume REAL)')
+    conn.executemany('INSERT INTO raw_mats (mat_name, mat_volume) VALUES (?, ?)',
+                     [(name, stock) for name in MATERIALS])
+    conn.executemany('INSERT INTO products VALUES (?, ?, ?, ?)',
+                     [(f'P{i}', f'Product {i}', '', 'Approved') for i in range(PRODUCTS)])
+    conn.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                     ((i, f'Order {i}', f'P{i % PRODUCTS}', f'C{i % 40}', i % 50 + 1, '2024-01-01 00:00:00', '01/31/2024',
+                       json.dumps({MATERIALS[i % 5]: float(i % 7 + 1), MATERIALS[(i + 2) % 5]: float(i % 3 + 1)}),
+                       'Pending')
+                      for i in range(1, n_orders + 1)))
+    if mode == 'pooled':
+        ensure_order_materials(conn)
+        ensure_order_search_index(conn)
+        ensure_stock_ledger(conn)
+        ensure_row_versions(conn)
+    conn.commit()
+    conn.close()
+
+
+def pooled_op(database, op, order_id, term):
+    if op == 'search':
+        conn = connect(database, readonly=True)
+        try:
+            search_orders(conn, term)
+        finally:
+            conn.close()
+    elif op == 'approve':
+        return OrderService(database).approve_order(order_id)[0] == 'approved'
+    else:
+        OrderService(database).cancel_order(order_id)
+
+
+def legacy_approve(c, order_id):
+    # The original OrdersPage.approve_order, minus its dialogs and the JSON file it read mats_need from
+    order_status, prod_status, mats_need = c.execute('''
+        SELECT o.status_quo, p.status_quo, o.mats_need
+        FROM orders o
+        JOIN products p ON o.product_id = p.product_id
+        WHERE o.order_id = ?
+    ''', (order_id,)).fetchone()
+    if order_status != "Pending" or prod_status != "Approved":
+        return False
+    mats_need = json.loads(mats_need)
+    mats_stock = {}
+    for mat_name, mat_qty_needed in mats_need.items():
+        mats_fetch = c.execute('SELECT mat_id, mat_name, mat_volume FROM raw_mats WHERE mat_name = ?',
+                               (mat_name,)).fetchone()
+        if not mats_fetch or mats_fetch[2] < mat_qty_needed:
+            return False
+        mats_stock[mat_name] = (mats_fetch[0], mats_fetch[2])
+    for mat_name, mat_qty_needed in mats_need.items():
+        mat_id, current_qty = mats_stock[mat_name]
+        c.execute('UPDATE raw_mats SET mat_volume = ? WHERE mat_id = ?', (current_qty - mat_qty_needed, mat_id))
+    c.execute('UPDATE orders SET status_quo = ? WHERE order_id = ?', ("Approved", order_id))
+    return True
+
+
+def legacy_op(database, op, order_id, term):
+    # One short-lived connection per click with deferred transactions, as before the pool
+    conn = sqlite3.connect(database)
+    try:
+        if op == 'search':
+            like = f'%{term}%'
+            conn.execute('SELECT * FROM orders WHERE order_name LIKE ? OR client_id LIKE ?', (like, like)).fetchall()
+        elif op == 'approve':
+            approved = legacy_approve(conn.cursor(), order_id)
+            conn.commit()
+            return approved
+        else:
+            conn.execute('UPDATE orders SET status_quo = ? WHERE order_id = ?', ("Cancelled", order_id))
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def clerk(args):
+    database, mode, n_orders, ops, seed = args
+    rng = random.Random(seed)
+    run_op = pooled_op if mode == 'pooled' else legacy_op
+    result = {'ok': 0, 'locked': 0, 'errors': 0, 'approved': [],
+              'latencies': {'approve': [], 'cancel': [], 'search': []}}
+    for _ in range(ops):
+        op = rng.choices(['approve', 'cancel', 'search'], weights=[4, 1, 5])[0]
+        order_id = rng.randint(1, n_orders)
+        term = f'Order {rng.randint(1, 999)}'
+        start = time.perf_counter()
+        try:
+            if run_op(database, op, order_id, term):
+                result['approved'].append(order_id)
+        except sqlite3.OperationalError as e:
+            if 'locked' in str(e) or 'busy' in str(e):
+                result['locked'] += 1
+            else:
+                result['errors'] += 1
+            continue
+        result['ok'] += 1
+        result['latencies'][op].append(time.perf_counter() - start)
+    if mode == 'pooled':
+        get_pool(database).close_all()
+    return result
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(clerks, ops, n_orders, mode):
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'main.db')
+        build_database(database, n_orders, mode)
+        start = time.perf_counter()
+        with multiprocessing.Pool(clerks) as pool:
+            results = pool.map(clerk, [(database, mode, n_orders, ops, seed) for seed in range(clerks)])
+        elapsed = time.perf_counter() - start
+
+        conn = sqlite3.connect(database)
+        negative = conn.execute('SELECT COUNT(*) FROM raw_mats WHERE mat_volume < 0').fetchone()[0]
+        # Stock that should be left after every approval the clerks were told succeeded;
+        # any difference is a lost or doubled deduction
+        expected = dict.fromkeys(MATERIALS, float(STOCK))
+        approved = [order_id for r in results for order_id in r['approved']]
+        for order_id in approved:
+            mats_need = conn.execute('SELECT mats_need FROM orders WHERE order_id = ?', (order_id,)).fetchone()[0]
+            for name, qty in json.loads(mats_need).items():
+                expected[name] -= qty
+        mismatched = sum(abs(expected[name] - volume) > 1e-6
+                         for name, volume in conn.execute('SELECT mat_name, mat_volume FROM raw_mats'))
+        conn.close()
+
+    summary = {'mode': mode, 'clerks': clerks, 'elapsed_s': elapsed, 'negative_stock': negative,
+               'mismatched_stock': mismatched, 'approved': len(approved),
+               'approved_twice': len(approved) - len(set(approved)),
+               'ok': sum(r['ok'] for r in results),
+               'locked': sum(r['locked'] for r in results),
+               'errors': sum(r['errors'] for r in results)}
+    for op in ('approve', 'cancel', 'search'):
+        latencies = [t for r in results for t in r['latencies'][op]]
+        summary[f'{op}_p50_ms'] = percentile(latencies, 50) * 1000
+        summary[f'{op}_p99_ms'] = percentile(latencies, 99) * 1000
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clerks', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=300, help='operations per clerk')
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--mode', choices=['pooled', 'legacy'], default='pooled')
+    args = parser.parse_args()
+
+    summary = run(args.clerks, args.ops, args.orders, args.mode)
+    print(f"{summary['mode']}: {summary['clerks']} clerks, {summary['ok']} ok, "
+          f"{summary['locked']} locked, {summary['errors']} other errors in {summary['elapsed_s']:.1f} s, "
+          f"{summary['negative_stock']} materials below zero")
+    print(f"  {summary['approved']} approvals reported ({summary['approved_twice']} of an order already approved), "
+          f"{summary['mismatched_stock']} materials whose stock does not match them")
+    for op in ('approve', 'cancel', 'search'):
+        print(f"  {op:<8} p50 {summary[f'{op}_p50_ms']:8.2f} ms   p99 {summary[f'{op}_p99_ms']:8.2f} ms")
+    if summary['locked'] or summary['negative_stock'] or summary['mismatched_stock'] or summary['approved_twice']:
+        sys.exit(1)
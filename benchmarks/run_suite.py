@@ -0,0 +1,353 @@
+"""Headless benchmark suite over a synthetic main.db.
+
+Generates a database at the chosen scale (see synth_db.py), times the hot
+paths of the order pages without Tk and writes the results as JSON with
+the commit they were measured on. Compare two runs to spot regressions.
+Run from the repository root:
+
+    python benchmarks/run_suite.py --scale small --json results-before.json
+    python benchmarks/run_suite.py --scale small --json results-after.json --compare results-before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT)
+
+from bom import get_cached_bom, invalidate_bom, parse_materials
+from db_pool import connect, get_pool, write
+from exports import IncrementalJsonExport, load_order_totals
+from order_export import export_table
+from order_grid import KeysetOrderGrid
+from order_materials import get_orders_materials
+from order_search import search_orders
+from order_service import OrderService
+from synth_db import generate
+
+
+SCALES = {
+    'small': {'orders': 5000, 'products': 200, 'clients': 100, 'materials': 40, 'history': 2000},
+    'medium': {'orders': 50000, 'products': 1000, 'clients': 500, 'materials': 100, 'history': 20000},
+    'large': {'orders': 500000, 'products': 5000, 'clients': 2000, 'materials': 200, 'history': 200000},
+}
+
+# A case is slower than the baseline if its median grew by more than this factor
+DEFAULT_MAX_REGRESSION = 1.25
+
+
+class HeadlessTree:
+    """The parts of ttk.Treeview that KeysetOrderGrid and KeyedTree use, without Tk."""
+
+    def __init__(self):
+        self.rows = {}
+        self.order = []
+
+    def configure(self, **options):
+        pass
+
+    def get_children(self, item=''):
+        return tuple(self.order)
+
+    def insert(self, parent, index, iid=None, values=(), tags=()):
+        self.rows[iid] = (values, tags)
+        if index == 'end':
+            self.order.append(iid)
+        else:
+            self.order.insert(index, iid)
+        return iid
+
+    def delete(self, *iids):
+        gone = set(iids)
+        self.order = [iid for iid in self.order if iid not in gone]
+        for iid in iids:
+            del self.rows[iid]
+
+    def item(self, iid, values=(), tags=()):
+        self.rows[iid] = (values, tags)
+
+    def set_children(self, item, *iids):
+        self.order = list(iids)
+
+    def index(self, iid):
+        return self.order.index(iid)
+
+    def exists(self, iid):
+        return iid in self.rows
+
+    def yview(self):
+        return (0.0, 1.0)
+
+    def yview_moveto(self, fraction):
+        pass
+
+    def after_idle(self, fn):
+        return None
+
+    def after_cancel(self, after_id):
+        pass
+
+
+class NullScrollbar:
+    def set(self, first, last):
+        pass
+
+
+def timed(samples, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    samples.append(time.perf_counter() - start)
+    return result
+
+
+# Each case takes (database, repeat, rng) and returns per-operation times in seconds
+
+def case_search_text(database, repeat, rng):
+    samples = []
+    terms = [f'Order {rng.randint(1, 999)}' for _ in range(repeat)] + [f'C{rng.randint(1, 99)}' for _ in range(repeat)]
+    conn = connect(database, readonly=True)
+    try:
+        for term in terms:
+            timed(samples, search_orders, conn, term)
+    finally:
+        conn.close()
+    return samples
+
+
+def case_search_status(database, repeat, rng):
+    # upd_srch_order with a status and no text: first page of the filtered grid
+    samples = []
+    grid = KeysetOrderGrid(HeadlessTree(), NullScrollbar(), database=database)
+    for i in range(repeat):
+        timed(samples, grid.reset, 'status_quo = ?', (['Pending', 'Approved', 'Delivered', 'Cancelled'][i % 4],))
+    return samples
+
+
+def case_load_orders_first_page(database, repeat, rng):
+    samples = []
+    for _ in range(repeat):
+        grid = KeysetOrderGrid(HeadlessTree(), NullScrollbar(), database=database)
+        timed(samples, grid.reset)
+    return samples
+
+
+def case_load_orders_refresh(database, repeat, rng):
+    # load_orders_from_db after an action: re-read the loaded window and diff it
+    samples = []
+    grid = KeysetOrderGrid(HeadlessTree(), NullScrollbar(), database=database)
+    grid.reset()
+    grid._load_next()
+    grid._load_next()
+    for _ in range(repeat):
+        timed(samples, grid.refresh)
+    return samples
+
+
+def _receive_for_orders(conn, order_ids):
+    # Writer job: a receipt covering everything the orders need, so each of them can be approved
+    needs = {}
+    for mats_need in get_orders_materials(conn, order_ids).values():
+        for name, qty in mats_need.items():
+            needs[name] = needs.get(name, 0) + qty
+    conn.executemany('''
+        INSERT INTO stock_movements (mat_id, kind, qty, ref)
+        SELECT mat_id, 'receipt', ?, 'run_suite' FROM raw_mat_master WHERE mat_name = ?
+    ''', [(qty, name) for name, qty in needs.items()])
+
+
+def case_approve_order(database, repeat, rng):
+    # OrderService.approve_order on the full path: status check, material check and stock deduction
+    # through the writer queue. Only Pending orders of Approved products with their stock on hand, so
+    # no sample is an early rejection.
+    conn = connect(database, readonly=True)
+    try:
+        pending = [row[0] for row in conn.execute('''
+            SELECT o.order_id FROM orders o JOIN products p ON p.product_id = o.product_id
+            WHERE o.status_quo = 'Pending' AND p.status_quo = 'Approved'
+              AND EXISTS (SELECT 1 FROM order_materials om WHERE om.order_id = CAST(o.order_id AS TEXT))
+            LIMIT ?
+        ''', (repeat * 4,))]
+    finally:
+        conn.close()
+    order_ids = rng.sample(pending, min(repeat, len(pending)))
+    write(_receive_for_orders, order_ids, database=database)
+    samples = []
+    orders = OrderService(database)
+    for order_id in order_ids:
+        outcome, detail = timed(samples, orders.approve_order, order_id)
+        assert outcome == 'approved', f"approve_order({order_id}) returned {outcome}: {detail}"
+    return samples
+
+
+def case_parse_materials(database, repeat, rng):
+    conn = connect(database, readonly=True)
+    try:
+        strings = [row[0] for row in conn.execute('SELECT materials FROM products')]
+    finally:
+        conn.close()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for materials in strings:
+            parse_materials(materials)
+        samples.append((time.perf_counter() - start) / max(len(strings), 1))
+    return samples
+
+
+def _calculate(product_id, quantity, database):
+    # The data part of calculate_materials: BOM lookup and totals, without the Text widget
+    return {name: float(qty) * quantity for name, qty in get_cached_bom(product_id, database).items()}
+
+
+def case_calculate_materials_cold(database, repeat, rng):
+    samples = []
+    for _ in range(repeat):
+        invalidate_bom()
+        timed(samples, _calculate, f'P{rng.randint(1, 100)}', rng.randint(1, 100), database)
+    return samples
+
+
+def case_calculate_materials_warm(database, repeat, rng):
+    samples = []
+    product_id = 'P1'
+    _calculate(product_id, 1, database)
+    for _ in range(repeat):
+        timed(samples, _calculate, product_id, rng.randint(1, 100), database)
+    return samples
+
+
+def case_export_total_amount_mats_full(database, repeat, rng):
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        export = IncrementalJsonExport(database, os.path.join(tmp, 'order_mats_ttl.json'), 'orders', 'order_id',
+                                       load_order_totals)
+        for _ in range(max(1, repeat // 5)):
+            timed(samples, export.rebuild)
+    return samples
+
+
+def case_export_total_amount_mats_incremental(database, repeat, rng):
+    # One order changed since the last refresh, as after approving or editing it
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        export = IncrementalJsonExport(database, os.path.join(tmp, 'order_mats_ttl.json'), 'orders', 'order_id',
+                                       load_order_totals)
+        export.refresh()
+        for i in range(repeat):
+            write(_touch_order, rng.randint(1, 1000), i, database=database)
+            timed(samples, export.refresh)
+    return samples
+
+
+def _touch_order(conn, order_id, i):
+    conn.execute('UPDATE orders SET mats_need = ? WHERE order_id = ?', (json.dumps({'Material 1': float(i)}), order_id))
+
+
+def case_export_orders_csv(database, repeat, rng):
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for _ in range(max(1, repeat // 5)):
+            timed(samples, export_table, os.path.join(tmp, 'orders.csv'), 'orders', None, None, None, database)
+    return samples
+
+
+CASES = {
+    'search_text': case_search_text,
+    'search_status': case_search_status,
+    'load_orders_first_page': case_load_orders_first_page,
+    'load_orders_refresh': case_load_orders_refresh,
+    'approve_order': case_approve_order,
+    'parse_materials': case_parse_materials,
+    'calculate_materials_cold': case_calculate_materials_cold,
+    'calculate_materials_warm': case_calculate_materials_warm,
+    'export_total_amount_mats_full': case_export_total_amount_mats_full,
+    'export_total_amount_mats_incremental': case_export_total_amount_mats_incremental,
+    'export_orders_csv': case_export_orders_csv,
+}
+
+
+def summarize(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return {'n': len(ms), 'min_ms': ms[0], 'median_ms': ms[len(ms) // 2],
+            'p95_ms': ms[min(len(ms) - 1, int(len(ms) * 0.95))], 'mean_ms': sum(ms) / len(ms)}
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run(scale, repeat, seed, cases):
+    counts = SCALES[scale]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database = os.path.join(tmp, 'main.db')
+        start = time.perf_counter()
+        generate(database, seed=seed, **counts)
+        generate_s = time.perf_counter() - start
+        try:
+            for name in cases:
+                rng = random.Random(f'{seed}-{name}')
+                results[name] = summarize(CASES[name](database, repeat, rng))
+                print(f"{name:<38} median {results[name]['median_ms']:9.3f} ms   "
+                      f"p95 {results[name]['p95_ms']:9.3f} ms   n={results[name]['n']}")
+        finally:
+            get_pool(database).close_all()
+
+    commit, dirty = git_revision()
+    meta = {'commit': commit, 'dirty': dirty, 'scale': scale, 'counts': counts, 'repeat': repeat, 'seed': seed,
+            'generate_s': generate_s, 'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(), 'measured_at': datetime.now(timezone.utc).isoformat(timespec='seconds')}
+    return {'meta': meta, 'results': results}
+
+
+def compare(report, baseline, max_regression):
+    """Print median ratios against `baseline` and return the names of cases that regressed."""
+    regressed = []
+    print(f"\nvs {baseline['meta'].get('commit')} ({baseline['meta'].get('scale')}):")
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if not base or not base['median_ms']:
+            continue
+        ratio = result['median_ms'] / base['median_ms']
+        flag = '   REGRESSION' if ratio > max_regression else ''
+        print(f"  {name:<38} {base['median_ms']:9.3f} -> {result['median_ms']:9.3f} ms  x{ratio:5.2f}{flag}")
+        if flag:
+            regressed.append(name)
+    return regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=list(SCALES), default='small')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline results file from an earlier run')
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION)
+    args = parser.parse_args()
+
+    report = run(args.scale, args.repeat, args.seed, args.cases)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(report, json.load(f), args.max_regression):
+                sys.exit(1)
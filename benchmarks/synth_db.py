@@ -0,0 +1,152 @@
+"""Synthetic main.db generator for benchmarks.
+
+Creates orders, products, clients, raw_mats, order_history, users and
+user_logs with the columns the pages read, filled deterministically from
+a seed, then runs the same schema preparation the pages run on startup
+(BOM table, order materials, search index, stock ledger, row versions,
+timestamps, export change log). Run from the repository root:
+
+    python benchmarks/synth_db.py /tmp/main.db --orders 100000 --products 2000
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bom import ensure_product_materials, parse_materials
+from exports import ensure_export_changes
+from order_materials import ensure_order_materials
+from order_search import ensure_order_search_index
+from order_status import ensure_row_versions
+from product_creators import ensure_creator_index
+from stock_ledger import ensure_stock_ledger
+from timestamps import ensure_timestamp_columns
+
+
+STATUSES = ['Pending', 'Approved', 'Delivered', 'Cancelled']
+STATUS_WEIGHTS = [50, 25, 15, 10]
+
+START_DATE = datetime(2023, 1, 1)
+DATE_SPAN_DAYS = 3 * 365
+
+
+def _date(rng):
+    return (START_DATE + timedelta(seconds=rng.randrange(DATE_SPAN_DAYS * 86400))).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def generate(path, orders=20000, products=500, clients=200, materials=60, history=None,
+             users=10, seed=0, prepare=True):
+    """Write a fresh synthetic database to `path` and return the row counts.
+
+    `history` defaults to one order_history row per delivered order. With
+    prepare=False the derived tables and triggers are left out, as in a
+    database the pages have never opened.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    c = conn.cursor()
+    c.executescript('''
+        CREATE TABLE raw_mats (mat_id INTEGER PRIMARY KEY, mat_name TEXT, mat_volume REAL);
+        CREATE TABLE products (product_id TEXT PRIMARY KEY, product_name TEXT, materials TEXT,
+                               created_date TEXT, status_quo TEXT);
+        CREATE TABLE clients (client_id TEXT PRIMARY KEY, client_name TEXT, contact TEXT);
+        CREATE TABLE orders (order_id INTEGER PRIMARY KEY, order_name TEXT, product_id TEXT, client_id TEXT,
+                             quantity INTEGER, order_date TEXT, deadline TEXT, mats_need TEXT, status_quo TEXT);
+        CREATE TABLE order_history (history_id INTEGER PRIMARY KEY, order_id INTEGER, status TEXT,
+                                    changed_by TEXT, notes TEXT, timestamp TEXT);
+        CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, f_name TEXT, usertype TEXT);
+        CREATE TABLE user_logs (log_id INTEGER PRIMARY KEY, user_id INTEGER, action TEXT, timestamp TEXT);
+    ''')
+
+    mat_names = [f'Material {i}' for i in range(1, materials + 1)]
+    c.executemany('INSERT INTO raw_mats (mat_name, mat_volume) VALUES (?, ?)',
+                  [(name, float(rng.randrange(10000, 1000000))) for name in mat_names])
+    c.executemany('INSERT INTO users VALUES (?, ?, ?, ?)',
+                  [(i, f'user{i}', f'First{i}', 'admin') for i in range(1, users + 1)])
+
+    boms = {}
+    product_rows = []
+    log_rows = []
+    for i in range(1, products + 1):
+        product_id = f'P{i}'
+        items = rng.sample(mat_names, min(len(mat_names), rng.randint(2, 6)))
+        materials_string = '; '.join(f'{name} - {rng.randint(1, 20)}' for name in items)
+        boms[product_id] = parse_materials(materials_string)
+        created = _date(rng)
+        product_rows.append((product_id, f'Product {i}', materials_string, created,
+                             rng.choice(['Pending', 'Approved'])))
+        log_rows.append((rng.randint(1, users), f'CREATE PRODUCT {product_id}', created))
+    c.executemany('INSERT INTO products VALUES (?, ?, ?, ?, ?)', product_rows)
+
+    client_ids = [f'C{i}' for i in range(1, clients + 1)]
+    c.executemany('INSERT INTO clients VALUES (?, ?, ?)',
+                  [(client_id, f'Client {client_id}', f'{client_id.lower()}@example.com') for client_id in client_ids])
+
+    product_ids = list(boms)
+    history_rows = []
+
+    def order_rows():
+        for order_id in range(1, orders + 1):
+            product_id = rng.choice(product_ids)
+            quantity = rng.randint(1, 100)
+            order_date = _date(rng)
+            deadline = (datetime.strptime(order_date, '%Y-%m-%d %H:%M:%S') +
+                        timedelta(days=rng.randint(7, 90))).strftime('%m/%d/%Y')
+            status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+            mats_need = json.dumps({name: float(qty * quantity) for name, qty in boms[product_id].items()})
+            if status == 'Delivered':
+                history_rows.append((order_id, 'Delivered', str(rng.randint(1, users)),
+                                     f'Order ID {order_id} has been delivered', order_date))
+            yield (order_id, f'Order {order_id}', product_id, rng.choice(client_ids), quantity,
+                   order_date, deadline, mats_need, status)
+
+    c.executemany('INSERT INTO orders VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', order_rows())
+
+    target_history = len(history_rows) if history is None else history
+    while len(history_rows) < target_history:
+        order_id = rng.randint(1, orders)
+        history_rows.append((order_id, rng.choice(STATUSES), str(rng.randint(1, users)), 'Status changed', _date(rng)))
+    c.executemany('INSERT INTO order_history (order_id, status, changed_by, notes, timestamp) VALUES (?, ?, ?, ?, ?)',
+                  history_rows[:target_history])
+    c.executemany('INSERT INTO user_logs (user_id, action, timestamp) VALUES (?, ?, ?)', log_rows)
+    conn.commit()
+
+    if prepare:
+        ensure_product_materials(conn)
+        ensure_order_materials(conn)
+        ensure_order_search_index(conn)
+        ensure_stock_ledger(conn)
+        ensure_row_versions(conn)
+        ensure_timestamp_columns(conn)
+        ensure_creator_index(conn)
+        ensure_export_changes(conn)
+        conn.commit()
+        conn.execute('ANALYZE')
+        conn.commit()
+    conn.close()
+    return {'orders': orders, 'products': products, 'clients': clients, 'raw_mats': materials,
+            'order_history': target_history, 'users': users}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--orders', type=int, default=20000)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--materials', type=int, default=60)
+    parser.add_argument('--history', type=int, help='order_history rows (default: one per delivered order)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--raw', action='store_true', help='skip the schema preparation the pages run')
+    args = parser.parse_args()
+
+    counts = generate(args.path, args.orders, args.products, args.clients, args.materials, args.history,
+                      seed=args.seed, prepare=not args.raw)
+    print(f"Wrote {args.path}: " + ', '.join(f'{n} {table}' for table, n in counts.items()))
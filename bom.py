@@ -0,0 +1,148 @@
+import logging
+import re
+import threading
+
+from db_pool import connect, submit_write
+
+
+bom_logger = logging.getLogger('bom')
+
+
+_ITEM_SPLIT = re.compile(r'[;,]')
+_ITEM_PATTERN = re.compile(r'(.+?)\s*[-:]\s*(\d+)')
+
+
+def parse_materials(materials_string):
+    """Parse a BOM string like "Steel - 4; Bolt - 10" into {name: qty}.
+
+    Items without a quantity are kept with qty 0, as before.
+    """
+    if not materials_string:
+        return {}
+
+    materials = {}
+    for item in _ITEM_SPLIT.split(materials_string):
+        item = item.strip()
+        if not item:
+            continue
+        match = _ITEM_PATTERN.match(item)
+        if match:
+            materials[match.group(1).strip()] = int(match.group(2))
+        else:
+            materials[item] = 0
+    return materials
+
+
+def ensure_product_materials(conn):
+    """Create product_materials and back-fill it from products.materials on first run.
+
+    One row per (product, material). mat_id links to raw_mats when the name
+    is known there; mat_name is kept so BOM entries for materials not (yet)
+    in inventory still round-trip. Triggers drop a product's rows whenever
+    its materials string changes or it is deleted, and get_product_bom()
+    re-derives them on the next read, so the table can never go stale even
+    when products are written by code that does not know about it.
+    """
+    c = conn.cursor()
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_materials'").fetchone()
+    c.executescript('''
+        CREATE TABLE IF NOT EXISTS product_materials (
+            product_id TEXT NOT NULL,
+            mat_id INTEGER,
+            mat_name TEXT NOT NULL,
+            qty REAL NOT NULL,
+            PRIMARY KEY (product_id, mat_name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_product_materials_mat ON product_materials(mat_id);
+        CREATE TRIGGER IF NOT EXISTS product_materials_au AFTER UPDATE OF materials ON products BEGIN
+            DELETE FROM product_materials WHERE product_id = old.product_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS product_materials_ad AFTER DELETE ON products BEGIN
+            DELETE FROM product_materials WHERE product_id = old.product_id;
+        END;
+    ''')
+    if not exists:
+        for product_id, materials_string in c.execute('SELECT product_id, materials FROM products').fetchall():
+            _store_bom(c, product_id, parse_materials(materials_string))
+
+
+def _store_bom(c, product_id, materials):
+    c.executemany('''
+        INSERT OR REPLACE INTO product_materials (product_id, mat_id, mat_name, qty)
+        VALUES (?, (SELECT mat_id FROM raw_mats WHERE mat_name = ? LIMIT 1), ?, ?)
+    ''', [(product_id, name, name, qty) for name, qty in materials.items()])
+
+
+def _read_bom(c, product_id):
+    # (materials, indexed): indexed is False when they had to be parsed from products.materials
+    rows = c.execute('SELECT mat_name, qty FROM product_materials WHERE product_id = ?', (product_id,)).fetchall()
+    if rows:
+        return {name: qty for name, qty in rows}, True
+    row = c.execute('SELECT materials FROM products WHERE product_id = ?', (product_id,)).fetchone()
+    return (parse_materials(row[0]) if row else {}), False
+
+
+def get_product_bom(conn, product_id):
+    """Return {mat_name: qty} for one product from product_materials.
+
+    Products with no rows yet (new, or edited since they were indexed) are
+    parsed once from products.materials and stored, so later reads skip the
+    regex entirely. Needs a writable connection for that back-fill; it
+    also works as a writer queue job.
+    """
+    c = conn.cursor()
+    materials, indexed = _read_bom(c, product_id)
+    if materials and not indexed:
+        _store_bom(c, product_id, materials)
+    return materials
+
+
+# str(product_id) -> {mat_name: qty}; guarded by _cache_lock
+_bom_cache = {}
+# Versions are bumped on every invalidation so an in-flight load that started
+# before the change cannot put stale data back in the cache
+_bom_versions = {}
+_cache_generation = 0
+_cache_lock = threading.Lock()
+
+
+def get_cached_bom(product_id, database='main.db'):
+    """Return a copy of the BOM for `product_id`, hitting the database only on a miss."""
+    key = str(product_id)
+    with _cache_lock:
+        materials = _bom_cache.get(key)
+        if materials is not None:
+            return dict(materials)
+        version = (_cache_generation, _bom_versions.get(key, 0))
+
+    # A reader, so the Tk thread never waits behind queued writes; the back-fill goes to the writer queue
+    conn = connect(database, readonly=True)
+    try:
+        materials, indexed = _read_bom(conn.cursor(), product_id)
+    finally:
+        conn.close()
+    if materials and not indexed:
+        submit_write(get_product_bom, product_id, database=database).add_done_callback(_log_backfill_error)
+
+    with _cache_lock:
+        if (_cache_generation, _bom_versions.get(key, 0)) == version:
+            _bom_cache[key] = materials
+    return dict(materials)
+
+
+def _log_backfill_error(future):
+    if future.exception() is not None:
+        bom_logger.warning(f"Indexing product materials failed: {future.exception()}")
+
+
+def invalidate_bom(product_id=None):
+    """Drop one product's cached BOM, or the whole cache when product_id is None."""
+    global _cache_generation
+    with _cache_lock:
+        if product_id is None:
+            _cache_generation += 1
+            _bom_cache.clear()
+        else:
+            key = str(product_id)
+            _bom_versions[key] = _bom_versions.get(key, 0) + 1
+            _bom_cache.pop(key, None)
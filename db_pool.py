@@ -0,0 +1,346 @@
+import sqlite3
+import threading
+import queue
+import time
+import logging
+import os
+from concurrent.futures import Future
+
+
+pool_logger = logging.getLogger('db_pool')
+
+# Checkouts that wait longer than this (seconds) are logged as slow
+SLOW_CHECKOUT = 0.05
+
+# Queued writes that still hit SQLITE_BUSY after the busy timeout are retried this many times
+WRITE_RETRIES = 5
+
+
+class StaleRowError(sqlite3.OperationalError):
+    """A compare-and-swap update matched no row: someone changed it since it was read."""
+
+
+class PooledConnection:
+    """Proxy around a pooled sqlite3.Connection.
+
+    Behaves like the connection it wraps, except that close() hands the
+    connection back to its pool instead of closing it. Any transaction left
+    open is rolled back on release so the next user starts clean.
+    """
+
+    def __init__(self, pool, conn, readonly):
+        self._pool = pool
+        self._conn = conn
+        self._readonly = readonly
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a released connection.")
+        return getattr(conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool._release(conn, self._readonly)
+
+    def __del__(self):
+        # Safety net for handlers that return early without closing
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Long-lived connections to one SQLite file: a single writer plus reusable readers.
+
+    Connections are opened lazily, configured once and kept for the life of
+    the process, so handlers no longer pay for connect/PRAGMA/schema parsing
+    on every click. Each connection keeps its own prepared statement cache.
+
+    With wal=True (the default) the file is switched to WAL so readers in
+    any terminal never block the writer, and every connection waits up to
+    `timeout` seconds on a lock instead of failing. The writer opens its
+    implicit transactions with BEGIN IMMEDIATE, so two terminals can never
+    deadlock upgrading a read into a write.
+    """
+
+    def __init__(self, database, readers=4, cached_statements=256, timeout=5.0, wal=True):
+        self.database = database
+        self.max_readers = readers
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.wal = wal
+        self._write_queue = None
+
+        self._writer = None
+        # Re-entrant so a handler holding the writer can call helpers that check it out again
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        self._idle_readers = queue.LifoQueue()
+        self._opened_readers = 0
+        self._open_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'writer': {'checkouts': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'slow': 0},
+            'reader': {'checkouts': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'slow': 0},
+        }
+
+    def _open(self, readonly):
+        conn = sqlite3.connect(self.database, timeout=self.timeout,
+                               cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.timeout * 1000)}')
+        if readonly:
+            conn.execute('PRAGMA query_only = ON')
+        else:
+            conn.isolation_level = 'IMMEDIATE'
+            if self.wal:
+                self._enable_wal(conn)
+        return conn
+
+    def _enable_wal(self, conn):
+        # journal_mode=WAL is stored in the file, so every terminal picks it up after the first switch
+        try:
+            mode = conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+        except sqlite3.OperationalError as e:
+            pool_logger.warning(f"Could not switch {self.database} to WAL: {e}")
+            return
+        if mode.lower() == 'wal':
+            # Durable at checkpoints; a power cut can only lose the last few commits
+            conn.execute('PRAGMA synchronous = NORMAL')
+        else:
+            pool_logger.warning(f"{self.database} stays in {mode} journal mode")
+
+    def _record_wait(self, kind, waited):
+        with self._stats_lock:
+            stats = self._stats[kind]
+            stats['checkouts'] += 1
+            stats['wait_total'] += waited
+            stats['wait_max'] = max(stats['wait_max'], waited)
+            if waited >= SLOW_CHECKOUT:
+                stats['slow'] += 1
+        if waited >= SLOW_CHECKOUT:
+            pool_logger.warning(f"Waited {waited * 1000:.1f} ms for {kind} connection to {self.database}")
+
+    def writer(self):
+        """Check out the single writer connection, waiting up to `timeout` seconds.
+
+        Nested checkouts from the thread that already holds the writer share it.
+        """
+        start = time.perf_counter()
+        if not self._writer_lock.acquire(timeout=self.timeout):
+            raise sqlite3.OperationalError(f"Timed out waiting for writer connection to {self.database}")
+        try:
+            if self._writer is None:
+                self._writer = self._open(readonly=False)
+        except Exception:
+            self._writer_lock.release()
+            raise
+        self._writer_depth += 1
+        self._record_wait('writer', time.perf_counter() - start)
+        return PooledConnection(self, self._writer, readonly=False)
+
+    def reader(self):
+        """Check out a read-only connection, opening a new one while under the limit."""
+        start = time.perf_counter()
+        try:
+            conn = self._idle_readers.get_nowait()
+        except queue.Empty:
+            conn = None
+            with self._open_lock:
+                if self._opened_readers < self.max_readers:
+                    self._opened_readers += 1
+                    try:
+                        conn = self._open(readonly=True)
+                    except Exception:
+                        self._opened_readers -= 1
+                        raise
+            if conn is None:
+                try:
+                    conn = self._idle_readers.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise sqlite3.OperationalError(f"Timed out waiting for reader connection to {self.database}")
+        self._record_wait('reader', time.perf_counter() - start)
+        return PooledConnection(self, conn, readonly=True)
+
+    def _release(self, conn, readonly):
+        if readonly:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+            finally:
+                self._idle_readers.put(conn)
+            return
+        self._writer_depth -= 1
+        try:
+            if self._writer_depth == 0 and conn.in_transaction:
+                conn.rollback()
+        finally:
+            self._writer_lock.release()
+
+    def write_queue(self):
+        """Return the WriteQueue that applies this pool's queued writes, starting it on first use."""
+        with self._open_lock:
+            if self._write_queue is None:
+                self._write_queue = WriteQueue(self)
+            return self._write_queue
+
+    def stats(self):
+        """Return a snapshot of checkout counts and wait times per connection kind."""
+        with self._stats_lock:
+            snapshot = {kind: dict(values) for kind, values in self._stats.items()}
+        for values in snapshot.values():
+            values['wait_avg'] = values['wait_total'] / values['checkouts'] if values['checkouts'] else 0.0
+        snapshot['readers_open'] = self._opened_readers
+        return snapshot
+
+    def close_all(self):
+        """Close every idle connection. Used on shutdown and in scripts."""
+        if self._write_queue is not None:
+            self._write_queue.stop()
+            self._write_queue = None
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                conn = self._idle_readers.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._open_lock:
+                self._opened_readers -= 1
+
+
+def _is_busy(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+class WriteQueue:
+    """One thread that applies write jobs to the pool's writer, one at a time, in order.
+
+    A job is fn(conn, *args). It runs inside BEGIN IMMEDIATE on the writer
+    connection and is committed when it returns, unless it already
+    committed or rolled back itself; an exception rolls it back. If the
+    database stays locked by another terminal past the busy timeout, or a
+    compare-and-swap inside the job raises StaleRowError, the whole job is
+    rolled back and re-run against fresh data, up to WRITE_RETRIES times.
+    Jobs submitted from inside a job run inline.
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+        self.retries = 0
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args) and return a Future for its result."""
+        future = Future()
+        if threading.current_thread() is self._thread:
+            # Nested job: the writer is re-entrant, so it joins the running transaction
+            future.set_running_or_notify_cancel()
+            conn = self.pool.writer()
+            try:
+                future.set_result(fn(conn, *args))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                conn.close()
+            return future
+        self._jobs.put((future, fn, args))
+        return future
+
+    def stop(self):
+        self._jobs.put(None)
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout=self.pool.timeout)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            future, fn, args = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = self._apply(fn, args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def _apply(self, fn, args):
+        for attempt in range(WRITE_RETRIES + 1):
+            conn = self.pool.writer()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                result = fn(conn, *args)
+                if conn.in_transaction:
+                    conn.commit()
+                return result
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not (_is_busy(e) or isinstance(e, StaleRowError)) or attempt == WRITE_RETRIES:
+                    raise
+                self.retries += 1
+                pool_logger.warning(f"Write to {self.pool.database} conflicted ({e}), retrying ({attempt + 1}/{WRITE_RETRIES})")
+                time.sleep(0.05 * (attempt + 1))
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database='main.db'):
+    """Return the process-wide pool for `database`, creating it on first use."""
+    key = os.path.abspath(database)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(database)
+        return pool
+
+
+def connect(database='main.db', readonly=False):
+    """Drop-in replacement for sqlite3.connect() that borrows from the shared pool.
+
+    Call close() on the result as before; it returns the connection to the pool.
+    """
+    pool = get_pool(database)
+    return pool.reader() if readonly else pool.writer()
+
+
+def submit_write(fn, *args, database='main.db'):
+    """Queue fn(conn, *args) on the shared writer for `database`; returns a Future."""
+    return get_pool(database).write_queue().submit(fn, *args)
+
+
+def write(fn, *args, database='main.db'):
+    """Run fn(conn, *args) through the shared writer queue and wait for its result.
+
+    Do not call from the Tk thread; hand it to a DBWorker instead.
+    """
+    return submit_write(fn, *args, database=database).result()
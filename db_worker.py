@@ -0,0 +1,213 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import messagebox
+
+
+worker_logger = logging.getLogger('db_worker')
+
+# How often the Tk thread checks for finished jobs while any are outstanding
+POLL_MS = 15
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide thread pool that runs database jobs for every page."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='db-worker')
+        return _executor
+
+
+class DBWorker:
+    """Runs database calls off the Tk thread and hands results back to it.
+
+    Jobs run on the shared executor. Their results are queued and drained
+    by an after() poll on the Tk thread, so callbacks can touch widgets
+    safely and the mainloop never waits on SQLite. While jobs submitted
+    with busy=True are running, the page's toplevel shows a busy cursor.
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self._done = queue.Queue()
+        self._pending = 0
+        self._busy = 0
+        self._poll_id = None
+
+    def submit(self, fn, *args, on_done=None, on_error=None, busy=True):
+        """Run fn(*args) in the background; call on_done(result) or on_error(exc) on the Tk thread."""
+        self._pending += 1
+        if busy:
+            self._busy += 1
+            self._show_busy()
+        future = get_executor().submit(fn, *args)
+        future.add_done_callback(lambda f: self._done.put((f, on_done, on_error, busy)))
+        self._schedule()
+        return future
+
+    def _schedule(self):
+        if self._poll_id is None:
+            try:
+                self._poll_id = self.widget.after(POLL_MS, self._drain)
+            except Exception:
+                # Widget destroyed; nothing left to deliver results to
+                self._poll_id = None
+
+    def _drain(self):
+        self._poll_id = None
+        try:
+            alive = self.widget.winfo_exists()
+        except Exception:
+            alive = False
+        if not alive:
+            # Page closed while jobs were running; their results have nowhere to go
+            return
+        while True:
+            try:
+                future, on_done, on_error, busy = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if busy:
+                self._busy -= 1
+                if not self._busy:
+                    self._show_busy()
+            try:
+                result = future.result()
+            except Exception as e:
+                worker_logger.exception("Background database job failed")
+                (on_error or self._default_error)(e)
+            else:
+                if on_done:
+                    on_done(result)
+        if self._pending:
+            self._schedule()
+
+    def _show_busy(self):
+        try:
+            self.widget.winfo_toplevel().configure(cursor='watch' if self._busy else '')
+        except Exception:
+            pass
+
+    def _default_error(self, error):
+        messagebox.showerror("Database Error", str(error))
+
+
+class StallMonitor:
+    """Measures how late the Tk event loop services a periodic timer.
+
+    Any tick that fires more than `threshold_ms` late means the mainloop was
+    blocked for that long. Such stalls are counted and logged, giving a
+    running measure of UI responsiveness (see stats()).
+    """
+
+    def __init__(self, widget, interval_ms=100, threshold_ms=50):
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.ticks = 0
+        self.stalls = 0
+        self.max_stall_ms = 0.0
+        self._expected = None
+        self._after_id = None
+
+    def start(self):
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self._after_id = self.widget.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _tick(self):
+        now = time.perf_counter()
+        lag_ms = (now - self._expected) * 1000
+        self.ticks += 1
+        self.max_stall_ms = max(self.max_stall_ms, lag_ms)
+        if lag_ms > self.threshold_ms:
+            self.stalls += 1
+            worker_logger.warning(f"UI event loop stalled for {lag_ms:.0f} ms")
+        self._expected = now + self.interval_ms / 1000
+        try:
+            self._after_id = self.widget.after(self.interval_ms, self._tick)
+        except Exception:
+            self._after_id = None
+
+    def stats(self):
+        return {'ticks': self.ticks, 'stalls': self.stalls, 'max_stall_ms': self.max_stall_ms,
+                'threshold_ms': self.threshold_ms}
+
+
+class Debouncer:
+    """Coalesces bursts of calls (e.g. one per keystroke) into a single fn() call.
+
+    Each call restarts a `delay_ms` after() timer, so fn runs once the input
+    has been quiet that long. When `key` is given it is read at call time and
+    again before running: if it equals the key fn last ran with (an arrow
+    key, or typing a value and deleting it again), nothing is scheduled or
+    run.
+    """
+
+    def __init__(self, widget, fn, delay_ms=300, key=None):
+        self.widget = widget
+        self.fn = fn
+        self.delay_ms = delay_ms
+        self.key = key
+        self.calls = 0
+        self.runs = 0
+        self._last_key = None
+        self._has_run = False
+        self._after_id = None
+
+    def __call__(self, event=None):
+        self.calls += 1
+        if self._after_id is None and self._unchanged():
+            return
+        self.cancel()
+        try:
+            self._after_id = self.widget.after(self.delay_ms, self._fire)
+        except Exception:
+            # Widget destroyed; nothing left to recalculate for
+            self._after_id = None
+
+    def cancel(self):
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def now(self):
+        """Run fn immediately (dropping any pending call), e.g. on a discrete selection."""
+        self.cancel()
+        self._run()
+
+    def _fire(self):
+        self._after_id = None
+        try:
+            alive = self.widget.winfo_exists()
+        except Exception:
+            alive = False
+        if alive and not self._unchanged():
+            self._run()
+
+    def _unchanged(self):
+        return self.key is not None and self._has_run and self.key() == self._last_key
+
+    def _run(self):
+        if self.key is not None:
+            self._last_key = self.key()
+        self._has_run = True
+        self.runs += 1
+        self.fn()
@@ -0,0 +1,227 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from bom import parse_materials
+from db_pool import connect
+
+
+export_logger = logging.getLogger('exports')
+
+# Change-log rows kept after each refresh; exporters that fall further behind rebuild
+KEEP_CHANGES = 10000
+
+
+def ensure_export_changes(conn):
+    """Create the export_changes log and the triggers that feed it.
+
+    Every insert, update or delete of an order's materials or of a product
+    appends (entity, entity_id) with an increasing seq. Exporters remember
+    the last seq they applied and only re-serialize ids logged after it.
+    """
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS export_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            entity_id TEXT NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS export_changes_orders_ai AFTER INSERT ON orders BEGIN
+            INSERT INTO export_changes (entity, entity_id) VALUES ('orders', new.order_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS export_changes_orders_au AFTER UPDATE OF order_id, mats_need ON orders BEGIN
+            INSERT INTO export_changes (entity, entity_id) VALUES ('orders', old.order_id);
+            INSERT INTO export_changes (entity, entity_id) VALUES ('orders', new.order_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS export_changes_orders_ad AFTER DELETE ON orders BEGIN
+            INSERT INTO export_changes (entity, entity_id) VALUES ('orders', old.order_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS export_changes_products_ai AFTER INSERT ON products BEGIN
+            INSERT INTO export_changes (entity, entity_id) VALUES ('products', new.product_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS export_changes_products_au AFTER UPDATE OF product_id, product_name, materials ON products BEGIN
+            INSERT INTO export_changes (entity, entity_id) VALUES ('products', old.product_id);
+            INSERT INTO export_changes (entity, entity_id) VALUES ('products', new.product_id);
+        END;
+        CREATE TRIGGER IF NOT EXISTS export_changes_products_ad AFTER DELETE ON products BEGIN
+            INSERT INTO export_changes (entity, entity_id) VALUES ('products', old.product_id);
+        END;
+    ''')
+
+
+def load_order_totals(conn, order_ids=None):
+    """Records for order_mats_ttl.json, all of them or only `order_ids`."""
+    query = 'SELECT order_id, mats_need FROM orders'
+    params = ()
+    if order_ids is not None:
+        query += ' WHERE order_id IN (SELECT value FROM json_each(?))'
+        params = (json.dumps(list(order_ids)),)
+    records = {}
+    for order_id, mats_need in conn.execute(query, params):
+        try:
+            mats = json.loads(mats_need) if mats_need else {}
+        except json.JSONDecodeError:
+            mats = {}
+        records[str(order_id)] = {'order_id': order_id, 'mats_need': mats}
+    return records
+
+
+def load_product_materials(conn, product_ids=None):
+    """Records for products_materials.json, all of them or only `product_ids`."""
+    query = 'SELECT product_id, product_name, materials FROM products'
+    params = ()
+    if product_ids is not None:
+        query += ' WHERE product_id IN (SELECT value FROM json_each(?))'
+        params = (json.dumps(list(product_ids)),)
+    return {str(product_id): {'product_id': product_id, 'product_name': name, 'materials': parse_materials(materials)}
+            for product_id, name, materials in conn.execute(query, params)}
+
+
+class IncrementalJsonExport:
+    """Keeps one JSON list export in step with a table using export_changes.
+
+    Every entry, on a full rebuild or a patch, comes from
+    `load_records(conn, ids)` and is serialized by _serialize, so a patched
+    file is byte-for-byte what a rebuild would write. The first refresh
+    serializes every record. Later refreshes query and re-serialize only
+    the ids logged since then and splice them into the cached per-entry
+    JSON. The output is a single JSON list, so each refresh still rewrites
+    the whole file; that write grows with the table and dominates a refresh
+    on large tables. If anything goes wrong, or the log has been pruned
+    past this exporter, it falls back to the full rebuild.
+    """
+
+    def __init__(self, database, path, entity, key, load_records):
+        self.database = database
+        self.path = path
+        self.entity = entity
+        self.key = key
+        self.load_records = load_records
+
+        self._lock = threading.Lock()
+        self._fragments = None
+        self._last_seq = None
+        self.last_timings = {}
+
+    def _max_seq(self, conn):
+        return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM export_changes').fetchone()[0]
+
+    @staticmethod
+    def _serialize(record):
+        return json.dumps(record)
+
+    def rebuild(self):
+        """Full rebuild: serialize every record and rewrite the file."""
+        start = time.perf_counter()
+        conn = connect(self.database)
+        try:
+            ensure_export_changes(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+        conn = connect(self.database, readonly=True)
+        try:
+            # One read transaction, so seq and the records come from the same snapshot
+            conn.execute('BEGIN')
+            seq = self._max_seq(conn)
+            records = self.load_records(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        self._fragments = {entity_id: self._serialize(record) for entity_id, record in records.items()}
+        self._write()
+        self._last_seq = seq
+        self.last_timings = {'mode': 'full', 'total': time.perf_counter() - start, 'changed': len(records)}
+
+    def refresh(self):
+        """Bring the export file up to date and return how many entries were re-serialized."""
+        with self._lock:
+            try:
+                if self._fragments is None or not os.path.exists(self.path):
+                    self.rebuild()
+                    return self.last_timings['changed']
+                return self._patch()
+            except Exception as e:
+                export_logger.warning(f"Incremental export of {self.path} failed, rebuilding: {e}")
+                self._fragments = None
+                self.rebuild()
+                return self.last_timings['changed']
+
+    def _patch(self):
+        start = time.perf_counter()
+        conn = connect(self.database, readonly=True)
+        try:
+            # One read transaction: a change committed between these reads must be
+            # either fully seen (row and seq) or left entirely for the next refresh
+            conn.execute('BEGIN')
+            first_seq = conn.execute('SELECT MIN(seq) FROM export_changes').fetchone()[0]
+            if first_seq is not None and first_seq > self._last_seq + 1:
+                raise LookupError("change log pruned past last export")
+            last_seq = self._max_seq(conn)
+            changes = conn.execute('SELECT seq, entity_id FROM export_changes WHERE entity = ? AND seq > ? AND seq <= ?',
+                                   (self.entity, self._last_seq, last_seq)).fetchall()
+            dirty = {entity_id for _, entity_id in changes}
+            records = self.load_records(conn, dirty) if dirty else {}
+            conn.commit()
+        finally:
+            conn.close()
+        if not dirty:
+            self._last_seq = last_seq
+            self.last_timings = {'mode': 'patch', 'total': time.perf_counter() - start, 'changed': 0}
+            return 0
+
+        for entity_id in dirty:
+            if entity_id in records:
+                self._fragments[entity_id] = self._serialize(records[entity_id])
+            else:
+                self._fragments.pop(entity_id, None)
+        patched = time.perf_counter()
+
+        self._write()
+        self._last_seq = last_seq
+        self._prune(last_seq)
+        done = time.perf_counter()
+        self.last_timings = {'mode': 'patch', 'patch': patched - start, 'write': done - patched,
+                             'total': done - start, 'changed': len(dirty)}
+        return len(dirty)
+
+    def _write(self):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write('[' + ', '.join(self._fragments.values()) + ']')
+        os.replace(tmp_path, self.path)
+
+    def _prune(self, last_seq):
+        if last_seq <= KEEP_CHANGES:
+            return
+        conn = connect(self.database)
+        try:
+            conn.execute('DELETE FROM export_changes WHERE seq <= ?', (last_seq - KEEP_CHANGES,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+_exports = {}
+_exports_lock = threading.Lock()
+
+
+def _get_export(database, path, entity, key, load_records):
+    cache_key = (os.path.abspath(database), os.path.abspath(path))
+    with _exports_lock:
+        export = _exports.get(cache_key)
+        if export is None:
+            export = _exports[cache_key] = IncrementalJsonExport(database, path, entity, key, load_records)
+        return export
+
+
+def export_total_amount_mats_incremental(database, path):
+    """Incremental counterpart of global_func.export_total_amount_mats."""
+    return _get_export(database, path, 'orders', 'order_id', load_order_totals).refresh()
+
+
+def export_materials_to_json_incremental(database, path):
+    """Incremental counterpart of global_func.export_materials_to_json."""
+    return _get_export(database, path, 'products', 'product_id', load_product_materials).refresh()
@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+from PIL import Image
+from customtkinter import CTkImage
+
+
+# Distinct (path, size) icons kept decoded; the least recently used is dropped past this
+IMAGE_CACHE_SIZE = 64
+
+_images = OrderedDict()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def get_ctk_image(path, size=None):
+    """Shared CTkImage for the image file at `path`, decoded only the first time.
+
+    `size` is the display size handed to CTkImage (its default when None);
+    the decoded image is also shrunk to it so large source files are not
+    kept at full resolution. Pages built again reuse the same instance, and
+    with it the PhotoImages CTkImage has already rendered for each scaling.
+    Call from the Tk thread.
+    """
+    key = (path, size)
+    image = _images.get(key)
+    if image is not None:
+        _stats['hits'] += 1
+        _images.move_to_end(key)
+        return image
+
+    _stats['misses'] += 1
+    with Image.open(path) as source:
+        decoded = source.resize(size) if size else source.copy()
+    image = CTkImage(decoded, size=size) if size else CTkImage(decoded)
+    _images[key] = image
+    if len(_images) > IMAGE_CACHE_SIZE:
+        _images.popitem(last=False)
+    return image
+
+
+def clear_image_cache():
+    """Forget every cached image, e.g. after the Tk root has been recreated or the files changed."""
+    _images.clear()
+
+
+def image_cache_stats():
+    return dict(_stats, size=len(_images), limit=IMAGE_CACHE_SIZE)
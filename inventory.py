@@ -0,0 +1,99 @@
+import json
+
+from db_pool import StaleRowError
+
+
+def _load_stock(c, mat_names):
+    """Return {mat_name: (mat_id, balance, version)} for `mat_names` in one query; missing names map to None."""
+    rows = c.execute('''
+        SELECT n.value, m.mat_id, COALESCE(b.balance, 0), COALESCE(b.version, 0)
+        FROM json_each(?) n
+        LEFT JOIN raw_mat_master m
+            ON m.mat_id = (SELECT mat_id FROM raw_mat_master WHERE mat_name = n.value LIMIT 1)
+        LEFT JOIN stock_balances b ON b.mat_id = m.mat_id
+    ''', (json.dumps(list(mat_names)),)).fetchall()
+    return {name: (mat_id, qty, version) if mat_id is not None else None for name, mat_id, qty, version in rows}
+
+
+def _deduct(c, stock, movements, kind):
+    # movements: [(mat_name, qty, ref)]. Compare-and-swap on the balance versions read
+    # into `stock`, then append the movements; the ledger triggers update the balances.
+    if not movements:
+        return
+    expected = {stock[mat_name][0]: stock[mat_name][2] for mat_name, _, _ in movements}
+    unchanged = c.execute('''
+        SELECT COUNT(*) FROM json_each(?) e
+        JOIN stock_balances b
+            ON b.mat_id = json_extract(e.value, '$[0]') AND b.version = json_extract(e.value, '$[1]')
+    ''', (json.dumps(list(expected.items())),)).fetchone()[0]
+    if unchanged != len(expected):
+        raise StaleRowError("Stock changed while it was being reserved")
+    c.executemany('INSERT INTO stock_movements (mat_id, kind, qty, ref) VALUES (?, ?, ?, ?)',
+                  [(stock[mat_name][0], kind, -qty, None if ref is None else str(ref))
+                   for mat_name, qty, ref in movements])
+
+
+def reserve_materials(conn, mats_need, ref=None, kind='order_deduction'):
+    """Check and deduct every material in `mats_need` ({mat_name: qty}) in one pass.
+
+    All balances are read with a single query and, when every material is
+    available, deducted by appending one `kind` movement per material
+    (tagged with `ref`, usually the order id) to the stock ledger.
+    The deduction is a compare-and-swap on the balance versions, so stock
+    changed by another writer since it was read raises StaleRowError
+    instead of being double-deducted; run it as a writer queue job to have
+    that retried. Returns the list of shortage messages; stock is only
+    touched when that list is empty.
+    """
+    c = conn.cursor()
+    stock = _load_stock(c, mats_need)
+
+    insufficient = []
+    for mat_name, mat_qty_needed in mats_need.items():
+        if stock.get(mat_name) is None:
+            insufficient.append(f"{mat_name}: Not found in inventory.")
+            continue
+        current_qty = stock[mat_name][1]
+        if current_qty < mat_qty_needed:
+            insufficient.append(f"{mat_name}: Need {mat_qty_needed}, Have {current_qty}")
+
+    if not insufficient:
+        _deduct(c, stock, [(mat_name, qty, ref) for mat_name, qty in mats_need.items()], kind)
+    return insufficient
+
+
+def reserve_materials_batch(conn, demands):
+    """Allocate stock to many orders at once.
+
+    `demands` is a list of (order_id, mats_need) in priority order. Stock for
+    every material involved is read once; orders are then taken greedily,
+    each one accepted only if all of its materials still fit in what is left.
+    The accepted orders' movements are appended with one compare-and-swap
+    executemany, inside the caller's transaction. Returns
+    (approved_ids, {order_id: [shortages]}).
+    """
+    c = conn.cursor()
+    stock = _load_stock(c, {name for _, mats_need in demands for name in mats_need})
+    remaining = {name: entry[1] for name, entry in stock.items() if entry is not None}
+
+    approved = []
+    rejected = {}
+    movements = []
+    for order_id, mats_need in demands:
+        insufficient = []
+        for mat_name, mat_qty_needed in mats_need.items():
+            if mat_name not in remaining:
+                insufficient.append(f"{mat_name}: Not found in inventory.")
+            elif remaining[mat_name] < mat_qty_needed:
+                insufficient.append(f"{mat_name}: Need {mat_qty_needed}, Have {remaining[mat_name]}")
+        if insufficient:
+            rejected[order_id] = insufficient
+            continue
+
+        for mat_name, mat_qty_needed in mats_need.items():
+            remaining[mat_name] -= mat_qty_needed
+            movements.append((mat_name, mat_qty_needed, order_id))
+        approved.append(order_id)
+
+    _deduct(c, stock, movements, 'order_deduction')
+    return approved, rejected
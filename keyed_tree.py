@@ -0,0 +1,80 @@
+class KeyedTree:
+    """ttk.Treeview rows bound to a key column (item iid = str(key)).
+
+    sync() diffs a new result set against what the tree shows and only
+    deletes, inserts, updates or reorders the rows that differ, so a refresh
+    where one order changed is a handful of Tk calls instead of one per
+    row. Because iids are stable, the selection and focus survive a
+    refresh, and the view stays on the row that was at the top.
+    """
+
+    def __init__(self, tree, key=None):
+        self.tree = tree
+        self.key = key or (lambda values: values[0])
+        # iid -> (values, tags) as last written, to detect changed rows without asking Tk
+        self._shown = {}
+
+    def iid(self, values):
+        return str(self.key(values))
+
+    def insert(self, rows, index='end', tags=None):
+        """Insert rows at `index` (a position or 'end'); returns their iids."""
+        iids = []
+        for i, values in enumerate(rows):
+            iid = self.iid(values)
+            row_tags = tuple(tags[i]) if tags else ()
+            self.tree.insert('', index if index == 'end' else index + i, iid=iid, values=values, tags=row_tags)
+            self._shown[iid] = (tuple(values), row_tags)
+            iids.append(iid)
+        return iids
+
+    def delete(self, iids):
+        if iids:
+            self.tree.delete(*iids)
+        for iid in iids:
+            self._shown.pop(iid, None)
+
+    def clear(self):
+        self.delete(self.tree.get_children())
+
+    def sync(self, rows, tags=None):
+        """Make the tree show exactly `rows`, in order; `tags` is an optional parallel list.
+
+        Returns (inserted, updated, deleted) counts.
+        """
+        tree = self.tree
+        before = tree.get_children()
+        anchor = self._top_item(before)
+
+        new_iids = [self.iid(values) for values in rows]
+        wanted = set(new_iids)
+        # Rows put in the tree behind our back (other iids) are dropped too
+        gone = [iid for iid in before if iid not in wanted]
+        self.delete(gone)
+        present = set(before)
+        self._shown = {iid: shown for iid, shown in self._shown.items() if iid in wanted and iid in present}
+
+        inserted = updated = 0
+        for i, (iid, values) in enumerate(zip(new_iids, rows)):
+            entry = (tuple(values), tuple(tags[i]) if tags else ())
+            shown = self._shown.get(iid)
+            if shown == entry:
+                continue
+            if shown is None and iid not in present:
+                tree.insert('', 'end', iid=iid, values=entry[0], tags=entry[1])
+                inserted += 1
+            else:
+                tree.item(iid, values=entry[0], tags=entry[1])
+                updated += 1
+            self._shown[iid] = entry
+
+        if tree.get_children() != tuple(new_iids):
+            tree.set_children('', *new_iids)
+        if (inserted or gone or before != tuple(new_iids)) and anchor in wanted and new_iids:
+            tree.yview_moveto(tree.index(anchor) / len(new_iids))
+        return inserted, updated, len(gone)
+
+    def _top_item(self, children):
+        if not children:
+            return None
+        return children[min(int(round(float(self.tree.yview()[0]) * len(children))), len(children) - 1)]
@@ -0,0 +1,182 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from db_pool import connect
+
+
+# Orders that still count against stock: Pending ones need it, Approved ones already had it deducted
+PLAN_STATUSES = ('Pending', 'Approved')
+
+# Quantities closer than this are treated as equal, so float sums do not report phantom shortfalls
+EPSILON = 1e-9
+
+
+class MRPResult:
+    """Material requirements across every open order, from compute_mrp().
+
+    `materials` has one row per material: on_hand (current stock, already
+    net of Approved orders), allocated (what Approved orders took), demand
+    (what Pending orders need), net (on_hand - demand), shortfall, orders
+    (Pending orders needing it) and first_short_order. `short_orders`
+    lists the Pending orders that would not fit if every Pending order
+    were put through batch approval in order_id order: an order short on
+    any material is skipped and takes no stock, so later orders may still
+    fit (see serve_in_order). first_short_order is the first order skipped
+    for lack of that material.
+    `estimated_orders` counts orders with no recorded materials whose
+    needs were taken from their product's BOM.
+    """
+
+    def __init__(self, materials, short_orders, pending_orders, approved_orders, estimated_orders, elapsed):
+        self.materials = materials
+        self.short_orders = short_orders
+        self.pending_orders = pending_orders
+        self.approved_orders = approved_orders
+        self.estimated_orders = estimated_orders
+        self.elapsed = elapsed
+
+    def shortages(self):
+        return self.materials[self.materials['shortfall'] > 0]
+
+    def rows(self, shortages_only=False):
+        """The table as plain tuples in column order, worst shortfall first; no first_short_order is None."""
+        materials = self.shortages() if shortages_only else self.materials
+        return [(name, float(on_hand), float(allocated), float(demand), float(net), float(shortfall), int(orders),
+                 None if pd.isna(first) else int(first))
+                for name, on_hand, allocated, demand, net, shortfall, orders, first in materials.itertuples(index=False)]
+
+
+def load_mrp_inputs(conn, statuses=PLAN_STATUSES):
+    """Read open order lines, unrecorded orders, product BOMs and stock as DataFrames.
+
+    Order lines come from order_materials, the same per-order totals that
+    approval deducts, with a pending flag per line. Orders with no lines
+    there are returned separately with their product and quantity. Each
+    query is a single pass; nothing is read per order.
+    """
+    placeholders = ', '.join('?' * len(statuses))
+    # order_materials.order_id is TEXT; the cast keeps its primary key usable for the lookups
+    lines = pd.DataFrame(conn.execute(f'''
+        SELECT o.order_id, om.mat_name, om.qty, o.status_quo = 'Pending'
+        FROM orders o JOIN order_materials om ON om.order_id = CAST(o.order_id AS TEXT)
+        WHERE o.status_quo IN ({placeholders})
+    ''', statuses).fetchall(), columns=['order_id', 'mat_name', 'qty', 'pending'])
+    unrecorded = pd.DataFrame(conn.execute(f'''
+        SELECT o.order_id, o.product_id, o.quantity, o.status_quo = 'Pending'
+        FROM orders o
+        WHERE o.status_quo IN ({placeholders})
+          AND NOT EXISTS (SELECT 1 FROM order_materials om WHERE om.order_id = CAST(o.order_id AS TEXT))
+    ''', statuses).fetchall(), columns=['order_id', 'product_id', 'quantity', 'pending'])
+    boms = pd.DataFrame(conn.execute('SELECT product_id, mat_name, qty FROM product_materials').fetchall(),
+                        columns=['product_id', 'mat_name', 'qty'])
+    stock = pd.DataFrame(conn.execute('SELECT mat_name, mat_volume FROM raw_mats').fetchall(),
+                         columns=['mat_name', 'on_hand'])
+    return lines, unrecorded, boms, stock
+
+
+def serve_in_order(order_ids, codes, qty, on_hand):
+    """Replay batch approval's greedy rule over Pending order lines.
+
+    Orders are served in order_id order. One that does not fit in what is
+    left of every material is skipped and takes nothing, so a later,
+    smaller order can still fit. Returns (short order ids, first short
+    order per material code, -1 where none).
+    """
+    first_short = np.full(len(on_hand), -1, dtype=np.int64)
+    needs = pd.DataFrame({'order_id': order_ids, 'code': codes, 'qty': qty}).groupby(
+        ['order_id', 'code'], sort=True)['qty'].sum().reset_index()
+    seq_orders = needs['order_id'].to_numpy()
+    seq_codes = needs['code'].to_numpy()
+    seq_qty = needs['qty'].to_numpy()
+
+    # Until the first order that would be short nothing is skipped, so a running total per material decides it
+    running = pd.Series(seq_qty).groupby(seq_codes).cumsum().to_numpy()
+    over = running > on_hand[seq_codes] + EPSILON
+    if not over.any():
+        return [], first_short
+    fits = seq_orders < seq_orders[over].min()
+    remaining = (on_hand - np.bincount(seq_codes[fits], weights=seq_qty[fits], minlength=len(on_hand))).tolist()
+
+    # From there on, walk the remaining orders one at a time
+    short_orders = []
+    tail_orders = seq_orders[~fits].tolist()
+    tail_codes = seq_codes[~fits].tolist()
+    tail_qty = seq_qty[~fits].tolist()
+    start = 0
+    while start < len(tail_orders):
+        order_id = tail_orders[start]
+        end = start
+        while end < len(tail_orders) and tail_orders[end] == order_id:
+            end += 1
+        short = [code for code, need in zip(tail_codes[start:end], tail_qty[start:end])
+                 if need > remaining[code] + EPSILON]
+        if short:
+            short_orders.append(order_id)
+            for code in short:
+                if first_short[code] < 0:
+                    first_short[code] = order_id
+        else:
+            for code, need in zip(tail_codes[start:end], tail_qty[start:end]):
+                remaining[code] -= need
+        start = end
+    return short_orders, first_short
+
+
+def plan(lines, unrecorded, boms, stock):
+    """Aggregate demand per material against stock in one vectorized pass; returns MRPResult."""
+    start = time.perf_counter()
+
+    # Orders with nothing in order_materials: BOM x quantity, as calculate_materials would give
+    unrecorded = unrecorded.assign(product_id=unrecorded['product_id'].astype(str),
+                                   quantity=pd.to_numeric(unrecorded['quantity'], errors='coerce').fillna(0))
+    estimated = unrecorded.merge(boms.astype({'product_id': str}), on='product_id')
+    estimated = pd.DataFrame({'order_id': estimated['order_id'], 'mat_name': estimated['mat_name'],
+                              'qty': estimated['qty'].astype(float) * estimated['quantity'],
+                              'pending': estimated['pending']})
+    if len(estimated):
+        lines = pd.concat([lines, estimated], ignore_index=True)
+    pending = lines['pending'].to_numpy(dtype=bool)
+    all_orders = pd.concat([lines[['order_id', 'pending']], unrecorded[['order_id', 'pending']]]).drop_duplicates('order_id')
+
+    # One integer code per material name; stock and demand are then plain arrays indexed by code
+    stock_by_name = stock.groupby('mat_name')['on_hand'].sum()
+    names = pd.Index(stock_by_name.index).append(pd.Index(lines['mat_name'].unique())).unique()
+    codes = names.get_indexer(lines['mat_name'])
+    n = len(names)
+    on_hand = np.zeros(n)
+    on_hand[names.get_indexer(stock_by_name.index)] = stock_by_name.to_numpy(dtype=float)
+    qty = lines['qty'].to_numpy(dtype=float)
+
+    demand = np.bincount(codes[pending], weights=qty[pending], minlength=n)
+    allocated = np.bincount(codes[~pending], weights=qty[~pending], minlength=n)
+    order_count = np.bincount(codes[pending], minlength=n)
+
+    short_orders, first_short = serve_in_order(pd.to_numeric(lines['order_id']).to_numpy()[pending],
+                                               codes[pending], qty[pending], on_hand)
+
+    shortfall = np.maximum(demand - on_hand, 0)
+    shortfall[shortfall < EPSILON] = 0
+    materials = pd.DataFrame({'mat_name': names, 'on_hand': on_hand, 'allocated': allocated, 'demand': demand,
+                              'net': on_hand - demand, 'shortfall': shortfall, 'orders': order_count,
+                              'first_short_order': pd.array(np.where(first_short >= 0, first_short, None),
+                                                            dtype='Int64')})
+    materials = materials.sort_values(['shortfall', 'mat_name'], ascending=[False, True], ignore_index=True)
+
+    pending_orders = int(all_orders['pending'].astype(bool).sum())
+    return MRPResult(materials, short_orders, pending_orders,
+                     len(all_orders) - pending_orders, len(unrecorded), time.perf_counter() - start)
+
+
+def compute_mrp(database='main.db'):
+    """Load every open order and plan materials for all of them at once; returns MRPResult."""
+    start = time.perf_counter()
+    conn = connect(database, readonly=True)
+    try:
+        inputs = load_mrp_inputs(conn)
+    finally:
+        conn.close()
+    result = plan(*inputs)
+    result.elapsed = time.perf_counter() - start
+    return result
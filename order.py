@@ -1,9 +1,17 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from tkcalendar import DateEntry
-import json
 import traceback
 
+from bom import parse_materials, ensure_product_materials, get_cached_bom, invalidate_bom
+from db_pool import connect
+from db_worker import DBWorker, Debouncer
+from keyed_tree import KeyedTree
+from timestamps import ensure_timestamp_columns, format_date
+from order_status import ensure_row_versions
+from order_service import OrderService, validate_order
+from approval_dialogs import show_order_approval
+from stock_ledger import ensure_stock_ledger
+
 
 class OrderManagementUI:
     def __init__(self, parent_frame, db_manager, session=None, controller=None, parent_window=None):
@@ -12,6 +20,8 @@ class OrderManagementUI:
         self.session = session or {}
         self.controller = controller
         self.parent_window = parent_window
+        self.db_worker = DBWorker(parent_frame)
+        self.orders = OrderService()
 
         # Tk variables and widgets initialized in setup
         self.order_name_var = None
@@ -26,9 +36,11 @@ class OrderManagementUI:
 
         # Calculation state
         self.order_materials_data = {}
+        self.materials_recalc = None
 
     # UI setup
     def setup(self):
+        from tkcalendar import DateEntry
         main_canvas = tk.Canvas(self.parent_frame, bg='#ffffff', highlightthickness=0)
         main_scrollbar = ttk.Scrollbar(self.parent_frame, orient="vertical", command=main_canvas.yview)
         scrollable_frame = tk.Frame(main_canvas, bg='#ffffff')
@@ -79,6 +91,8 @@ class OrderManagementUI:
         quantity_entry = tk.Entry(details_grid, textvariable=self.order_quantity_var, font=('Segoe UI', 9), relief='solid', bd=2, width=12)
         quantity_entry.grid(row=0, column=1, sticky='ew', padx=(0, 10), pady=4, ipady=3)
         quantity_entry.bind('<KeyRelease>', self.on_quantity_changed)
+        # One recalculation once typing pauses, and none if product and quantity did not change
+        self.materials_recalc = Debouncer(self.parent_frame, self.calculate_materials, key=self._materials_inputs)
 
         tk.Label(details_grid, text="Deadline:", font=('Segoe UI', 10, 'bold'), bg='#ffffff', fg='#34495e').grid(row=0, column=2, sticky='w', padx=(0, 8), pady=4)
         self.deadline_tab = tk.StringVar()
@@ -129,15 +143,19 @@ class OrderManagementUI:
 
         main_canvas.bind("<MouseWheel>", _on_mousewheel_order)
 
+        self.prepare_product_materials()
         self.load_products_and_clients()
 
     # Event handlers and helpers
     def on_product_selected(self, event=None):
         self.display_product_materials()
-        self.calculate_materials()
+        self.materials_recalc.now()
 
     def on_quantity_changed(self, event=None):
-        self.calculate_materials()
+        self.materials_recalc()
+
+    def _materials_inputs(self):
+        return self.selected_product_var.get().strip(), self.order_quantity_var.get().strip()
 
     def display_product_materials(self):
         selected_product = self.selected_product_var.get().strip()
@@ -161,23 +179,11 @@ class OrderManagementUI:
             self.product_materials_text.config(state='disabled')
 
     def parse_materials(self, materials_string):
-        if not materials_string:
-            return {}
-        import re
-        materials = {}
-        items = re.split(r'[;,]', materials_string)
-        for item in items:
-            item = item.strip()
-            if not item:
-                continue
-            match = re.match(r'(.+?)\s*[-:]\s*(\d+)', item)
-            if match:
-                material_name = match.group(1).strip()
-                quantity = int(match.group(2))
-                materials[material_name] = quantity
-            else:
-                materials[item] = 0
-        return materials
+        return parse_materials(materials_string)
+
+    def get_product_bom(self, product_id):
+        # Served from the in-process cache after the first lookup
+        return get_cached_bom(product_id)
 
     def calculate_materials(self):
         try:
@@ -191,12 +197,9 @@ class OrderManagementUI:
             if quantity <= 0:
                 raise ValueError("Quantity must be positive")
             product_id = selected_product.split('(')[-1].strip(')')
-            materials_string = self.db_manager.get_product_materials(product_id)
-            if not materials_string:
-                raise ValueError("No materials found for this product")
-            materials_dict = self.parse_materials(materials_string)
+            materials_dict = self.get_product_bom(product_id)
             if not materials_dict:
-                raise ValueError("Materials format not recognized")
+                raise ValueError("No materials found for this product")
             self.order_materials_data = {}
             calculation_text = f"For {quantity} units:\n\n"
             for material_name, unit_quantity in materials_dict.items():
@@ -224,7 +227,24 @@ class OrderManagementUI:
         self.required_materials_text.config(state='disabled')
 
     # Data loading
+    def prepare_product_materials(self):
+        conn = None
+        try:
+            conn = connect('main.db')
+            ensure_product_materials(conn)
+            ensure_stock_ledger(conn)
+            ensure_row_versions(conn)
+            ensure_timestamp_columns(conn)
+            conn.commit()
+        except Exception as e:
+            print(f"Error preparing product materials: {e}")
+        finally:
+            if conn:
+                conn.close()
+
     def load_products_and_clients(self):
+        # Products may have been edited elsewhere since the cache was filled
+        invalidate_bom()
         try:
             product_options = self.db_manager.get_products_for_dropdown()
             self.product_combo['values'] = product_options
@@ -235,74 +255,62 @@ class OrderManagementUI:
 
     # CRUD: Orders
     def create_order(self):
-        from global_func import export_total_amount_mats
         order_name = self.order_name_var.get().strip()
         selected_product = self.selected_product_var.get().strip()
         selected_client = self.selected_client_var.get().strip()
         quantity = self.order_quantity_var.get().strip()
         deadline = self.deadline_tab.get().strip()
 
-        if not order_name:
-            messagebox.showerror("Error", "Please enter an order name.")
-            return
-        if not selected_product:
-            messagebox.showerror("Error", "Please select a product.")
+        # Form checks answer at once; OrderService repeats them and checks the ids when it writes
+        _, error = validate_order(order_name, selected_product, selected_client, quantity, deadline)
+        if error:
+            messagebox.showerror("Error", error)
             return
-        if not selected_client:
-            messagebox.showerror("Error", "Please select a client.")
-            return
-        if not quantity:
-            messagebox.showerror("Error", "Please enter quantity.")
-            return
-        try:
-            quantity_int = int(quantity)
-            if quantity_int <= 0:
-                raise ValueError
-        except ValueError:
-            messagebox.showerror("Error", "Quantity must be a positive whole number.")
-            return
-        if not deadline:
-            messagebox.showerror("Error", "Please enter a deadline.")
-            return
-        if not hasattr(self, "order_materials_data") or not self.order_materials_data:
+        if not self.order_materials_data:
             messagebox.showerror("Error", "Please calculate required materials first.")
             return
-        try:
-            materials_json = json.dumps(self.order_materials_data)
-            product_id = selected_product.split('(')[-1].strip(')')
-            client_id = selected_client.split('(')[-1].strip(')')
-            order_id = self.db_manager.create_order(order_name, product_id, client_id, quantity_int, deadline, materials_json)
-
-            self.order_name_var.set("")
-            self.selected_product_var.set("")
-            self.selected_client_var.set("")
-            self.order_quantity_var.set("")
-            self.deadline_tab.set("")
+        product_id = selected_product.split('(')[-1].strip(')')
+        client_id = selected_client.split('(')[-1].strip(')')
+        self.db_worker.submit(self.orders.create_order, order_name, product_id, client_id, quantity, deadline,
+                              dict(self.order_materials_data),
+                              on_done=lambda result: self._on_order_created(order_name, product_id, client_id, result),
+                              on_error=lambda e: messagebox.showerror("Database Error", f"Error creating order: {str(e)}"))
+
+    def _on_order_created(self, order_name, product_id, client_id, result):
+        from exports import export_total_amount_mats_incremental
+        outcome, detail = result
+        if outcome != 'created':
+            messagebox.showerror("Error", detail)
+            return
+        order_id = detail
 
-            self.product_materials_text.config(state='normal')
-            self.product_materials_text.delete(1.0, tk.END)
-            self.product_materials_text.config(state='disabled')
-            self.required_materials_text.config(state='normal')
-            self.required_materials_text.delete(1.0, tk.END)
-            self.required_materials_text.config(state='disabled')
+        self.order_name_var.set("")
+        self.selected_product_var.set("")
+        self.selected_client_var.set("")
+        self.order_quantity_var.set("")
+        self.deadline_tab.set("")
+        self.order_materials_data = {}
 
-            # Optional logging to product logger if present in caller
-            try:
-                import logging
-                product_logger = logging.getLogger('product_logger')
-                if self.session and 'user_id' in self.session:
-                    user_id = self.session.get('user_id')
-                    user_name = self.session.get('f_name', self.session.get('username', 'Unknown'))
-                    product_logger.info(f"User {user_name} (ID: {user_id}) created order '{order_name}' (ID: {order_id}) for product ID: {product_id}, client ID: {client_id}, quantity: {quantity_int}")
-            except Exception:
-                pass
+        self.product_materials_text.config(state='normal')
+        self.product_materials_text.delete(1.0, tk.END)
+        self.product_materials_text.config(state='disabled')
+        self.required_materials_text.config(state='normal')
+        self.required_materials_text.delete(1.0, tk.END)
+        self.required_materials_text.config(state='disabled')
 
-            messagebox.showinfo("Success", f"Order '{order_name}' created successfully!\nOrder ID: {order_id}")
-        except (TypeError, json.JSONDecodeError) as e:
-            messagebox.showerror("Format Error", f"Invalid materials data format: {str(e)}")
-        except Exception as e:
-            messagebox.showerror("Database Error", f"Error creating order: {str(e)}")
-        export_total_amount_mats('main.db', 'C:/capstone/json_f/order_mats_ttl.json')
+        # Optional logging to product logger if present in caller
+        try:
+            import logging
+            product_logger = logging.getLogger('product_logger')
+            if self.session and 'user_id' in self.session:
+                user_id = self.session.get('user_id')
+                user_name = self.session.get('f_name', self.session.get('username', 'Unknown'))
+                product_logger.info(f"User {user_name} (ID: {user_id}) created order '{order_name}' (ID: {order_id}) for product ID: {product_id}, client ID: {client_id}")
+        except Exception:
+            pass
+
+        messagebox.showinfo("Success", f"Order '{order_name}' created successfully!\nOrder ID: {order_id}")
+        export_total_amount_mats_incremental('main.db', 'C:/capstone/json_f/order_mats_ttl.json')
 
     def edit_order(self, order_id, order_name, product_id, client_id, quantity, deadline):
         from tkcalendar import DateEntry
@@ -490,29 +498,22 @@ class OrderManagementUI:
         order_tree.pack(side=tk.LEFT, fill='both', expand=True, padx=10, pady=10)
         v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=10)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
+        order_rows = KeyedTree(order_tree)
+
+        def fill_orders(orders):
+            rows = []
+            tags = []
+            for order in orders:
+                order_id, name, product_name, client_name, quantity, mats_need, deadline, order_date, product_id, client_id, status_quo = order
+                rows.append((order_id or 'N/A', name or 'N/A', product_name or 'N/A', client_name or 'N/A', quantity or 'N/A', mats_need or 'N/A', deadline or 'N/A', format_date(order_date), status_quo or 'N/A'))
+                tags.append((product_id, client_id))
+            # Only changed rows are touched, so the selection and scroll position survive a reload
+            order_rows.sync(rows, tags)
 
         def load_orders():
-            for item in order_tree.get_children():
-                order_tree.delete(item)
-            try:
-                orders = self.db_manager.get_all_orders()
-                for order in orders:
-                    order_id, name, product_name, client_name, quantity, mats_need, deadline, order_date, product_id, client_id, status_quo = order
-                    formatted_date = order_date
-                    try:
-                        from datetime import datetime
-                        if order_date:
-                            try:
-                                dt = datetime.strptime(order_date, '%Y-%m-%d %H:%M:%S.%f')
-                                formatted_date = dt.strftime('%m/%d/%Y')
-                            except:
-                                dt = datetime.strptime(order_date, '%Y-%m-%d %H:%M:%S')
-                                formatted_date = dt.strftime('%m/%d/%Y')
-                    except Exception:
-                        pass
-                    order_tree.insert('', 'end', values=(order_id or 'N/A', name or 'N/A', product_name or 'N/A', client_name or 'N/A', quantity or 'N/A', mats_need or 'N/A', deadline or 'N/A', formatted_date or 'N/A', status_quo or 'N/A'), tags=(product_id, client_id))
-            except Exception as e:
-                messagebox.showerror("Database Error", f"Error loading orders: {str(e)}")
+            # Fetch on the DB worker thread, fill the tree back on the Tk thread
+            self.db_worker.submit(self.db_manager.get_all_orders, on_done=fill_orders,
+                                  on_error=lambda e: messagebox.showerror("Database Error", f"Error loading orders: {str(e)}"))
 
         load_orders()
 
@@ -543,50 +544,19 @@ class OrderManagementUI:
                 return
             item = order_tree.item(selection[0])
             values = item['values']
-            order_id = values[0]
-            conn = self.db_manager.get_connection()
-            c = conn.cursor()
-            try:
-                order_info = c.execute("""
-                    SELECT o.order_id, o.status_quo, p.product_id, p.status_quo
-                    FROM orders o
-                    JOIN products p ON o.product_id = p.product_id
-                    WHERE o.order_id = ?
-                """, (order_id,)).fetchone()
-                if not order_info:
-                    messagebox.showerror('Not Found', f'Order ID: {order_id} cannot be found')
+            approve(values[0])
+
+        def approve(order_id, allow_cancelled=False):
+            def on_approved(result):
+                from exports import export_materials_to_json_incremental
+                if not show_order_approval(order_id, result, lambda: approve(order_id, allow_cancelled=True)):
                     return
-                searched_order_id = order_info[0]
-                order_status = order_info[1]
-                prod_id = order_info[2]
-                prod_status = order_info[3]
-                if order_status == "Pending" and prod_status == "Approved":
-                    self.db_manager.deduct_materials_for_order(order_id)
-                    self.db_manager.approve_order(order_id)
-                    messagebox.showinfo("Success", f"Order ID: {searched_order_id} Approved!")
-                    from global_func import export_materials_to_json
-                    export_materials_to_json("main.db", "C:/capstone/json_f/products_materials.json")
-                elif prod_status == "Pending":
-                    messagebox.showinfo("Info", f"Order ID: {searched_order_id}, Product ID {prod_id} Status: {prod_status}")
-                elif prod_status == "Cancelled":
-                    messagebox.showwarning("Warning", f"Order ID: {searched_order_id}, Product ID {prod_id} Status: {prod_status}")
-                elif order_status == "Approved":
-                    messagebox.showinfo("Info", f"Order ID: {order_id} has been already approved.")
-                elif order_status == "Cancelled":
-                    if messagebox.askyesno('Order has been cancelled. Do you want to approve?'):
-                        self.db_manager.deduct_materials_for_order(order_id)
-                        self.db_manager.approve_order(order_id)
-                        messagebox.showinfo("Success", f"Order ID: {searched_order_id} Approved!")
-                        from global_func import export_materials_to_json
-                        export_materials_to_json("main.db", "C:/capstone/json_f/products_materials.json")
-                conn.commit()
-            except Exception as e:
-                conn.rollback()
-                messagebox.showerror('Database Error', str(e))
-                print(e)
-            finally:
-                conn.close()
-            load_orders()
+                if result[0] == 'approved':
+                    export_materials_to_json_incremental("main.db", "C:/capstone/json_f/products_materials.json")
+                load_orders()
+
+            self.db_worker.submit(self.orders.approve_order, order_id, allow_cancelled, on_done=on_approved,
+                                  on_error=lambda e: messagebox.showerror('Database Error', str(e)))
 
         def cancel_selected_order():
             selection = order_tree.selection()
@@ -596,14 +566,19 @@ class OrderManagementUI:
             item = order_tree.item(selection[0])
             values = item['values']
             order_id = values[0]
-            status = 'Cancelled'
-            conn = self.db_manager.get_connection()
-            c = conn.cursor()
-            c.execute("UPDATE orders SET status_quo = ? WHERE order_id = ?", (status, order_id))
-            conn.commit()
-            conn.close()
-            messagebox.showinfo("Success", f"Order '{order_id}' has been cancelled successfully!")
-            load_orders()
+
+            def on_cancelled(result):
+                outcome, prev_status = result
+                if outcome == 'cancelled':
+                    messagebox.showinfo("Success", f"Order '{order_id}' has been cancelled successfully!")
+                elif outcome == 'not_found':
+                    messagebox.showerror("Not Found", f"Order ID: {order_id} cannot be found")
+                else:
+                    messagebox.showwarning("Cannot Cancel", f"Order '{order_id}' is {prev_status} and cannot be cancelled.")
+                load_orders()  # Refresh the list
+
+            # Guarded status change through the shared writer queue
+            self.db_worker.submit(self.orders.cancel_order, order_id, on_done=on_cancelled)
 
         def delete_selected_order():
             selection = order_tree.selection()
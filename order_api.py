@@ -0,0 +1,541 @@
+import argparse
+import asyncio
+import functools
+import hashlib
+import ipaddress
+import json
+import logging
+import re
+import secrets
+import sqlite3
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+from bom import ensure_product_materials
+from db_pool import connect, get_pool, write
+from exports import export_total_amount_mats_incremental
+from order_materials import ensure_order_materials
+from order_search import ensure_order_search_index, search_orders
+from order_service import OrderService, can_manage_orders
+from order_status import ensure_row_versions
+from stock_ledger import ensure_stock_ledger
+from timestamps import STORED_FORMAT, ensure_timestamp_columns
+
+
+api_logger = logging.getLogger('order_api')
+
+# SQLite calls run on this many threads; writes still go through the one writer queue
+API_WORKERS = 4
+
+# Requests waiting for a worker beyond this are answered 503 instead of queueing without bound
+MAX_PENDING = 64
+
+MAX_BODY = 1 << 20
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Latencies kept per route for the percentiles in /metrics
+LATENCY_WINDOW = 2048
+
+# Seconds a resolved token is trusted before it is looked up again (so revoking takes effect within this)
+TOKEN_TTL = 60
+
+# The order totals export the pages keep in step after creating orders
+ORDER_TOTALS_JSON = 'C:/capstone/json_f/order_mats_ttl.json'
+
+STATUS_TEXT = {200: 'OK', 201: 'Created', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+               404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+               500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+# HTTP status per OrderService outcome; any other outcome means the order's state did not allow it (409)
+SUCCESS_OUTCOMES = {'approved': 200, 'cancelled': 200, 'delivered': 200, 'created': 201}
+OUTCOME_STATUS = {'not_found': 404, 'invalid': 400}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class LatencyMetrics:
+    """Request counts, status codes and recent latencies per route, for /metrics."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.routes = {}
+        self.started = time.time()
+
+    def record(self, route, status, elapsed):
+        entry = self.routes.get(route)
+        if entry is None:
+            entry = self.routes[route] = {'count': 0, 'statuses': {}, 'total_s': 0.0, 'max_s': 0.0,
+                                          'recent': deque(maxlen=self.window)}
+        entry['count'] += 1
+        entry['statuses'][status] = entry['statuses'].get(status, 0) + 1
+        entry['total_s'] += elapsed
+        entry['max_s'] = max(entry['max_s'], elapsed)
+        entry['recent'].append(elapsed)
+
+    def snapshot(self):
+        routes = {}
+        for route, entry in self.routes.items():
+            recent = sorted(entry['recent'])
+
+            def pct(p):
+                return recent[min(len(recent) - 1, int(len(recent) * p))] * 1000
+
+            routes[route] = {'count': entry['count'], 'statuses': {str(k): v for k, v in entry['statuses'].items()},
+                             'mean_ms': entry['total_s'] / entry['count'] * 1000, 'max_ms': entry['max_s'] * 1000,
+                             'p50_ms': pct(0.50), 'p95_ms': pct(0.95), 'p99_ms': pct(0.99)}
+        return {'uptime_s': time.time() - self.started, 'routes': routes}
+
+
+def ensure_api_tokens(conn):
+    """Create the api_tokens table: one row per issued token, holding only its SHA-256."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS api_tokens (
+            token_hash TEXT PRIMARY KEY,
+            user_id INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_api_tokens_user ON api_tokens(user_id)')
+
+
+def ensure_api_schema(conn):
+    """Writer queue job: the tables, views and triggers the order pages set up at startup, plus api_tokens."""
+    ensure_product_materials(conn)
+    ensure_order_search_index(conn)
+    ensure_order_materials(conn)
+    ensure_stock_ledger(conn)
+    ensure_row_versions(conn)
+    ensure_timestamp_columns(conn)
+    ensure_api_tokens(conn)
+
+
+def _hash_token(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def issue_token_job(conn, user_id):
+    """Writer queue job: issue a new API token for a user and return it. It is not stored, so show it once."""
+    ensure_api_tokens(conn)
+    if not conn.execute('SELECT 1 FROM users WHERE user_id = ?', (user_id,)).fetchone():
+        raise ValueError(f"Unknown user ID: {user_id}")
+    token = secrets.token_urlsafe(32)
+    conn.execute('INSERT INTO api_tokens (token_hash, user_id) VALUES (?, ?)', (_hash_token(token), user_id))
+    return token
+
+
+def revoke_tokens_job(conn, user_id):
+    """Writer queue job: revoke every token of a user; returns how many there were."""
+    ensure_api_tokens(conn)
+    return conn.execute('DELETE FROM api_tokens WHERE user_id = ?', (user_id,)).rowcount
+
+
+def resolve_token(conn, token):
+    """The user a token belongs to as {user_id, username, usertype}, or None."""
+    try:
+        row = conn.execute('''
+            SELECT u.user_id, u.username, u.usertype
+            FROM api_tokens t
+            JOIN users u ON u.user_id = t.user_id
+            WHERE t.token_hash = ?
+        ''', (_hash_token(token),)).fetchone()
+    except sqlite3.OperationalError:
+        # No api_tokens table yet: nobody has a token
+        return None
+    return {'user_id': row[0], 'username': row[1], 'usertype': row[2]} if row else None
+
+
+def auth_configured(database='main.db'):
+    """True once at least one token has been issued to an existing user."""
+    conn = connect(database, readonly=True)
+    try:
+        return conn.execute('''
+            SELECT 1 FROM api_tokens t JOIN users u ON u.user_id = t.user_id LIMIT 1
+        ''').fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _rows_to_dicts(cur, rows):
+    columns = [col[0] for col in cur.description]
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class OrderAPI:
+    """Local HTTP/JSON API over main.db for scanners and reports.
+
+    Routes mirror the OrdersPage actions and share OrderService with it:
+
+        GET  /orders?q=&status=&limit=&offset=   search (q) or list, optionally by status
+        GET  /orders/<id>
+        POST /orders                             {order_name, product_id, client_id, quantity, deadline
+                                                  [, materials][, order_date]}
+        POST /orders/<id>/approve                {"allow_cancelled": false}
+        POST /orders/<id>/cancel
+        POST /orders/<id>/deliver                {["timestamp": "YYYY-MM-DD HH:MM:SS"]}
+        GET  /inventory?name=
+        GET  /metrics
+
+    Every request needs "Authorization: Bearer <token>" with a token from
+    issue_token_job (401 otherwise). Creating and changing orders also
+    needs a user type allowed by can_manage_orders (403 otherwise), and
+    deliveries are recorded as changed by the token's user.
+
+    start() first runs the same ensure_* schema setup as the order pages, so
+    the jobs work against a database the pages have never opened.
+
+    The event loop only parses and routes; every SQLite call runs on a
+    pool of `workers` threads. At most `max_pending` calls may be waiting
+    or running at once, beyond that requests get 503 right away. Action
+    results are {"outcome", "order_id", "detail"} with 200/201 on
+    success, 404 for unknown orders, 400 for bad input and 409 when the
+    order's state does not allow the action.
+
+    New orders refresh `order_totals_export` (None to skip) as the order
+    page does. Approving, cancelling and delivering only change
+    status_quo, which that export does not carry, so they leave it alone.
+    """
+
+    def __init__(self, database='main.db', workers=API_WORKERS, max_pending=MAX_PENDING,
+                 order_totals_export=ORDER_TOTALS_JSON):
+        self.database = database
+        self.orders = OrderService(database)
+        self.order_totals_export = order_totals_export
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api-db')
+        self.metrics = LatencyMetrics()
+        self.pending = 0
+        self.rejected = 0
+        self.server = None
+        self._connections = {}
+        self._tokens = {}
+        # (method, path pattern, metrics name, handler, needs an order manager)
+        self.routes = [
+            ('GET', re.compile(r'/orders'), 'GET /orders', self.list_orders, False),
+            ('POST', re.compile(r'/orders'), 'POST /orders', self.create_order, True),
+            ('GET', re.compile(r'/orders/([^/]+)'), 'GET /orders/<id>', self.get_order, False),
+            ('POST', re.compile(r'/orders/([^/]+)/approve'), 'POST /orders/<id>/approve', self.approve_order, True),
+            ('POST', re.compile(r'/orders/([^/]+)/cancel'), 'POST /orders/<id>/cancel', self.cancel_order, True),
+            ('POST', re.compile(r'/orders/([^/]+)/deliver'), 'POST /orders/<id>/deliver', self.deliver_order, True),
+            ('GET', re.compile(r'/inventory'), 'GET /inventory', self.list_inventory, False),
+            ('GET', re.compile(r'/metrics'), 'GET /metrics', self.get_metrics, False),
+        ]
+
+    async def start(self, host='127.0.0.1', port=8765):
+        await self.call(write, ensure_api_schema, database=self.database)
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        """Stop accepting, drop idle keep-alive connections and wait for running SQLite calls."""
+        if self.server:
+            self.server.close()
+        for writer in list(self._connections.values()):
+            writer.close()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        if self.server:
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+    async def call(self, fn, *args, **kwargs):
+        """Run a blocking SQLite call on the worker pool, or fail fast with 503 when it is saturated."""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ApiError(503, "Server busy, retry shortly")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.pending -= 1
+
+    # HTTP
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                start = time.perf_counter()
+                route, status, payload = await self._dispatch(method, target, headers, body)
+                self.metrics.record(route, status, time.perf_counter() - start)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except ApiError as e:
+            self._write_response(writer, e.status, {'error': str(e)}, False)
+        finally:
+            self._connections.pop(task, None)
+            writer.close()
+
+    async def _read_request(self, reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, target, _ = line.decode('latin-1').split(' ', 2)
+        except ValueError:
+            raise ApiError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get('content-length') or 0)
+        except ValueError:
+            raise ApiError(400, "Invalid Content-Length")
+        if length > MAX_BODY:
+            raise ApiError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    def _write_response(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload, default=str).encode('utf-8')
+        writer.write((f'HTTP/1.1 {status} {STATUS_TEXT.get(status, "")}\r\n'
+                      f'Content-Type: application/json\r\n'
+                      f'Content-Length: {len(data)}\r\n'
+                      f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n').encode('latin-1') + data)
+
+    async def _authenticate(self, headers):
+        """The user behind the request's bearer token; ApiError 401 without a valid one."""
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        token = token.strip()
+        if scheme.lower() != 'bearer' or not token:
+            raise ApiError(401, "Missing bearer token")
+        cached = self._tokens.get(token)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        user = await self.call(self._resolve_token, token)
+        if user is None:
+            self._tokens.pop(token, None)
+            raise ApiError(401, "Invalid or revoked token")
+        self._tokens[token] = (user, time.monotonic() + TOKEN_TTL)
+        return user
+
+    def _resolve_token(self, token):
+        conn = connect(self.database, readonly=True)
+        try:
+            return resolve_token(conn, token)
+        finally:
+            conn.close()
+
+    async def _dispatch(self, method, target, headers, body):
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip('/') or '/'
+        allowed = None
+        for route_method, pattern, name, handler, manage in self.routes:
+            match = pattern.fullmatch(path)
+            if not match:
+                continue
+            allowed = name.split(' ', 1)[1]
+            if route_method != method:
+                continue
+            try:
+                user = await self._authenticate(headers)
+                if manage and not can_manage_orders(user['usertype']):
+                    raise ApiError(403, f"User {user['username']} may not change orders")
+                data = json.loads(body) if body else {}
+                if not isinstance(data, dict):
+                    raise ApiError(400, "Request body must be a JSON object")
+                status, payload = await handler(user, query, data, *match.groups())
+            except ApiError as e:
+                status, payload = e.status, {'error': str(e)}
+            except json.JSONDecodeError as e:
+                status, payload = 400, {'error': f"Invalid JSON: {e}"}
+            except sqlite3.Error as e:
+                api_logger.exception(f"{method} {path} failed")
+                status, payload = 500, {'error': f"Database error: {e}"}
+            except Exception as e:
+                api_logger.exception(f"{method} {path} failed")
+                status, payload = 500, {'error': str(e)}
+            return name, status, payload
+        if allowed:
+            return f'{method} {allowed}', 405, {'error': f"{method} not allowed on {path}"}
+        return 'unmatched', 404, {'error': f"No route for {path}"}
+
+    # Handlers: (user, query, body, *path groups) -> (status, payload)
+
+    async def list_orders(self, user, query, body):
+        limit = min(_int_param(query, 'limit', PAGE_SIZE), MAX_PAGE_SIZE)
+        offset = _int_param(query, 'offset', 0)
+        orders = await self.call(self._read_orders, query.get('q', '').strip(), query.get('status'), limit, offset)
+        return 200, {'orders': orders, 'limit': limit, 'offset': offset}
+
+    def _read_orders(self, term, status, limit, offset):
+        conn = connect(self.database, readonly=True)
+        try:
+            if term:
+                # Ranked like the page's search
+                rows = search_orders(conn, term, limit, offset, status)
+                return _rows_to_dicts(conn.execute('SELECT * FROM orders LIMIT 0'), rows)
+            if status:
+                cur = conn.execute('SELECT * FROM orders WHERE status_quo = ? ORDER BY order_id LIMIT ? OFFSET ?',
+                                   (status, limit, offset))
+            else:
+                cur = conn.execute('SELECT * FROM orders ORDER BY order_id LIMIT ? OFFSET ?', (limit, offset))
+            return _rows_to_dicts(cur, cur.fetchall())
+        finally:
+            conn.close()
+
+    async def get_order(self, user, query, body, order_id):
+        order = await self.call(self._read_order, order_id)
+        if order is None:
+            raise ApiError(404, f"Order ID: {order_id} cannot be found")
+        return 200, order
+
+    def _read_order(self, order_id):
+        conn = connect(self.database, readonly=True)
+        try:
+            cur = conn.execute('SELECT * FROM orders WHERE order_id = ?', (order_id,))
+            rows = _rows_to_dicts(cur, cur.fetchall())
+            return rows[0] if rows else None
+        finally:
+            conn.close()
+
+    async def create_order(self, user, query, body):
+        materials = body.get('materials')
+        if materials is not None and not isinstance(materials, dict):
+            raise ApiError(400, "materials must be an object of {material: quantity}")
+        result = await self.call(self._create_order, str(body.get('order_name') or '').strip(),
+                                 body.get('product_id'), body.get('client_id'), body.get('quantity'),
+                                 str(body.get('deadline') or '').strip(), materials,
+                                 _timestamp_param(body, 'order_date'))
+        outcome, detail = result
+        if outcome == 'created':
+            api_logger.info(f"User {user['username']} (ID: {user['user_id']}) created order ID: {detail}")
+            return 201, {'outcome': outcome, 'order_id': detail, 'detail': None}
+        return self._action_result(result, None)
+
+    def _create_order(self, *args):
+        result = self.orders.create_order(*args)
+        if result[0] == 'created' and self.order_totals_export:
+            # The order is committed either way; a stale export is rebuilt on its next refresh
+            try:
+                export_total_amount_mats_incremental(self.database, self.order_totals_export)
+            except Exception:
+                api_logger.exception(f"Refreshing {self.order_totals_export} failed")
+        return result
+
+    async def approve_order(self, user, query, body, order_id):
+        result = await self.call(self.orders.approve_order, order_id, bool(body.get('allow_cancelled')))
+        return self._action_result(result, order_id)
+
+    async def cancel_order(self, user, query, body, order_id):
+        return self._action_result(await self.call(self.orders.cancel_order, order_id), order_id)
+
+    async def deliver_order(self, user, query, body, order_id):
+        result = await self.call(self.orders.deliver_order, order_id, user['user_id'],
+                                 _timestamp_param(body, 'timestamp'))
+        return self._action_result(result, order_id)
+
+    def _action_result(self, result, order_id):
+        outcome, detail = result
+        status = SUCCESS_OUTCOMES.get(outcome) or OUTCOME_STATUS.get(outcome, 409)
+        return status, {'outcome': outcome, 'order_id': order_id, 'detail': detail}
+
+    async def list_inventory(self, user, query, body):
+        return 200, {'materials': await self.call(self._read_inventory, query.get('name', '').strip())}
+
+    def _read_inventory(self, name):
+        conn = connect(self.database, readonly=True)
+        try:
+            cur = conn.execute('SELECT * FROM raw_mats WHERE mat_name LIKE ? ORDER BY mat_name', (f'%{name}%',))
+            return _rows_to_dicts(cur, cur.fetchall())
+        finally:
+            conn.close()
+
+    async def get_metrics(self, user, query, body):
+        metrics = self.metrics.snapshot()
+        metrics.update({'workers': self.workers, 'pending': self.pending, 'max_pending': self.max_pending,
+                        'rejected': self.rejected, 'pool': get_pool(self.database).stats()})
+        return 200, metrics
+
+
+def _int_param(query, name, default):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+    if value < 0:
+        raise ApiError(400, f"{name} must not be negative")
+    return value
+
+
+def _timestamp_param(body, name):
+    """An optional client-supplied time, which must be in the stored 'YYYY-MM-DD HH:MM:SS' form."""
+    value = body.get(name)
+    if value is None:
+        return None
+    try:
+        return datetime.strptime(value, STORED_FORMAT).strftime(STORED_FORMAT)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{name} must be a 'YYYY-MM-DD HH:MM:SS' string")
+
+
+async def serve(database='main.db', host='127.0.0.1', port=8765, workers=API_WORKERS, max_pending=MAX_PENDING):
+    if not is_loopback(host) and not auth_configured(database):
+        raise ValueError(f"Refusing to listen on {host}: no API tokens issued yet (see --issue-token)")
+    api = OrderAPI(database, workers, max_pending)
+    host, port = await api.start(host, port)
+    api_logger.info(f"Order API on http://{host}:{port} over {database}")
+    print(f"Order API listening on http://{host}:{port}")
+    try:
+        await api.server.serve_forever()
+    finally:
+        await api.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local HTTP/JSON API for orders and inventory")
+    parser.add_argument('--database', default='main.db')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=API_WORKERS)
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING)
+    parser.add_argument('--issue-token', type=int, metavar='USER_ID', help='print a new token for this user and exit')
+    parser.add_argument('--revoke-tokens', type=int, metavar='USER_ID', help="revoke this user's tokens and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.issue_token is not None:
+        try:
+            print(write(issue_token_job, args.issue_token, database=args.database))
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.revoke_tokens is not None:
+        print(f"Revoked {write(revoke_tokens_job, args.revoke_tokens, database=args.database)} token(s)")
+    else:
+        try:
+            asyncio.run(serve(args.database, args.host, args.port, args.workers, args.max_pending))
+        except ValueError as e:
+            parser.error(str(e))
+        except KeyboardInterrupt:
+            pass
@@ -1,36 +1,38 @@
 import tkinter as tk
-from tkcalendar import Calendar
-from tkcalendar import DateEntry
 from tkinter import ttk
 from tkinter import messagebox, filedialog
 import customtkinter
 import customtkinter as ctk
-from customtkinter import CTkLabel, CTkEntry, CTkButton, CTkFrame, CTkImage, CTkToplevel, CTkComboBox
-from PIL import Image
+from customtkinter import CTkLabel, CTkEntry, CTkButton, CTkFrame, CTkToplevel, CTkComboBox
 import sqlite3
 import time
 from datetime import datetime
-import pytz
-import matplotlib
-matplotlib.use('TkAgg')
-import matplotlib.pyplot as plt
 import logging
 
 
 #Data Imports
-import pandas as pd
-import json
 import os
 import sys
 sys.path.append("C:/capstone")
 
 #File imports
-from product import ProductManagementSystem
-from order import OrderManagementUI
 from database import DatabaseManager
 from pages_handler import FrameNames
 from global_func import on_show, handle_logout, export_total_amount_mats
-from product_crud import ProductsPage
+from exports import export_total_amount_mats_incremental
+from db_pool import connect, write
+from db_worker import DBWorker, StallMonitor
+from order_search import ensure_order_search_index, search_orders
+from order_grid import KeysetOrderGrid
+from order_materials import ensure_order_materials
+from order_status import ensure_row_versions
+from order_service import OrderService, can_manage_orders, insert_orders
+from approval_dialogs import show_order_approval
+from stock_ledger import ensure_stock_ledger
+from order_export import export_table
+from timestamps import ensure_timestamp_columns, now_text
+from image_cache import get_ctk_image
+from keyed_tree import KeyedTree
 
 
 class OrdersPage(tk.Frame):
@@ -46,9 +48,7 @@ class OrdersPage(tk.Frame):
             self.main_desc = CTkFrame(self, fg_color="#84a8db", height=50, corner_radius=0)
             self.main_desc.pack(side="top", fill="x", padx=(0, 0), pady=(0, 10))  # Sticks to the top, fills X
 
-            novus_logo = Image.open('C:/capstone/labels/novus_logo1.png')
-            novus_logo = novus_logo.resize((50, 50))
-            self.novus_photo = CTkImage(novus_logo, size=(50, 50))
+            self.novus_photo = get_ctk_image('C:/capstone/labels/novus_logo1.png', size=(50, 50))
 
             logging.basicConfig(filename='C:/capstone/log_f/actions.log', level=logging.INFO,
                                 format='%(asctime)s - %(levelname)s - %(message)s')
@@ -104,11 +104,15 @@ class OrdersPage(tk.Frame):
             # Add Approve, Cancel for Status
             self.srch_btn = self.add_del_upd('SEARCH', '#5dade2',command=self.upd_srch_order)
             self.add_btn = self.add_del_upd('ADD', '#2ecc71', command=self.add_orders)
+            self.import_btn = self.add_del_upd('IMPORT', '#16a085', command=self.import_orders)
             self.approve_order_btn = self.add_del_upd('APPROVE', '#27ae60',command=self.approve_order)
+            self.batch_approve_btn = self.add_del_upd('BATCH APPROVE', '#1e8449', command=self.batch_approve_orders)
             self.deliver_order_btn = self.add_del_upd('DELIVERED', '#3498db', command=self.order_done)
             self.cancel_order_btn = self.add_del_upd('CANCEL', '#95a5a6', command=self.cancel_order)
             self.del_btn = self.add_del_upd('DELETE', '#e74c3c', command=self.del_order)
             self.excel_btn = self.add_del_upd('UPDATE', '#f39c12', command=self.upd_order)
+            self.export_btn = self.add_del_upd('EXPORT', '#8e44ad', command=self.export_orders)
+            self.mrp_panel_btn = self.add_del_upd('MRP', '#d35400', command=self.show_mrp)
 
             # Treeview style
             style = ttk.Style(self)
@@ -125,6 +129,7 @@ class OrdersPage(tk.Frame):
                 columns=('order_id', 'order_name', 'product_id', 'client_id', 
                         'order_amount', 'order_date', 'order_dl','mats_need', 'status_quo'),
                 show='headings',
+                selectmode='extended',
                 style='Treeview'
             )
             self.order_tree.bind("<Double-1>", self.show_materials_popup)
@@ -158,10 +163,38 @@ class OrdersPage(tk.Frame):
             tree_frame.grid_rowconfigure(0, weight=1)
             tree_frame.grid_columnconfigure(0, weight=1)
 
+            # Pages orders into the tree as the user scrolls instead of loading the whole table
+            self.order_grid = KeysetOrderGrid(self.order_tree, self.scrollbar)
+
+            # Searches, approvals and deliveries run off the Tk thread; the monitor logs any UI stall over 50 ms
+            self.db_worker = DBWorker(self)
+            self.orders = OrderService()
+            self._search_seq = 0
+            self.stall_monitor = StallMonitor(self, threshold_ms=50)
+            self.stall_monitor.start()
+
+            self._prepare_database()
             self.load_orders_from_db()
 
+    def _prepare_database(self):
+        conn = None
+        try:
+            conn = connect('main.db')
+            ensure_order_search_index(conn)
+            ensure_order_materials(conn)
+            ensure_stock_ledger(conn)
+            ensure_row_versions(conn)
+            ensure_timestamp_columns(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            print("Error preparing order tables:", e)
+        finally:
+            if conn:
+                conn.close()
+
     def open_products_crud(self):
         try:
+            from product_crud import ProductsPage
             top = tk.Toplevel(self)
             top.title("Products Management")
             top.geometry("1300x700")
@@ -184,90 +217,60 @@ class OrdersPage(tk.Frame):
 
             if order_stat != "None" and order_stat != "All Status" and order_stat in order_status:
                 try:
-                    conn = sqlite3.connect('main.db')
-                    c = conn.cursor()
-                    all_order_stat = c.execute('SELECT * FROM orders WHERE status_quo = ?', (order_stat,)).fetchall()
-
-                    for i in self.order_tree.get_children():
-                        self.order_tree.delete(i)
-                    
-                    if all_order_stat:
-                        for i in all_order_stat:
-                            self.order_tree.insert("", "end", values=i)
-                    else:
+                    if not self.order_grid.reset('status_quo = ?', (order_stat,)):
                         messagebox.showerror("No Orders", f"No Orders with Status: {order_stat}")
                         self.load_orders_from_db()
                 except sqlite3.Error as e:
                     messagebox.showerror("Database Error", str(e))
                     return
-                finally:
-                    if conn:
-                        conn.close()
-                        
+
             elif order_stat == "All Status":
                 try:
-                    conn = sqlite3.connect('main.db')
-                    c = conn.cursor()
-                    all_orders = c.execute('SELECT * FROM orders').fetchall()
-
-                    for i in self.order_tree.get_children():
-                        self.order_tree.delete(i)
-                    
-                    if all_orders:
-                        for i in all_orders:
-                            self.order_tree.insert("", "end", values=i)
-                    else:
+                    if not self.order_grid.reset():
                         messagebox.showerror("No Orders", "No orders found.")
-                        self.load_orders_from_db()
 
                 except sqlite3.Error as e:
                     messagebox.showerror("Database Error", str(e))
-                    self.load_orders_from_db()
-                finally:
-                    if conn:
-                        conn.close()
             else:
                 print('Working Properly')
                 pass
 
         elif search_order:
-            try:
-                conn = sqlite3.connect('main.db')
-                c = conn.cursor()
-                # Search across multiple columns
-                query = '''
-                    SELECT * FROM orders
-                    WHERE order_id LIKE ?
-                    OR order_name LIKE ?
-                    OR product_id LIKE ?
-                    OR client_id LIKE ?
-                    OR quantity LIKE ?
-                    OR deadline LIKE ?
-                    OR mats_need LIKE ?
-                    OR status_quo LIKE ?
-                    ORDER BY order_id
-                '''
-                like_val = f'%{search_order}%'
-                orders = c.execute(query, (like_val,)*8).fetchall()
-
-                for i in self.order_tree.get_children():
-                    self.order_tree.delete(i)
-                
-                if orders:
-                    for order in orders:
-                        self.order_tree.insert("", "end", values=order)
-                else:
-                    messagebox.showerror("No Orders", f"No orders found matching: {search_order}")
-                    self.load_orders_from_db()
-
-            except sqlite3.Error as e:
-                messagebox.showerror("Database Error", str(e))
-                self.load_orders_from_db()
-            finally:
-                if conn:
-                    conn.close()
+            # Only the newest search may fill the tree; earlier ones still in flight are dropped
+            self._search_seq += 1
+            seq = self._search_seq
+            self.db_worker.submit(self._run_search, search_order,
+                                  on_done=lambda orders: self._show_search_results(seq, search_order, orders),
+                                  on_error=lambda e: self._search_failed(seq, e))
+
+    def _run_search(self, search_order):
+        # Runs on the DB worker thread
+        conn = connect('main.db', readonly=True)
+        try:
+            # Ranked first page from the orders_fts index (falls back to LIKE)
+            return search_orders(conn, search_order)
+        finally:
+            conn.close()
+
+    def _show_search_results(self, seq, search_order, orders):
+        if seq != self._search_seq:
+            return
+        self.order_grid.suspend()
+        # Rows already on screen are kept (and stay selected); only the difference is applied
+        self.order_grid.rows.sync(orders)
+
+        if not orders:
+            messagebox.showerror("No Orders", f"No orders found matching: {search_order}")
+            self.load_orders_from_db()
+
+    def _search_failed(self, seq, error):
+        if seq != self._search_seq:
+            return
+        messagebox.showerror("Database Error", str(error))
+        self.load_orders_from_db()
 
     def add_orders(self):
+        from order import OrderManagementUI
         # Open the Order Management UI in a separate top-level window
         top = tk.Toplevel(self)
         top.title("Order Management")
@@ -297,160 +300,253 @@ class OrdersPage(tk.Frame):
         )
         order_ui.setup()
 
-    def approve_order(self):
-        if (user_type := self.controller.session.get('usertype')) not in ('admin', 'owner', 'manager', 'supplier'):
-
-            messagebox.showwarning("Access Denied", "You do not have permission to approve orders.")
-            return
-    
-        try:
-            with open('C:/capstone/json_f/order_mats_ttl.json', 'r') as f:
-                try:
-                    ttl_mats_list = json.load(f)
-                except json.JSONDecodeError:
-                    print("❌ JSON file is empty or invalid.")
-                    ttl_mats_list = []
-        except FileNotFoundError:
-            messagebox.showerror("File Error", "Could not find 'order_mats_ttl.json'.")
+    def import_orders(self):
+        # pandas is only loaded once someone actually imports a sheet
+        from order_import import prepare_order_import
+        path = filedialog.askopenfilename(
+            title="Import Orders",
+            filetypes=[("Order sheets", "*.csv *.xlsx *.xls"), ("CSV files", "*.csv"), ("Excel files", "*.xlsx *.xls")])
+        if not path:
             return
 
-        selected = self.order_tree.focus()
-        if not selected:
-            messagebox.showwarning("No Selection", "Please select an order to approve.")
+        # Reading, validation and material totals all happen off the Tk thread
+        self.db_worker.submit(prepare_order_import, path, on_done=self._on_import_prepared,
+                              on_error=lambda e: messagebox.showerror("Import Error", str(e)))
+
+    def _on_import_prepared(self, batch, limit=25):
+        name = os.path.basename(batch.path)
+        if batch.errors:
+            lines = [f"Line {line}: {message}" for line, message in batch.errors[:limit]]
+            if len(batch.errors) > limit:
+                lines.append(f"... and {len(batch.errors) - limit} more")
+            if not batch.rows:
+                messagebox.showerror("Import Error", f"No valid orders in {name}:\n\n" + "\n".join(lines))
+                return
+            if not messagebox.askyesno("Import Orders",
+                                       f"{len(batch.errors)} line(s) in {name} will be skipped:\n\n" + "\n".join(lines) +
+                                       f"\n\nImport the other {len(batch.rows)} order(s)?"):
+                return
+        elif not batch.rows:
+            messagebox.showinfo("Import Orders", f"{name} has no orders.")
             return
 
-        values = self.order_tree.item(selected, 'values')
-        order_id = values[0]
+        self.db_worker.submit(self._import_rows, batch.rows,
+                              on_done=lambda count: self._on_orders_imported(name, count))
 
-        conn = None
-        try:
-            conn = sqlite3.connect('main.db')
-            c = conn.cursor()
-            order_info = c.execute("""
-                SELECT o.order_id, o.status_quo, p.product_id, p.status_quo
-                FROM orders o
-                JOIN products p ON o.product_id = p.product_id
-                WHERE o.order_id = ?
-            """, (order_id,)).fetchone()
-
-            if not order_info:
-                messagebox.showerror("Not Found", f"Order ID: {order_id} cannot be found")
-                return
+    def _import_rows(self, rows):
+        # Runs on the DB worker thread: one insert transaction, then one export refresh
+        count = write(insert_orders, rows)
+        export_total_amount_mats_incremental('main.db', 'C:/capstone/json_f/order_mats_ttl.json')
+        return count
 
-            searched_order_id, order_status, prod_id, prod_status = order_info[0],  order_info[1], order_info[2], order_info[3]
+    def _on_orders_imported(self, name, count):
+        logging.info(f"User ID {self.controller.session.get('user_id')} imported {count} orders from {name}")
+        messagebox.showinfo("Import Orders", f"Imported {count} order(s) from {name}.")
+        self.load_orders_from_db()
 
-            if order_status == "Pending" and prod_status == "Approved":
-                selected_order = next((order for order in ttl_mats_list if order['order_id'] == order_id), None)
-                if not selected_order:
-                    messagebox.showerror('Error', f'Order ID: {order_id} not found in JSON data')
-                    return
+    def export_orders(self):
+        top = tk.Toplevel(self)
+        top.title("Export Orders")
+        top.geometry("380x300")
+        top.config(bg="white")
+        top.transient(self)
 
-                mats_need = selected_order['mats_need']
+        tables = {"Orders": 'orders', "Order History": 'order_history'}
+        table_var = tk.StringVar(value="Orders")
+        status_var = tk.StringVar(value="All Status")
+        fields = [
+            ("Table:", CTkComboBox(top, variable=table_var, values=list(tables), width=180)),
+            ("Status:", CTkComboBox(top, variable=status_var, width=180,
+                                    values=["All Status", "Approved", "Pending", "Delivered", "Cancelled"])),
+            ("From:", CTkEntry(top, width=180, placeholder_text="YYYY-MM-DD")),
+            ("To:", CTkEntry(top, width=180, placeholder_text="YYYY-MM-DD")),
+        ]
+        for i, (label, widget) in enumerate(fields):
+            CTkLabel(top, text=label, font=('Futura', 13, 'bold')).grid(row=i, column=0, padx=15, pady=10, sticky='e')
+            widget.grid(row=i, column=1, padx=10, pady=10, sticky='w')
+        from_entry, to_entry = fields[2][1], fields[3][1]
+
+        def start_export():
+            dates = []
+            for entry in (from_entry, to_entry):
+                value = entry.get().strip()
+                if value:
+                    try:
+                        value = datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+                    except ValueError:
+                        messagebox.showerror("Input Error", f"Invalid date: {value} (use YYYY-MM-DD)", parent=top)
+                        return
+                dates.append(value or None)
 
-                insufficient = []
-                mats_stock = {}
+            table = tables.get(table_var.get(), 'orders')
+            path = filedialog.asksaveasfilename(
+                parent=top, title="Export Orders", initialfile=f"{table}.csv", defaultextension=".csv",
+                filetypes=[("CSV files", "*.csv"), ("Parquet files", "*.parquet")])
+            if not path:
+                return
+            status = status_var.get()
+            top.destroy()
 
-                # First, check all materials
-                for mat_name, mat_qty_needed in mats_need.items():
-                    mats_fetch = c.execute("""
-                        SELECT mat_id, mat_name, mat_volume
-                        FROM raw_mats WHERE mat_name = ?
-                    """, (mat_name,)).fetchone()
+            # Rows stream from SQL to the file on the DB worker; only one batch is held at a time
+            self.export_btn.configure(state='disabled')
+            self.db_worker.submit(export_table, path, table, None if status == "All Status" else status, *dates,
+                                  on_done=lambda count: self._on_exported(path, count),
+                                  on_error=self._export_failed)
 
-                    if not mats_fetch:
-                        insufficient.append(f"{mat_name}: Not found in inventory.")
-                        continue
+        CTkButton(top, text="Export", fg_color='#8e44ad', width=120, command=start_export).grid(
+            row=len(fields), column=0, columnspan=2, pady=15)
 
-                    mat_id, _, current_qty = mats_fetch
-                    mats_stock[mat_name] = (mat_id, current_qty)
+    def _on_exported(self, path, count):
+        self.export_btn.configure(state='normal')
+        logging.info(f"User ID {self.controller.session.get('user_id')} exported {count} rows to {path}")
+        messagebox.showinfo("Export Orders", f"Exported {count} row(s) to {os.path.basename(path)}.")
 
-                    if current_qty < mat_qty_needed:
-                        insufficient.append(f"{mat_name}: Need {mat_qty_needed}, Have {current_qty}")
+    def _export_failed(self, error):
+        self.export_btn.configure(state='normal')
+        messagebox.showerror("Export Error", str(error))
 
-                if insufficient:
-                    messagebox.showerror("Insufficient Materials", "Order cannot be approved:\n" + "\n".join(insufficient))
-                    return
+    def show_mrp(self):
+        from mrp import compute_mrp
+        top = tk.Toplevel(self)
+        top.title("Material Requirements")
+        top.geometry("1100x550")
+        top.config(bg="white")
+        top.transient(self)
 
-                # All materials are sufficient, proceed to deduct and approve
-                for mat_name, mat_qty_needed in mats_need.items():
-                    mat_id, current_qty = mats_stock[mat_name]
-                    deducted_val = current_qty - mat_qty_needed
-                    c.execute("UPDATE raw_mats SET mat_volume = ? WHERE mat_id = ?", (deducted_val, mat_id))
-
-                new_status = "Approved"
-                c.execute('UPDATE orders SET status_quo = ? WHERE order_id = ?', (new_status, searched_order_id))
-                messagebox.showinfo("Success", f"Order ID: {searched_order_id} Approved!")
-
-            elif prod_status == "Pending":
-                messagebox.showinfo("Pending Product", f"Order ID: {searched_order_id}, Product ID {prod_id} Status: {prod_status}")
-            elif prod_status == "Cancelled":
-                messagebox.showwarning("Cancelled Product", f"Order ID: {searched_order_id}, Product ID {prod_id} Status: {prod_status}")
-            elif order_status == "Approved":
-                messagebox.showinfo("Already Approved", f"Order ID: {order_id} has been already approved.")
-            elif order_status == "Cancelled":
-                if messagebox.askyesno('Order Cancelled', 'Order has been cancelled. Do you want to approve?'):
-                    # Optionally, repeat the same check/deduction logic here if you want to allow approval after cancellation
-                    selected_order = next((order for order in ttl_mats_list if order['order_id'] == order_id), None)
-                    if not selected_order:
-                        messagebox.showerror('Error', f'Order ID: {order_id} not found in JSON data')
-                        return
+        controls = CTkFrame(top, fg_color='white')
+        controls.pack(side='top', fill='x', padx=15, pady=(10, 5))
+        summary = CTkLabel(controls, text="Calculating...", font=('Futura', 13, 'bold'), anchor='w')
+        summary.pack(side='left', fill='x', expand=True)
+        shortages_only = tk.BooleanVar(value=False)
+        refresh_btn = CTkButton(controls, text="Refresh", width=90, fg_color='#d35400')
+        refresh_btn.pack(side='right', padx=5)
+        customtkinter.CTkCheckBox(controls, text="Shortages only", variable=shortages_only).pack(side='right', padx=10)
+
+        frame = tk.Frame(top)
+        frame.pack(fill='both', expand=True, padx=15, pady=(0, 15))
+        columns = ('mat_name', 'on_hand', 'allocated', 'demand', 'net', 'shortfall', 'orders', 'first_short_order')
+        headings = ('MATERIAL', 'ON HAND', 'APPROVED', 'PENDING DEMAND', 'NET', 'SHORTFALL', 'ORDERS', 'FIRST SHORT ORDER')
+        tree = ttk.Treeview(frame, columns=columns, show='headings', style='Treeview')
+        for col, text in zip(columns, headings):
+            tree.heading(col, text=text)
+            tree.column(col, width=220 if col == 'mat_name' else 120, anchor='w' if col == 'mat_name' else 'e')
+        tree.tag_configure('short', background='#fadbd8')
+        scrollbar = tk.Scrollbar(frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side='right', fill='y')
+        tree.pack(side='left', fill='both', expand=True)
+        rows = KeyedTree(tree)
+        plan = {}
+
+        def fill():
+            result = plan.get('result')
+            if result is None or not tree.winfo_exists():
+                return
+            values = []
+            tags = []
+            for name, on_hand, allocated, demand, net, shortfall, orders, first_short in result.rows(shortages_only.get()):
+                values.append((name, f'{on_hand:,.2f}', f'{allocated:,.2f}', f'{demand:,.2f}', f'{net:,.2f}',
+                               f'{shortfall:,.2f}', orders, '' if first_short is None else first_short))
+                tags.append(('short',) if shortfall > 0 else ())
+            rows.sync(values, tags)
+            summary.configure(text=f"{result.pending_orders} pending / {result.approved_orders} approved orders, "
+                                   f"{len(result.shortages())} material(s) short, "
+                                   f"{len(result.short_orders)} pending order(s) at risk "
+                                   f"({result.elapsed * 1000:.0f} ms)")
+
+        def on_planned(result):
+            plan['result'] = result
+            if top.winfo_exists():
+                refresh_btn.configure(state='normal')
+                fill()
+
+        def on_failed(error):
+            if top.winfo_exists():
+                refresh_btn.configure(state='normal')
+                summary.configure(text="Calculation failed")
+            messagebox.showerror("MRP Error", str(error))
+
+        def refresh():
+            refresh_btn.configure(state='disabled')
+            summary.configure(text="Calculating...")
+            # All open orders are planned at once on the DB worker; the page only shows the table
+            self.db_worker.submit(compute_mrp, on_done=on_planned, on_error=on_failed)
+
+        refresh_btn.configure(command=refresh)
+        shortages_only.trace_add('write', lambda *args: fill())
+        refresh()
 
-                    mats_need = selected_order['mats_need']
-                    insufficient = []
-                    mats_stock = {}
+    def approve_order(self):
+        if not can_manage_orders(self.controller.session.get('usertype')):
 
-                    for mat_name, mat_qty_needed in mats_need.items():
-                        mats_fetch = c.execute("""
-                            SELECT mat_id, mat_name, mat_volume
-                            FROM raw_mats WHERE mat_name = ?
-                        """, (mat_name,)).fetchone()
+            messagebox.showwarning("Access Denied", "You do not have permission to approve orders.")
+            return
+    
+        selected = self.order_tree.focus()
+        if not selected:
+            messagebox.showwarning("No Selection", "Please select an order to approve.")
+            return
 
-                        if not mats_fetch:
-                            insufficient.append(f"{mat_name}: Not found in inventory.")
-                            continue
+        values = self.order_tree.item(selected, 'values')
+        order_id = values[0]
+        self._submit_approval(order_id)
 
-                        mat_id, _, current_qty = mats_fetch
-                        mats_stock[mat_name] = (mat_id, current_qty)
+    def _submit_approval(self, order_id, allow_cancelled=False):
+        self.db_worker.submit(self.orders.approve_order, order_id, allow_cancelled,
+                              on_done=lambda result: self._on_approved(order_id, result),
+                              on_error=self._approval_failed)
 
-                        if current_qty < mat_qty_needed:
-                            insufficient.append(f"{mat_name}: Need {mat_qty_needed}, Have {current_qty}")
+    def _on_approved(self, order_id, result):
+        if show_order_approval(order_id, result, lambda: self._submit_approval(order_id, allow_cancelled=True)):
+            self.load_orders_from_db()
 
-                    if insufficient:
-                        messagebox.showerror("Insufficient Materials", "Order cannot be approved:\n" + "\n".join(insufficient))
-                        return
+    def _approval_failed(self, error):
+        # db_worker has already logged the traceback
+        messagebox.showerror("Database Error", f"{error}")
+        try:
+            self.load_orders_from_db()
+        except Exception:
+            logging.exception("Error reloading orders")
 
-                    for mat_name, mat_qty_needed in mats_need.items():
-                        mat_id, current_qty = mats_stock[mat_name]
-                        deducted_val = current_qty - mat_qty_needed
-                        c.execute("UPDATE raw_mats SET mat_volume = ? WHERE mat_id = ?", (deducted_val, mat_id))
+    def batch_approve_orders(self):
+        if not can_manage_orders(self.controller.session.get('usertype')):
+            messagebox.showwarning("Access Denied", "You do not have permission to approve orders.")
+            return
 
-                    new_status = "Approved"
-                    c.execute('UPDATE orders SET status_quo = ? WHERE order_id = ?', (new_status, searched_order_id))
-                    messagebox.showinfo("Success", f"Order ID: {searched_order_id} Approved!")
+        selected_ids = [self.order_tree.item(iid, 'values')[0] for iid in self.order_tree.selection()]
+        if not selected_ids:
+            if not messagebox.askyesno("Batch Approve", "No orders selected. Approve all eligible Pending orders?"):
+                return
 
-            conn.commit()
+        self.db_worker.submit(self.orders.approve_orders, selected_ids,
+                              on_done=self._on_batch_approved)
 
-        except Exception as e:
-            if conn:
-                try:
-                    conn.rollback()
-                except Exception:
-                    pass
-            messagebox.showerror("Database Error", f"{e}")
-            print(e)
-        finally:
-            if conn:
-                try:
-                    conn.close()
-                except Exception:
-                    pass
-            try:
-                self.load_orders_from_db()
-            except Exception as e:
-                print("Error reloading orders:", e)
+    def _on_batch_approved(self, result):
+        approved, rejected, skipped = result
+        logging.info(f"Batch approval by User ID {self.controller.session.get('user_id')}: "
+                     f"{len(approved)} approved, {len(rejected)} short of materials, {len(skipped)} skipped")
+        self._show_batch_summary(approved, rejected, skipped)
+        self.load_orders_from_db()
+
+    def _show_batch_summary(self, approved, rejected, skipped, limit=25):
+        lines = [f"Approved: {len(approved)}",
+                 f"Insufficient materials: {len(rejected)}",
+                 f"Skipped: {len(skipped)}"]
+        if approved:
+            lines.append("\nApproved orders: " + ", ".join(str(order_id) for order_id in approved[:limit]))
+            if len(approved) > limit:
+                lines.append(f"... and {len(approved) - limit} more")
+        details = [f"{order_id}: " + "; ".join(reasons) for order_id, reasons in rejected.items()]
+        details += [f"{order_id}: {reason}" for order_id, reason in skipped.items()]
+        if details:
+            lines.append("\nNot approved:")
+            lines.extend(details[:limit])
+            if len(details) > limit:
+                lines.append(f"... and {len(details) - limit} more")
+        messagebox.showinfo("Batch Approval", "\n".join(lines))
 
     def cancel_order(self):
-        if (user_type := self.controller.session.get('usertype')) not in ('admin', 'owner', 'manager', 'supplier'):
+        if not can_manage_orders(self.controller.session.get('usertype')):
             messagebox.showwarning("Access Denied", "You do not have permission to cancel orders.")
             return
 
@@ -461,22 +557,22 @@ class OrdersPage(tk.Frame):
         
         values = self.order_tree.item(selected, 'values')
         order_id = values[0]
-        order_stat = values[7]
-
-        status = 'Cancelled'
-
-        conn = sqlite3.connect('main.db')
-        c = conn.cursor()
-
-        c.execute("UPDATE orders SET status_quo = ? WHERE order_id = ?", (status, order_id))
-        messagebox.showinfo("Success", f"Order ID '{order_id}' has been cancelled.")
 
-        conn.commit()
-        conn.close()
+        self.db_worker.submit(self.orders.cancel_order, order_id,
+                              on_done=lambda result: self._on_cancelled(order_id, result))
+
+    def _on_cancelled(self, order_id, result):
+        outcome, prev_status = result
+        if outcome == 'cancelled':
+            messagebox.showinfo("Success", f"Order ID '{order_id}' has been cancelled.")
+        elif outcome == 'not_found':
+            messagebox.showerror("Not Found", f"Order ID: {order_id} cannot be found")
+        else:
+            messagebox.showwarning("Cannot Cancel", f"Order ID '{order_id}' is {prev_status} and cannot be cancelled.")
         self.load_orders_from_db()
 
     def del_order(self):
-        if (user_type := self.controller.session.get('usertype')) not in ('admin', 'owner', 'manager', 'supplier'):
+        if not can_manage_orders(self.controller.session.get('usertype')):
             messagebox.showwarning("Access Denied", "You do not have permission to deny orders.")
             return
         #Hard Deletion
@@ -485,35 +581,26 @@ class OrdersPage(tk.Frame):
             messagebox.showwarning("No selection", "Please select a order to delete.")
             return
 
-        try:
-            values = self.order_tree.item(selected, 'values')
-            order_id = values[0]  # Assuming client_id is the first column
-
-            confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete order ID '{order_id}'?")
-            if not confirm:
-                return
+        values = self.order_tree.item(selected, 'values')
+        order_id = values[0]  # Assuming client_id is the first column
 
-            conn = sqlite3.connect('main.db')
-            c = conn.cursor()
-            c.execute("SELECT * FROM orders WHERE order_id =  ?", (order_id,))
-            row = c.fetchone()
-
-            if row:
-                c.execute("DELETE FROM orders WHERE order_id = ?", (order_id,))
-                conn.commit()
-                messagebox.showinfo("Deleted", f"Order ID '{order_id}' has been deleted.")
-                self.load_orders_from_db()
-            else:
-                messagebox.showinfo("Not Found", f"No Orders found with ID '{order_id}'")
+        confirm = messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete order ID '{order_id}'?")
+        if not confirm:
+            return
 
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", str(e))
+        self.db_worker.submit(self.orders.delete_order, order_id,
+                              on_done=lambda result: self._on_order_deleted(order_id, result))
 
-        finally:
-            conn.close()
+    def _on_order_deleted(self, order_id, result):
+        outcome, _ = result
+        if outcome == 'deleted':
+            messagebox.showinfo("Deleted", f"Order ID '{order_id}' has been deleted.")
+            self.load_orders_from_db()
+        else:
+            messagebox.showinfo("Not Found", f"No Orders found with ID '{order_id}'")
 
     def upd_order(self):
-        if (user_type := self.controller.session.get('usertype')) not in ('admin', 'owner', 'manager', 'supplier'):
+        if not can_manage_orders(self.controller.session.get('usertype')):
             messagebox.showwarning("Access Denied", "You do not have permission to update orders.")
             return
         selected = self.order_tree.focus()
@@ -556,17 +643,8 @@ class OrdersPage(tk.Frame):
                 messagebox.showinfo("Info", f"{fields[idx]} cannot be changed here.")
                 return
 
-            try:
-                conn = sqlite3.connect('main.db')
-                c = conn.cursor()
-                c.execute(f"UPDATE orders SET {col} = ? WHERE order_id = ?", (new_value, original_id))
-                conn.commit()
-                messagebox.showinfo("Success", f"{fields[idx]} updated!")
-                self.load_orders_from_db()
-            except sqlite3.Error as e:
-                messagebox.showerror("Database Error", str(e))
-            finally:
-                conn.close()
+            self.db_worker.submit(self.orders.update_order, original_id, {col: new_value},
+                                  on_done=lambda result: self._on_order_updated(original_id, f"{fields[idx]} updated!", result))
 
         # Add an update button for each editable field
         for i, label in enumerate(fields):
@@ -580,49 +658,42 @@ class OrdersPage(tk.Frame):
                 messagebox.showerror("Input Error", "All fields are required.")
                 return
 
-            try:
-                conn = sqlite3.connect('main.db')
-                c = conn.cursor()
-                c.execute('''
-                    UPDATE orders
-                    SET order_name=?, order_dl=?, order_amount=?, mats_used=?
-                    WHERE order_id=?
-                ''', (all_values[1], all_values[4], all_values[5], all_values[6], original_id))
-                conn.commit()
-                messagebox.showinfo("Success", "All editable fields updated!")
-                self.load_orders_from_db()
-                top.destroy()
-            except sqlite3.Error as e:
-                messagebox.showerror("Database Error", str(e))
-            finally:
-                conn.close()
+            changes = {'order_name': all_values[1], 'order_dl': all_values[4], 'order_amount': all_values[5],
+                       'mats_used': all_values[6]}
+            self.db_worker.submit(self.orders.update_order, original_id, changes,
+                                  on_done=lambda result: self._on_order_updated(original_id, "All editable fields updated!",
+                                                                                result, top))
 
         # "Update All" button at the bottom
         update_all_btn = CTkButton(top, text="Update All", width=120, fg_color="#6a9bc3", command=update_all)
         update_all_btn.grid(row=len(fields), column=0, columnspan=3, pady=20)
 
+    def _on_order_updated(self, order_id, message, result, top=None):
+        outcome, detail = result
+        if outcome == 'updated':
+            messagebox.showinfo("Success", message)
+            self.load_orders_from_db()
+            if top is not None:
+                top.destroy()
+        elif outcome == 'not_found':
+            messagebox.showerror("Not Found", f"Order ID: {order_id} cannot be found")
+        else:
+            messagebox.showerror("Input Error", detail)
+
     def load_orders_from_db(self):
         try:
-            conn = sqlite3.connect("main.db")
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM orders")
-            rows = cursor.fetchall()
-
-            # Enumerate loop for getting every single client in the DB & inseting data in each column represented
-            for i in self.order_tree.get_children():
-                self.order_tree.delete(i)
-
-            for row in rows:
-                self.order_tree.insert("", "end", values=row)
-
+            # Already showing all orders: re-read only the loaded window and apply the differences.
+            # Otherwise go back to the first page; the grid loads the rest on scroll.
+            if self.order_grid.active and not self.order_grid.where:
+                self.order_grid.refresh()
+            else:
+                self.order_grid.reset()
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", str(e))
-        finally:
-            conn.close()
 
     #
     def order_done(self):
-        if (user_type := self.controller.session.get('usertype')) not in ('admin', 'owner', 'manager', 'supplier'):
+        if not can_manage_orders(self.controller.session.get('usertype')):
             messagebox.showwarning("Access Denied", "You do not have permission to approve orders.")
             return
         selected = self.order_tree.focus()
@@ -630,59 +701,31 @@ class OrdersPage(tk.Frame):
             messagebox.showwarning("No selection", "Please select an order to mark as delivered.")
             return  
 
-        try:
-            user_id = self.controller.session.get('user_id')
-
-            if not user_id:
-                messagebox.showerror("Session Error", "User  not logged in.")
-                return
-
-            timestamp = datetime.now(pytz.timezone('Asia/Manila')).strftime('%Y-%m-%d %H:%M:%S')
-            values = self.order_tree.item(selected, 'values')
-            order_id = values[0]
-
-            conn = sqlite3.connect('main.db')
-            c = conn.cursor()
-
-            order_info = c.execute('SELECT * FROM orders WHERE order_id = ?', (order_id,)).fetchone()
-
+        user_id = self.controller.session.get('user_id')
 
-            if not order_info:
-                messagebox.showerror("Not Found", f'Order ID: {order_id} cannot be found')
-                return
-            
-            selected_id, client_id, order_status = order_info[0], order_info[3], order_info[8]
-
-            existing_order = c.execute('SELECT * FROM order_history WHERE order_id = ?', (selected_id,)).fetchone()
-
-            if existing_order:
-                messagebox.showerror("Order Already Delivered", f"Order ID: {selected_id} has already been marked as delivered.")
-                return
-
-            # If there is any sort of confirmation from the customer that the item is delivered.
-            if order_status != "Approved":
-                messagebox.showerror("Order Status Error", f"Order ID: {selected_id} is not approved yet.")
-                return
-            else:    
-                delivery_status = "Delivered"
-                notes = f"Order ID {selected_id} has been delivered to Client: {client_id}"
-                c.execute('INSERT INTO order_history (order_id, status, changed_by, notes, timestamp) VALUES (?, ?, ?, ?, ?)',
-                        (selected_id, delivery_status, user_id, notes, timestamp))
-                logging.info(f"Order ID {selected_id} marked as delivered by User ID {user_id} at {timestamp}")
-                c.execute('UPDATE orders SET status_quo = ? WHERE order_id = ?', (delivery_status, selected_id))
-                messagebox.showinfo("Success", f"Order ID: {selected_id} has been marked as delivered.")
-                self.load_orders_from_db()
-
-                print(f"Order ID: {selected_id} has been marked as delivered by User ID {user_id} at {timestamp}")
+        if not user_id:
+            messagebox.showerror("Session Error", "User  not logged in.")
+            return
 
+        timestamp = now_text()
+        values = self.order_tree.item(selected, 'values')
+        order_id = values[0]
 
-            conn.commit()
-            
-        except sqlite3.Error as e:
-            messagebox.showerror("Database Error", str(e))
-            return
-        finally:
-            conn.close()
+        self.db_worker.submit(self.orders.deliver_order, order_id, user_id, timestamp,
+                              on_done=lambda result: self._on_delivered(order_id, user_id, timestamp, result))
+
+    def _on_delivered(self, order_id, user_id, timestamp, result):
+        outcome, selected_id = result
+        if outcome == 'not_found':
+            messagebox.showerror("Not Found", f'Order ID: {order_id} cannot be found')
+        elif outcome == 'already_delivered':
+            messagebox.showerror("Order Already Delivered", f"Order ID: {selected_id} has already been marked as delivered.")
+        elif outcome == 'not_approved':
+            messagebox.showerror("Order Status Error", f"Order ID: {selected_id} is not approved yet.")
+        else:
+            logging.info(f"Order ID {selected_id} marked as delivered by User ID {user_id} at {timestamp}")
+            messagebox.showinfo("Success", f"Order ID: {selected_id} has been marked as delivered.")
+            self.load_orders_from_db()
 
     def show_materials_popup(self, event):
         selected = self.order_tree.focus()
@@ -693,7 +736,7 @@ class OrdersPage(tk.Frame):
         mats_used = values[7]  # Assuming this is still relevant
 
         try:
-            conn = sqlite3.connect('main.db')
+            conn = connect('main.db', readonly=True)
             c = conn.cursor()
 
             # Fetch all order history entries for the selected order
@@ -782,9 +825,8 @@ class OrdersPage(tk.Frame):
         button.pack(side="top", padx=5, pady=15)
 
     def _images_buttons(self, image_path, size=(40, 40)):
-        image = Image.open(image_path)
-        size = size
-        return CTkImage(image)
+        # Icons keep CTkImage's default display size; decoded once per process
+        return get_ctk_image(image_path)
 
     def _add_order(self, label_text, y):
 
@@ -0,0 +1,157 @@
+import csv
+import os
+
+from db_pool import connect
+from timestamps import day_bounds
+
+
+# Exportable tables: (status column, indexed epoch column from timestamps.ensure_timestamp_columns)
+EXPORT_TABLES = {
+    'orders': ('status_quo', 'order_ts'),
+    'order_history': ('status', 'changed_ts'),
+}
+
+BATCH_SIZE = 5000
+
+
+def _export_query(table, status=None, date_from=None, date_to=None):
+    # date_from/date_to are 'YYYY-MM-DD' days, both inclusive
+    status_col, date_col = EXPORT_TABLES[table]
+    start, end = day_bounds(date_from, date_to)
+    where = []
+    params = []
+    if status:
+        where.append(f'{status_col} = ?')
+        params.append(status)
+    if start is not None:
+        where.append(f'{date_col} >= ?')
+        params.append(start)
+    if end is not None:
+        where.append(f'{date_col} < ?')
+        params.append(end)
+
+    query = f'SELECT * FROM {table}'
+    if where:
+        query += ' WHERE ' + ' AND '.join(where)
+    # With a date filter the index already yields rows in date order; otherwise keep insertion order
+    query += f' ORDER BY {date_col}, rowid' if date_from or date_to else ' ORDER BY rowid'
+    return query, params
+
+
+def iter_export_batches(table, status=None, date_from=None, date_to=None,
+                        database='main.db', batch_size=BATCH_SIZE):
+    """Yield the column names, then lists of at most `batch_size` matching rows.
+
+    Filters run in SQL and rows are pulled with fetchmany, so only one batch
+    is in memory at a time however large the table is. The reader connection
+    is held until the generator is exhausted or closed.
+    """
+    query, params = _export_query(table, status, date_from, date_to)
+    conn = connect(database, readonly=True)
+    try:
+        cur = conn.execute(query, params)
+        yield [col[0] for col in cur.description]
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def _column_types(table, database):
+    conn = connect(database, readonly=True)
+    try:
+        return {row[1]: (row[2] or '').upper() for row in conn.execute(f'PRAGMA table_info({table})')}
+    finally:
+        conn.close()
+
+
+def write_csv(path, batches):
+    """Write an iter_export_batches() stream to CSV; returns the row count."""
+    count = 0
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(next(batches))
+            for rows in batches:
+                writer.writerows(rows)
+                count += len(rows)
+    except BaseException:
+        batches.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+
+def _arrow_type(pa, declared):
+    # SQLite type affinity rules, reduced to the three Arrow types we write
+    if 'INT' in declared:
+        return pa.int64()
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB')):
+        return pa.float64()
+    return pa.string()
+
+
+def _coerce(value, kind):
+    # SQLite columns are loosely typed; values that do not fit the declared type become null
+    if value is None:
+        return None
+    try:
+        if kind == 'int':
+            return int(value)
+        if kind == 'float':
+            return float(value)
+    except (TypeError, ValueError):
+        return None
+    return str(value)
+
+
+def write_parquet(path, batches, column_types):
+    """Write an iter_export_batches() stream to Parquet, one row group per batch.
+
+    `column_types` maps column names to their declared SQLite types. Needs
+    pyarrow; returns the row count.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        batches.close()
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    columns = next(batches)
+    schema = pa.schema([(col, _arrow_type(pa, column_types.get(col, ''))) for col in columns])
+    kinds = ['int' if pa.types.is_integer(field.type) else 'float' if pa.types.is_floating(field.type) else 'str'
+             for field in schema]
+
+    count = 0
+    tmp_path = path + '.tmp'
+    try:
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for rows in batches:
+                arrays = [pa.array([_coerce(row[i], kind) for row in rows], type=field.type)
+                          for i, (kind, field) in enumerate(zip(kinds, schema))]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                count += len(rows)
+    except BaseException:
+        batches.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+
+def export_table(path, table, status=None, date_from=None, date_to=None, database='main.db'):
+    """Stream `table` rows matching the filters to `path` (.parquet or CSV); returns the row count."""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown export table: {table}")
+    batches = iter_export_batches(table, status, date_from, date_to, database)
+    if os.path.splitext(path)[1].lower() in ('.parquet', '.pq'):
+        return write_parquet(path, batches, _column_types(table, database))
+    return write_csv(path, batches)
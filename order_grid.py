@@ -0,0 +1,173 @@
+from collections import deque
+
+from db_pool import connect
+from keyed_tree import KeyedTree
+
+
+class KeysetOrderGrid:
+    """Virtualized view of the `orders` table on a ttk.Treeview.
+
+    Only a sliding window of at most `max_pages` pages is held in the tree.
+    Pages are fetched with keyset pagination on order_id (WHERE order_id > ?
+    ORDER BY order_id LIMIT n), so each fetch costs the same no matter how
+    far the user has scrolled or how large the table is. Scrolling near the
+    bottom loads the next page and drops the oldest one; scrolling near the
+    top does the reverse.
+
+    Rows are keyed by order_id (see KeyedTree), so reset() and refresh()
+    only touch the rows that changed and keep the selection.
+    """
+
+    # Fraction of the scroll range that counts as "near the edge"
+    EDGE = 0.02
+
+    def __init__(self, tree, scrollbar, database='main.db', page_size=100, max_pages=3):
+        self.tree = tree
+        self.rows = KeyedTree(tree)
+        self.scrollbar = scrollbar
+        self.database = database
+        self.page_size = page_size
+        self.max_pages = max_pages
+
+        self.where = ''
+        self.params = ()
+        self.active = False
+        self.has_prev = False
+        self.has_next = False
+
+        # Each page is (first_key, last_key, [iids]) in display order
+        self._pages = deque()
+        self._pending = None
+
+        self.tree.configure(yscrollcommand=self._on_yscroll)
+
+    def _query(self, after=None, before=None, first=None, last=None, limit=None):
+        clauses = [f'({self.where})'] if self.where else []
+        params = list(self.params)
+        for op, key in (('>', after), ('<', before), ('>=', first), ('<=', last)):
+            if key is not None:
+                clauses.append(f'order_id {op} ?')
+                params.append(key)
+        where_sql = 'WHERE ' + ' AND '.join(clauses) if clauses else ''
+        direction = 'DESC' if before is not None else 'ASC'
+        limit = limit or self.page_size
+        params.append(limit + 1)
+
+        conn = connect(self.database, readonly=True)
+        try:
+            rows = conn.execute(f'SELECT * FROM orders {where_sql} ORDER BY order_id {direction} LIMIT ?',
+                                params).fetchall()
+        finally:
+            conn.close()
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if before is not None:
+            rows.reverse()
+        return rows, more
+
+    def _insert_page(self, rows, index):
+        return (rows[0][0], rows[-1][0], self.rows.insert(rows, index))
+
+    def _split_pages(self, rows):
+        pages = deque()
+        for start in range(0, len(rows), self.page_size):
+            page = rows[start:start + self.page_size]
+            pages.append((page[0][0], page[-1][0], [self.rows.iid(row) for row in page]))
+        return pages
+
+    def _cancel_pending(self):
+        if self._pending is not None:
+            try:
+                self.tree.after_cancel(self._pending)
+            except Exception:
+                pass
+            self._pending = None
+
+    def reset(self, where='', params=()):
+        """Show the first page of orders matching `where` and return how many rows it holds."""
+        self._cancel_pending()
+        self.where = where
+        self.params = tuple(params)
+        self.active = True
+
+        rows, more = self._query()
+        self.has_prev = False
+        self.has_next = more
+        self.rows.sync(rows)
+        self._pages = self._split_pages(rows)
+        self.tree.yview_moveto(0)
+        return len(rows)
+
+    def refresh(self):
+        """Re-read the rows currently loaded, keeping scroll position and selection.
+
+        Falls back to reset() when nothing is loaded. When the window already
+        reaches the end of the table, rows added after it are picked up too
+        (up to the window size). Returns how many rows are shown.
+        """
+        if not self.active or not self._pages:
+            return self.reset(self.where, self.params)
+        self._cancel_pending()
+
+        first = self._pages[0][0]
+        last = self._pages[-1][1] if self.has_next else None
+        rows, more = self._query(first=first, last=last, limit=self.page_size * self.max_pages)
+        if not rows:
+            return self.reset(self.where, self.params)
+        if last is None:
+            self.has_next = more
+        self.rows.sync(rows)
+        self._pages = self._split_pages(rows)
+        return len(rows)
+
+    def suspend(self):
+        """Stop paging, e.g. while the tree shows ranked search results instead."""
+        self._cancel_pending()
+        self.active = False
+        self._pages.clear()
+
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        if not self.active or self._pending is not None:
+            return
+        if float(last) >= 1 - self.EDGE and self.has_next:
+            self._pending = self.tree.after_idle(self._load_next)
+        elif float(first) <= self.EDGE and self.has_prev:
+            self._pending = self.tree.after_idle(self._load_prev)
+
+    def _load_next(self):
+        self._pending = None
+        if not self.active or not self._pages:
+            return
+        rows, more = self._query(after=self._pages[-1][1])
+        self.has_next = more
+        if not rows:
+            return
+
+        top = float(self.tree.yview()[0]) * len(self.tree.get_children())
+        self._pages.append(self._insert_page(rows, 'end'))
+        removed = 0
+        while len(self._pages) > self.max_pages:
+            iids = self._pages.popleft()[2]
+            self.rows.delete(iids)
+            removed += len(iids)
+            self.has_prev = True
+        if removed:
+            self.tree.yview_moveto(max(top - removed, 0) / len(self.tree.get_children()))
+
+    def _load_prev(self):
+        self._pending = None
+        if not self.active or not self._pages:
+            return
+        rows, more = self._query(before=self._pages[0][0])
+        self.has_prev = more
+        if not rows:
+            return
+
+        top = float(self.tree.yview()[0]) * len(self.tree.get_children())
+        self._pages.appendleft(self._insert_page(rows, 0))
+        while len(self._pages) > self.max_pages:
+            self.rows.delete(self._pages.pop()[2])
+            self.has_next = True
+        self.tree.yview_moveto((top + len(rows)) / len(self.tree.get_children()))
@@ -0,0 +1,147 @@
+import json
+import os
+
+import pandas as pd
+
+from bom import get_cached_bom
+from db_pool import connect
+from timestamps import now_text
+
+
+REQUIRED_COLUMNS = ('order_name', 'product_id', 'client_id', 'quantity', 'deadline')
+
+# Header spellings accepted for each column (after lower-casing and replacing spaces with _)
+COLUMN_ALIASES = {
+    'order': 'order_name', 'name': 'order_name',
+    'product': 'product_id',
+    'client': 'client_id',
+    'qty': 'quantity', 'volume': 'quantity', 'order_amount': 'quantity',
+    'order_dl': 'deadline', 'due_date': 'deadline',
+}
+
+DEADLINE_FORMAT = '%m/%d/%Y'
+
+# Deadline spellings accepted in a file, tried per value in this order; Excel dates arrive as the last one
+DEADLINE_FORMATS = (DEADLINE_FORMAT, '%Y-%m-%d', '%Y-%m-%d %H:%M:%S')
+
+
+class OrderImport:
+    """Orders read from a file, validated and costed, ready to insert.
+
+    `rows` holds (order_name, product_id, client_id, quantity, order_date,
+    deadline, mats_need, status_quo) tuples for the valid lines; `errors`
+    holds (line_number, message) for the rest.
+    """
+
+    def __init__(self, path, rows, errors):
+        self.path = path
+        self.rows = rows
+        self.errors = errors
+
+
+def read_orders_file(path):
+    """Read a CSV or Excel sheet of orders into a DataFrame with normalized column names."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xls'):
+        df = pd.read_excel(path, dtype=str)
+    else:
+        df = pd.read_csv(path, dtype=str, skipinitialspace=True)
+
+    df.columns = [COLUMN_ALIASES.get(col, col) for col in
+                  (str(col).strip().lower().replace(' ', '_') for col in df.columns)]
+    missing = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+    df = df[list(REQUIRED_COLUMNS)].apply(lambda col: col.str.strip())
+    # Line numbers as the user sees them in the file (header is line 1)
+    df.index = df.index + 2
+    return df
+
+
+def parse_deadlines(values):
+    """Parse a Series of deadline text with DEADLINE_FORMATS; NaT where none of them fits.
+
+    Each value is matched on its own, so one file may mix formats (pandas
+    would otherwise infer a single format from the first row).
+    """
+    parsed = pd.to_datetime(values, format=DEADLINE_FORMATS[0], errors='coerce')
+    for fmt in DEADLINE_FORMATS[1:]:
+        parsed = parsed.fillna(pd.to_datetime(values, format=fmt, errors='coerce'))
+    return parsed
+
+
+def _existing_ids(conn, table, column, ids):
+    # Primary-key probes for just the ids in the file
+    rows = conn.execute(f'SELECT {column} FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))',
+                        (json.dumps(list(ids)),)).fetchall()
+    return {str(row[0]) for row in rows}
+
+
+def _load_boms(database, product_ids):
+    """Return a DataFrame (product_id, mat_name, qty) of every BOM line for `product_ids`."""
+    conn = connect(database, readonly=True)
+    try:
+        rows = conn.execute('''
+            SELECT product_id, mat_name, qty FROM product_materials
+            WHERE product_id IN (SELECT value FROM json_each(?))
+        ''', (json.dumps(list(product_ids)),)).fetchall()
+    finally:
+        conn.close()
+    rows = [(str(product_id), name, qty) for product_id, name, qty in rows]
+
+    # Products not indexed yet are parsed (and stored) once through the BOM cache
+    missing = set(product_ids) - {row[0] for row in rows}
+    rows += [(product_id, name, qty) for product_id in missing
+             for name, qty in get_cached_bom(product_id, database).items()]
+    return pd.DataFrame(rows, columns=['product_id', 'mat_name', 'qty'])
+
+
+def prepare_order_import(path, database='main.db'):
+    """Read, validate and cost every order in `path` without writing anything.
+
+    Products and clients are checked with one indexed lookup each for all
+    ids in the file. Required materials are computed for all rows at once by
+    joining the orders with the product BOMs and multiplying by quantity.
+    """
+    df = read_orders_file(path)
+    errors = []
+
+    def reject(mask, message):
+        nonlocal df
+        for line in df.index[mask]:
+            errors.append((int(line), message(df.loc[line])))
+        df = df[~mask]
+
+    reject(df.isna().any(axis=1) | (df == '').any(axis=1), lambda row: "Missing value(s)")
+    quantity = pd.to_numeric(df['quantity'], errors='coerce')
+    reject(quantity.isna() | (quantity <= 0) | (quantity % 1 != 0),
+           lambda row: f"Quantity must be a positive whole number: {row['quantity']}")
+    deadline = parse_deadlines(df['deadline'])
+    reject(deadline.isna(), lambda row: f"Invalid deadline: {row['deadline']}")
+
+    conn = connect(database, readonly=True)
+    try:
+        products = _existing_ids(conn, 'products', 'product_id', df['product_id'].unique())
+        clients = _existing_ids(conn, 'clients', 'client_id', df['client_id'].unique())
+    finally:
+        conn.close()
+    reject(~df['product_id'].isin(products), lambda row: f"Unknown product ID: {row['product_id']}")
+    reject(~df['client_id'].isin(clients), lambda row: f"Unknown client ID: {row['client_id']}")
+
+    boms = _load_boms(database, df['product_id'].unique())
+    lines = pd.DataFrame({'line': df.index, 'product_id': df['product_id'].values,
+                          'quantity': quantity[df.index].values})
+    needs = lines.merge(boms, on='product_id')
+    needs['total'] = needs['qty'].astype(float) * needs['quantity']
+    mats_need = {line: json.dumps(dict(zip(group['mat_name'], group['total'])))
+                 for line, group in needs.groupby('line', sort=False)}
+    reject(~df.index.isin(list(mats_need)), lambda row: f"Product {row['product_id']} has no materials")
+
+    errors.sort()
+    # Manila wall-clock time, like the orders OrderService writes
+    order_date = now_text()
+    rows = [(row.order_name, row.product_id, row.client_id, int(quantity[line]), order_date,
+             deadline[line].strftime(DEADLINE_FORMAT), mats_need[line], 'Pending')
+            for line, row in zip(df.index, df.itertuples(index=False))]
+    return OrderImport(path, rows, errors)
+
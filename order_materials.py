@@ -0,0 +1,60 @@
+import json
+
+
+def ensure_order_materials(conn):
+    """Create the order_materials table, its sync triggers and back-fill it once.
+
+    order_materials holds one row per (order, material) with the total
+    quantity the order needs, derived from the JSON dict in orders.mats_need.
+    It replaces order_mats_ttl.json as the source for approvals: triggers
+    keep it current on every order insert, update and delete, so nothing
+    has to regenerate a side file and lookups are primary-key seeks.
+    """
+    c = conn.cursor()
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'order_materials'").fetchone()
+    c.executescript('''
+        CREATE TABLE IF NOT EXISTS order_materials (
+            order_id TEXT NOT NULL,
+            mat_name TEXT NOT NULL,
+            qty REAL NOT NULL,
+            PRIMARY KEY (order_id, mat_name)
+        );
+        CREATE TRIGGER IF NOT EXISTS order_materials_ai AFTER INSERT ON orders
+        WHEN json_valid(new.mats_need) BEGIN
+            INSERT OR REPLACE INTO order_materials (order_id, mat_name, qty)
+            SELECT new.order_id, key, value FROM json_each(new.mats_need);
+        END;
+        CREATE TRIGGER IF NOT EXISTS order_materials_au AFTER UPDATE OF order_id, mats_need ON orders BEGIN
+            DELETE FROM order_materials WHERE order_id = old.order_id;
+            INSERT OR REPLACE INTO order_materials (order_id, mat_name, qty)
+            SELECT new.order_id, key, value FROM json_each(new.mats_need) WHERE json_valid(new.mats_need);
+        END;
+        CREATE TRIGGER IF NOT EXISTS order_materials_ad AFTER DELETE ON orders BEGIN
+            DELETE FROM order_materials WHERE order_id = old.order_id;
+        END;
+    ''')
+    if not exists:
+        c.execute('''
+            INSERT OR REPLACE INTO order_materials (order_id, mat_name, qty)
+            SELECT o.order_id, j.key, j.value
+            FROM orders o, json_each(o.mats_need) j
+            WHERE json_valid(o.mats_need)
+        ''')
+
+
+def get_order_materials(conn, order_id):
+    """Return {mat_name: qty} needed by one order (empty if it has none recorded)."""
+    rows = conn.execute('SELECT mat_name, qty FROM order_materials WHERE order_id = ?', (order_id,)).fetchall()
+    return {mat_name: qty for mat_name, qty in rows}
+
+
+def get_orders_materials(conn, order_ids):
+    """Return {str(order_id): {mat_name: qty}} for many orders in one query."""
+    rows = conn.execute('''
+        SELECT order_id, mat_name, qty FROM order_materials
+        WHERE order_id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps([str(order_id) for order_id in order_ids]),)).fetchall()
+    materials = {}
+    for order_id, mat_name, qty in rows:
+        materials.setdefault(order_id, {})[mat_name] = qty
+    return materials
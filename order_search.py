@@ -0,0 +1,104 @@
+import sqlite3
+
+
+# Columns of `orders` covered by the search (same set the old LIKE search used)
+SEARCH_COLUMNS = ('order_id', 'order_name', 'product_id', 'client_id',
+                  'quantity', 'deadline', 'mats_need', 'status_quo')
+
+# Trigram tokens need at least this many characters to match anything
+MIN_FTS_TERM = 3
+
+PAGE_SIZE = 100
+
+
+def ensure_order_search_index(conn):
+    """Create the orders_fts shadow index and its sync triggers if missing.
+
+    orders_fts is an external-content FTS5 table keyed on orders.rowid, so it
+    stores only the index. The triggers keep it in step with every insert,
+    update and delete on `orders`. Returns False when this SQLite build has no
+    FTS5, in which case search_orders() falls back to LIKE.
+    """
+    c = conn.cursor()
+    cols = ', '.join(SEARCH_COLUMNS)
+    new_cols = ', '.join(f'new.{col}' for col in SEARCH_COLUMNS)
+    old_cols = ', '.join(f'old.{col}' for col in SEARCH_COLUMNS)
+
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'orders_fts'").fetchone()
+    if exists:
+        # Older databases re-indexed on updates of any column (version, timestamps, ...)
+        update_sql = c.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = 'orders_fts_au'").fetchone()
+        if update_sql and 'UPDATE OF' not in update_sql[0]:
+            c.execute('DROP TRIGGER orders_fts_au')
+            c.execute(_update_trigger_sql(cols, new_cols, old_cols))
+        return True
+
+    try:
+        c.execute(f"CREATE VIRTUAL TABLE orders_fts USING fts5({cols}, content='orders', tokenize='trigram')")
+    except sqlite3.OperationalError:
+        return False
+
+    c.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS orders_fts_ai AFTER INSERT ON orders BEGIN
+            INSERT INTO orders_fts(rowid, {cols}) VALUES (new.rowid, {new_cols});
+        END;
+        CREATE TRIGGER IF NOT EXISTS orders_fts_ad AFTER DELETE ON orders BEGIN
+            INSERT INTO orders_fts(orders_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+        END;
+    ''')
+    c.execute(_update_trigger_sql(cols, new_cols, old_cols))
+    rebuild_order_search_index(conn)
+    return True
+
+
+def _update_trigger_sql(cols, new_cols, old_cols):
+    # Only changes to indexed columns need the row re-indexed
+    return f'''
+        CREATE TRIGGER IF NOT EXISTS orders_fts_au AFTER UPDATE OF {cols} ON orders BEGIN
+            INSERT INTO orders_fts(orders_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols});
+            INSERT INTO orders_fts(rowid, {cols}) VALUES (new.rowid, {new_cols});
+        END
+    '''
+
+
+def rebuild_order_search_index(conn):
+    """Re-index every order. Run after bulk loads that bypass triggers or after VACUUM."""
+    conn.execute("INSERT INTO orders_fts(orders_fts) VALUES ('rebuild')")
+
+
+def _like_search(c, term, limit, offset, status=None):
+    where = ' OR '.join(f'{col} LIKE ?' for col in SEARCH_COLUMNS)
+    params = (f'%{term}%',) * len(SEARCH_COLUMNS)
+    if status:
+        where = f'({where}) AND status_quo = ?'
+        params += (status,)
+    return c.execute(f'SELECT * FROM orders WHERE {where} ORDER BY order_id LIMIT ? OFFSET ?',
+                     params + (limit, offset)).fetchall()
+
+
+def search_orders(conn, term, limit=PAGE_SIZE, offset=0, status=None):
+    """Return one page of orders matching `term`, best matches first.
+
+    Matches are substrings of any searched column, like the old LIKE '%term%'
+    search, but served from the trigram index and ranked with bm25. Terms
+    shorter than the trigram width, or databases without the index, use LIKE.
+    With `status`, only orders in that status are matched, before paging.
+    """
+    c = conn.cursor()
+    term = term.strip()
+    if len(term) < MIN_FTS_TERM:
+        return _like_search(c, term, limit, offset, status)
+
+    phrase = '"' + term.replace('"', '""') + '"'
+    status_filter = 'AND o.status_quo = ?' if status else ''
+    try:
+        return c.execute(f'''
+            SELECT o.*
+            FROM orders_fts f
+            JOIN orders o ON o.rowid = f.rowid
+            WHERE orders_fts MATCH ? {status_filter}
+            ORDER BY f.rank
+            LIMIT ? OFFSET ?
+        ''', (phrase,) + ((status,) if status else ()) + (limit, offset)).fetchall()
+    except sqlite3.OperationalError:
+        return _like_search(c, term, limit, offset, status)
@@ -0,0 +1,261 @@
+import json
+
+from bom import get_cached_bom
+from db_pool import StaleRowError, write
+from inventory import reserve_materials, reserve_materials_batch
+from order_materials import get_order_materials, get_orders_materials
+from order_status import transition_order
+from timestamps import now_text
+
+
+# User types allowed to approve, cancel, deliver, update and delete orders
+ORDER_MANAGERS = ('admin', 'owner', 'manager', 'supplier')
+
+
+def can_manage_orders(usertype):
+    return usertype in ORDER_MANAGERS
+
+
+# Writer queue jobs. Each runs in one write transaction and returns (outcome, detail);
+# a StaleRowError from a compare-and-swap makes the queue re-run the job on fresh data.
+
+def approve_order_job(conn, order_id, allow_cancelled=False):
+    """Approve one order and deduct its materials, or say why not.
+
+    Outcomes: 'approved'; 'not_found'; 'product_not_approved' with
+    (product_id, product_status); 'already_approved'; 'cancelled' when the
+    order is cancelled and allow_cancelled is False; 'status_changed' with
+    the order's status; 'no_materials'; 'insufficient' with the shortages.
+    """
+    row = conn.execute('''
+        SELECT o.status_quo, p.product_id, p.status_quo
+        FROM orders o
+        JOIN products p ON o.product_id = p.product_id
+        WHERE o.order_id = ?
+    ''', (order_id,)).fetchone()
+    if not row:
+        return 'not_found', None
+    order_status, product_id, product_status = row
+    if product_status != 'Approved':
+        return 'product_not_approved', (product_id, product_status)
+    if order_status == 'Approved':
+        return 'already_approved', None
+    if order_status == 'Cancelled' and not allow_cancelled:
+        return 'cancelled', None
+
+    moved, prev_status = transition_order(conn, order_id, 'Approved')
+    if not moved:
+        conn.rollback()
+        return 'status_changed', prev_status
+
+    mats_need = get_order_materials(conn, order_id)
+    if not mats_need:
+        conn.rollback()
+        return 'no_materials', None
+
+    insufficient = reserve_materials(conn, mats_need, ref=order_id)
+    if insufficient:
+        conn.rollback()
+        return 'insufficient', insufficient
+    return 'approved', None
+
+
+def approve_orders_job(conn, order_ids=None):
+    """Approve many orders in one transaction; returns (approved, rejected, skipped).
+
+    With no ids every Pending order of an Approved product is a candidate.
+    Stock is allocated greedily in order_id order (see reserve_materials_batch).
+    `rejected` maps order ids to their shortages, `skipped` to the reason.
+    """
+    skipped = {}
+    query = '''
+        SELECT o.order_id, o.status_quo, p.status_quo, o.version
+        FROM orders o
+        JOIN products p ON o.product_id = p.product_id
+    '''
+    if order_ids:
+        candidates = conn.execute(query + ' WHERE o.order_id IN (SELECT value FROM json_each(?)) ORDER BY o.order_id',
+                                  (json.dumps(list(order_ids)),)).fetchall()
+        found = {str(row[0]) for row in candidates}
+        for order_id in order_ids:
+            if str(order_id) not in found:
+                skipped[order_id] = "Order cannot be found"
+    else:
+        candidates = conn.execute(query + " WHERE o.status_quo = 'Pending' AND p.status_quo = 'Approved' ORDER BY o.order_id").fetchall()
+
+    mats_by_order = get_orders_materials(conn, [row[0] for row in candidates])
+    demands = []
+    versions = {}
+    for order_id, order_status, prod_status, version in candidates:
+        if order_status != "Pending":
+            skipped[order_id] = f"Order status is {order_status}"
+        elif prod_status != "Approved":
+            skipped[order_id] = f"Product status is {prod_status}"
+        elif str(order_id) not in mats_by_order:
+            skipped[order_id] = "No materials recorded"
+        else:
+            demands.append((order_id, mats_by_order[str(order_id)]))
+            versions[order_id] = version
+
+    approved, rejected = reserve_materials_batch(conn, demands)
+    cur = conn.executemany('''
+        UPDATE orders SET status_quo = 'Approved', version = version + 1
+        WHERE order_id = ? AND status_quo = 'Pending' AND version = ?
+    ''', [(order_id, versions[order_id]) for order_id in approved])
+    if approved and cur.rowcount != len(approved):
+        raise StaleRowError("Orders changed while the batch was being approved")
+    return approved, rejected, skipped
+
+
+def cancel_order_job(conn, order_id):
+    """Outcomes: 'cancelled' with the previous status; 'not_found'; 'not_allowed' with the status."""
+    moved, prev_status = transition_order(conn, order_id, 'Cancelled')
+    if moved:
+        return 'cancelled', prev_status
+    if prev_status is None:
+        return 'not_found', None
+    return 'not_allowed', prev_status
+
+
+def deliver_order_job(conn, order_id, user_id, timestamp):
+    """Mark an approved order delivered and record it in order_history.
+
+    Outcomes: 'delivered', 'not_found', 'already_delivered', 'not_approved';
+    the detail is the order id as stored.
+    """
+    order_info = conn.execute('SELECT order_id, client_id FROM orders WHERE order_id = ?', (order_id,)).fetchone()
+    if not order_info:
+        return 'not_found', order_id
+    selected_id, client_id = order_info
+
+    if conn.execute('SELECT 1 FROM order_history WHERE order_id = ?', (selected_id,)).fetchone():
+        return 'already_delivered', selected_id
+
+    moved, _ = transition_order(conn, selected_id, 'Delivered')
+    if not moved:
+        return 'not_approved', selected_id
+
+    notes = f"Order ID {selected_id} has been delivered to Client: {client_id}"
+    conn.execute('INSERT INTO order_history (order_id, status, changed_by, notes, timestamp) VALUES (?, ?, ?, ?, ?)',
+                 (selected_id, 'Delivered', user_id, notes, timestamp))
+    return 'delivered', selected_id
+
+
+# Columns update_order_job leaves alone: the key, and the status and version owned by transition_order
+FIXED_COLUMNS = ('order_id', 'status_quo', 'version')
+
+
+def update_order_job(conn, order_id, changes):
+    """Set {column: value} on one order and bump its version.
+
+    Outcomes: 'updated'; 'not_found'; 'invalid' with a message when a
+    column does not exist or may not be edited.
+    """
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(orders)')}
+    unknown = [col for col in changes if col not in columns or col in FIXED_COLUMNS]
+    if unknown:
+        return 'invalid', f"Cannot update order field(s): {', '.join(unknown)}"
+    assignments = ', '.join(f'{col} = ?' for col in changes)
+    cur = conn.execute(f'UPDATE orders SET {assignments}, version = version + 1 WHERE order_id = ?',
+                       (*changes.values(), order_id))
+    return ('updated' if cur.rowcount else 'not_found'), None
+
+
+def delete_order_job(conn, order_id):
+    """Outcomes: 'deleted' or 'not_found'."""
+    cur = conn.execute('DELETE FROM orders WHERE order_id = ?', (order_id,))
+    return ('deleted' if cur.rowcount else 'not_found'), None
+
+
+def insert_orders(conn, rows):
+    """Writer queue job: insert prepared order rows with one executemany; returns the count.
+
+    Rows are (order_name, product_id, client_id, quantity, order_date,
+    deadline, mats_need, status_quo) tuples.
+    """
+    conn.executemany('''
+        INSERT INTO orders (order_name, product_id, client_id, quantity, order_date, deadline, mats_need, status_quo)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    return len(rows)
+
+
+def create_order_job(conn, row):
+    """Insert one order after checking its product and client; 'created' with the new order id, or 'invalid'."""
+    _, product_id, client_id = row[:3]
+    if not conn.execute('SELECT 1 FROM products WHERE product_id = ?', (product_id,)).fetchone():
+        return 'invalid', f"Unknown product ID: {product_id}"
+    if not conn.execute('SELECT 1 FROM clients WHERE client_id = ?', (client_id,)).fetchone():
+        return 'invalid', f"Unknown client ID: {client_id}"
+    insert_orders(conn, [row])
+    return 'created', conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+
+
+def validate_order(order_name, product_id, client_id, quantity, deadline):
+    """Return (quantity as int, None) for a well-formed order, or (None, message)."""
+    if not order_name:
+        return None, "Please enter an order name."
+    if not product_id:
+        return None, "Please select a product."
+    if not client_id:
+        return None, "Please select a client."
+    if quantity is None or str(quantity).strip() == '':
+        return None, "Please enter quantity."
+    try:
+        quantity = int(str(quantity).strip())
+        if quantity <= 0:
+            raise ValueError
+    except ValueError:
+        return None, "Quantity must be a positive whole number."
+    if not deadline:
+        return None, "Please enter a deadline."
+    return quantity, None
+
+
+class OrderService:
+    """Order actions addressed by order id, with no Tk in sight.
+
+    Every method blocks until its writer queue job has committed and
+    returns (outcome, detail) as described on the job, so the pages, batch
+    scripts and benchmarks drive the same code. Call it from a worker
+    thread (DBWorker.submit) when a page is waiting; database errors are
+    raised as sqlite3.Error.
+    """
+
+    def __init__(self, database='main.db'):
+        self.database = database
+
+    def approve_order(self, order_id, allow_cancelled=False):
+        return write(approve_order_job, order_id, allow_cancelled, database=self.database)
+
+    def approve_orders(self, order_ids=None):
+        return write(approve_orders_job, order_ids, database=self.database)
+
+    def cancel_order(self, order_id):
+        return write(cancel_order_job, order_id, database=self.database)
+
+    def deliver_order(self, order_id, user_id, timestamp=None):
+        return write(deliver_order_job, order_id, user_id, timestamp or now_text(), database=self.database)
+
+    def update_order(self, order_id, changes):
+        return write(update_order_job, order_id, changes, database=self.database)
+
+    def delete_order(self, order_id):
+        return write(delete_order_job, order_id, database=self.database)
+
+    def create_order(self, order_name, product_id, client_id, quantity, deadline, materials=None, order_date=None):
+        """Create a Pending order; returns ('created', order_id) or ('invalid', message).
+
+        `materials` is the {mat_name: total} the order needs; when omitted
+        it is the product's BOM times quantity.
+        """
+        quantity, error = validate_order(order_name, product_id, client_id, quantity, deadline)
+        if error:
+            return 'invalid', error
+        if materials is None:
+            materials = {name: float(qty) * quantity for name, qty in get_cached_bom(product_id, self.database).items()}
+        if not materials:
+            return 'invalid', f"Product {product_id} has no materials recorded."
+        row = (order_name, product_id, client_id, quantity, order_date or now_text(), deadline,
+               json.dumps(materials), 'Pending')
+        return write(create_order_job, row, database=self.database)
@@ -0,0 +1,46 @@
+from db_pool import StaleRowError
+
+
+# Target status -> statuses an order may move to it from
+ORDER_TRANSITIONS = {
+    'Approved': ('Pending', 'Cancelled'),
+    'Cancelled': ('Pending', 'Approved'),
+    'Delivered': ('Approved',),
+}
+
+
+def ensure_row_versions(conn):
+    """Add the `version` column that compare-and-swap updates check to orders.
+
+    Every guarded update bumps version by one, so a writer that read a row
+    can tell whether anyone changed it in between. Existing rows start at 0.
+    Stock versions live in stock_balances (see stock_ledger).
+    """
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(orders)')}
+    if columns and 'version' not in columns:
+        conn.execute('ALTER TABLE orders ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+
+
+def transition_order(conn, order_id, to_status):
+    """Move one order to `to_status` if its current status allows it.
+
+    The update only applies if status_quo and version are still what was
+    just read (WHERE status_quo = ? AND version = ?). Returns (moved,
+    previous_status); previous_status is None when the order does not exist.
+    Raises StaleRowError if the row changed in between, so the writer queue
+    re-runs the whole job on fresh data.
+    """
+    row = conn.execute('SELECT status_quo, version FROM orders WHERE order_id = ?', (order_id,)).fetchone()
+    if not row:
+        return False, None
+    status, version = row
+    if status not in ORDER_TRANSITIONS[to_status]:
+        return False, status
+
+    cur = conn.execute('''
+        UPDATE orders SET status_quo = ?, version = version + 1
+        WHERE order_id = ? AND status_quo = ? AND version = ?
+    ''', (to_status, order_id, status, version))
+    if cur.rowcount != 1:
+        raise StaleRowError(f"Order {order_id} changed while moving it to {to_status}")
+    return True, status
@@ -1,9 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, Toplevel
-from tkcalendar import DateEntry
-import re
 from datetime import datetime
-import pytz
 import time
 import logging
 import json
@@ -12,8 +9,19 @@ import sqlite3
 
 #Imported Classses/Functions
 from database import DatabaseManager
-from global_func import export_materials_to_json, export_total_amount_mats
+from exports import export_materials_to_json_incremental, export_total_amount_mats_incremental
 from pages_handler import FrameNames
+from bom import parse_materials, ensure_product_materials, get_cached_bom, invalidate_bom
+from db_pool import connect
+from db_worker import DBWorker, Debouncer
+from keyed_tree import KeyedTree
+from timestamps import ensure_timestamp_columns, format_date
+from product_creators import UNKNOWN_CREATOR, ensure_creator_index, load_product_creators
+from order_service import OrderService
+from product_service import ProductService
+from approval_dialogs import show_order_approval, show_product_approval
+from order_status import ensure_row_versions
+from stock_ledger import ensure_stock_ledger
 
 # Configure product-specific logger
 product_logger = logging.getLogger('product_logger')
@@ -46,9 +54,31 @@ class ProductManagementSystem(tk.Toplevel):
             
         self.current_materials = []
         self.total_mats_need = []
+        # List loads run off the Tk thread and are handed back through after()
+        self.db_worker = DBWorker(self.window)
+        self.orders = OrderService()
+        self.products = ProductService()
+        self.prepare_product_materials()
         self.create_widgets()
         self.window.protocol("WM_DELETE_WINDOW", self.on_closing)
         
+    def prepare_product_materials(self):
+        """Create/back-fill product_materials, the stock ledger, row versions and indexes if needed"""
+        conn = None
+        try:
+            conn = connect('main.db')
+            ensure_product_materials(conn)
+            ensure_stock_ledger(conn)
+            ensure_row_versions(conn)
+            ensure_creator_index(conn)
+            ensure_timestamp_columns(conn)
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error preparing product materials: {e}")
+        finally:
+            if conn:
+                conn.close()
+
     def on_closing(self):
         """Handle window closing"""
         self.window.grab_release()
@@ -266,6 +296,7 @@ class ProductManagementSystem(tk.Toplevel):
 
     def setup_order_tab(self):
         """Setup the Order Management tab"""
+        from tkcalendar import DateEntry
         # Create main scrollable canvas
         main_canvas = tk.Canvas(self.order_frame, bg='#ffffff', highlightthickness=0)
         main_scrollbar = ttk.Scrollbar(self.order_frame, orient="vertical", command=main_canvas.yview)
@@ -389,6 +420,8 @@ class ProductManagementSystem(tk.Toplevel):
                                  width=12)
         quantity_entry.grid(row=0, column=1, sticky='ew', padx=(0, 10), pady=4, ipady=3)
         quantity_entry.bind('<KeyRelease>', self.on_quantity_changed)
+        # One recalculation once typing pauses, and none if product and quantity did not change
+        self.materials_recalc = Debouncer(self.window, self.calculate_materials, key=self._materials_inputs)
         
         tk.Label(details_grid, 
                 text="Deadline:", 
@@ -530,11 +563,14 @@ class ProductManagementSystem(tk.Toplevel):
     def on_product_selected(self, event=None):
         """Handle product selection change"""
         self.display_product_materials()
-        self.calculate_materials()
+        self.materials_recalc.now()
     
     def on_quantity_changed(self, event=None):
-        """Handle quantity change"""
-        self.calculate_materials()
+        """Handle quantity change (debounced)"""
+        self.materials_recalc()
+
+    def _materials_inputs(self):
+        return self.selected_product_var.get().strip(), self.order_quantity_var.get().strip()
     
     def display_product_materials(self):
         """Display the materials for the selected product"""
@@ -569,30 +605,11 @@ class ProductManagementSystem(tk.Toplevel):
     
     def parse_materials(self, materials_string):
         """Parse materials string and return a dictionary {x:y}"""
-        if not materials_string:
-            return {}
-
-        materials = {}
-        # Split the string into parts using comma or semicolon
-        items = re.split(r'[;,]', materials_string)
-
-        for item in items:
-            item = item.strip()
-            if not item:
-                continue
-
-            # Match pattern: name - quantity OR name: quantity
-            match = re.match(r'(.+?)\s*[-:]\s*(\d+)', item)
-            if match:
-                material_name = match.group(1).strip()
-                quantity = int(match.group(2))
-                materials[material_name] = quantity
-            else:
-                # Fallback: treat as material with unknown quantity (0)
-                materials[item] = 0
-
-        return materials
+        return parse_materials(materials_string)
 
+    def get_product_bom(self, product_id):
+        """Structured materials {name: qty} for a product, cached in-process"""
+        return get_cached_bom(product_id)
 
     def calculate_materials(self):
         """Calculate required materials based on quantity"""
@@ -613,15 +630,10 @@ class ProductManagementSystem(tk.Toplevel):
             # Extract product ID
             product_id = selected_product.split('(')[-1].strip(')')
             
-            # Get materials data
-            materials_string = self.db_manager.get_product_materials(product_id)
-            if not materials_string:
-                raise ValueError("No materials found for this product")
-
-            # Parse materials - ensure this returns a dict {material: quantity}
-            materials_dict = self.parse_materials(materials_string)
+            # Get materials as structured rows {material: quantity}
+            materials_dict = self.get_product_bom(product_id)
             if not materials_dict:
-                raise ValueError("Materials format not recognized")
+                raise ValueError("No materials found for this product")
 
             # Calculate totals
             self.order_materials_data = {}  # This is what create_order will use
@@ -642,9 +654,6 @@ class ProductManagementSystem(tk.Toplevel):
             self.required_materials_text.insert(1.0, calculation_text)
             self.required_materials_text.config(state='disabled')
 
-            print(f"Raw materials from DB: {materials_string}")
-            print(f"After parsing: {self.order_materials_data}")
-
         except ValueError as e:
             self._show_materials_error(str(e))
         except Exception as e:
@@ -698,6 +707,7 @@ class ProductManagementSystem(tk.Toplevel):
     
     def create_product(self):
         """Create a new product"""
+        import pytz
         product_name = self.product_name_var.get().strip()
         
         if not product_name:
@@ -747,7 +757,7 @@ class ProductManagementSystem(tk.Toplevel):
                     user_name = self.session['username']
             
             messagebox.showinfo("Success", f"Product '{product_name}' created successfully by {user_name}!\nProduct ID: {product_id}")
-            export_materials_to_json("main.db", "C:/capstone/json_f/products_materials.json")
+            export_materials_to_json_incremental("main.db", "C:/capstone/json_f/products_materials.json")
             
         except Exception as e:
             messagebox.showerror("Database Error", f"Error creating product: {str(e)}")
@@ -863,6 +873,7 @@ class ProductManagementSystem(tk.Toplevel):
             
             try:
                 self.db_manager.update_product(product_id, new_name, formatted_materials)
+                invalidate_bom(product_id)
                 
                 # Log the product edit to product.log
                 if self.session and 'user_id' in self.session:
@@ -905,6 +916,7 @@ pady=8)
                                  "This action cannot be undone."):
                 
                 self.db_manager.delete_product(product_id)
+                invalidate_bom(product_id)
                 
                 # Log the deletion to product.log
                 if self.session and 'user_id' in self.session:
@@ -977,46 +989,41 @@ pady=8)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
         
         # Load products
-        def load_products():
-            # Clear existing items
-            for item in product_tree.get_children():
-                product_tree.delete(item)
-                
+        product_rows = KeyedTree(product_tree)
+
+        def fetch_products():
+            # Runs on the DB worker thread
+            products = self.db_manager.get_all_products()
+            # One query for every creator instead of a get_product_creator() call per product
+            conn = connect('main.db', readonly=True)
             try:
-                products = self.db_manager.get_all_products()
-                
-                for product in products:
-                    product_id, name, materials, created_date, status_quo = product
-                    
-                    if created_date:
-                        try:
-                            dt = datetime.strptime(created_date, '%Y-%m-%d %H:%M:%S.%f')
-                            formatted_date = dt.strftime('%m/%d/%Y')
-                        except:
-                            try:
-                                dt = datetime.strptime(created_date, '%Y-%m-%d %H:%M:%S')
-                                formatted_date = dt.strftime('%m/%d/%Y')
-                            except:
-                                formatted_date = created_date
-                    else:
-                        formatted_date = 'N/A'
-                    
-                    display_materials = materials[:50] + "..." if materials and len(materials) > 50 else materials or 'N/A'
-                    
-                    # Get the creator's name for this product
-                    creator_name = self.db_manager.get_product_creator(product_id)
-                    
-                    product_tree.insert('', 'end', values=(
-                        product_id or 'N/A',
-                        name or 'N/A',
-                        display_materials,
-                        formatted_date,
-                        status_quo or 'N/A',
-                        creator_name
-                    ))
-                    
-            except Exception as e:
-                messagebox.showerror("Database Error", f"Error loading products: {str(e)}")
+                creators = load_product_creators(conn)
+            finally:
+                conn.close()
+            return [(product, creators.get(str(product[0]), UNKNOWN_CREATOR)) for product in products]
+
+        def fill_products(rows):
+            values = []
+            for product, creator_name in rows:
+                product_id, name, materials, created_date, status_quo = product
+
+                display_materials = materials[:50] + "..." if materials and len(materials) > 50 else materials or 'N/A'
+
+                values.append((
+                    product_id or 'N/A',
+                    name or 'N/A',
+                    display_materials,
+                    format_date(created_date),
+                    status_quo or 'N/A',
+                    creator_name
+                ))
+
+            # Only changed rows are touched, so the selection and scroll position survive a reload
+            product_rows.sync(values)
+
+        def load_products():
+            self.db_worker.submit(fetch_products, on_done=fill_products,
+                                  on_error=lambda e: messagebox.showerror("Database Error", f"Error loading products: {str(e)}"))
         
         load_products()
         
@@ -1045,9 +1052,6 @@ pady=8)
         
         def approve_selected_product():
             """Deduct the materials used in a Product from the Inventory Table"""
-            with open('C:/capstone/json_f/products_materials.json', 'r') as f:
-                product_list = json.load(f)
-
             selection = product_tree.selection()
             if not selection:
                 messagebox.showwarning("No Selection", "Please select a product to approve.")
@@ -1055,94 +1059,33 @@ pady=8)
 
             item = product_tree.item(selection[0])
             values = item['values']
-            prod_id = values[0]  
-
-            # Find matching product in JSON
-            selected_product = next((p for p in product_list if p['product_id'] == prod_id), None)
-            if not selected_product:
-                messagebox.showerror("Error", f"Product ID {prod_id} not found in the database.")
-                return
-
-            prod_name = selected_product['product_name']
-            prod_mats = selected_product['materials']
-
-            conn = self.db_manager.get_connection()
-            c = conn.cursor()
+            prod_id = values[0]
+            user_id = self.session.get('user_id', 'unknown')
 
-            try:
-                unavailable_mats = []
-                avail_mats_list = []
-
-                for mat_name, mat_qty in selected_product['materials'].items():
-                    c.execute("SELECT current_stock, mat_name FROM raw_mats WHERE mat_name = ?", (mat_name,))
-                    result = c.fetchone()
-
-                    if result:
-                        current_qty, updated_mat_name = result
-                        if current_qty >= mat_qty:
-                            avail_mats_list.append(f"{updated_mat_name} (needed: {mat_qty}, available: {current_qty})")
-                        else:
-                            unavailable_mats.append(
-                                f"{updated_mat_name} (needed: {mat_qty}, available: {current_qty})"
-                            )
-                    else:
-                        unavailable_mats.append(f"Material Name {mat_name} not found")
-
-                if unavailable_mats:
-                    error_message = (
-                        f"❌ Cannot approve product {prod_name} (ID: {prod_id}) due to:\n\n" +
-                        "\n".join(f"- {item}" for item in unavailable_mats)
-                    )
-                    messagebox.showerror("Insufficient Materials", error_message)
-                    status_pend = 'Pending'
-                    c.execute('UPDATE products SET status_quo = ? WHERE product_id = ?', (status_pend, prod_id,))
-                else:
-                    # Show success message with available materials
-                    success_mats = (
-                        f"Materials Approve for Product {prod_name} (ID: {prod_id})\n" +
-                        "\n".join(f"= {materials}" for materials in avail_mats_list)
-                    )
-                    messagebox.showinfo("Success", success_mats)
-                    
-                    # Update product status to Approved
-                    status_approve = 'Approved'
-                    c.execute('UPDATE products SET status_quo = ? WHERE product_id = ?', (status_approve, prod_id,))
-                    
-                    # Deduct materials from inventory
-                    for mat_name, mat_qty in selected_product['materials'].items():
-                        c.execute("UPDATE raw_mats SET current_stock = current_stock - ? WHERE mat_name = ?", 
-                                 (mat_qty, mat_name))
-                    
-                    messagebox.showinfo("Success", f"✅ Approved product {prod_name} (ID: {prod_id}) successfully!")
-                    
-                    # Log the approval action to database
-                    user_id = self.session.get('user_id', 'unknown')
-                    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    c.execute("INSERT INTO user_logs (user_id, action, timestamp) VALUES (?, ?, ?)",
-                             (user_id, f'APPROVE PRODUCT {prod_id}', timestamp))
-                    
-                    # Log to product.log
+            def on_approved(result):
+                outcome, detail = result
+                show_product_approval(prod_id, result)
+                if outcome == 'approved':
                     user_name = self.session.get('f_name', self.session.get('username', 'Unknown'))
-                    product_logger.info(f"User {user_name} (ID: {user_id}) approved product '{prod_name}' (ID: {prod_id})")
+                    product_logger.info(f"User {user_name} (ID: {user_id}) approved product '{detail}' (ID: {prod_id})")
 
-            except Exception as e:
-                messagebox.showerror("Database Error", f"An error occurred: {e}")
+                load_products()  # Refresh the product tree
 
-            conn.commit()
-            conn.close()
+                if outcome != 'approved':
+                    return
+                # Refresh the entire system to update all frames with the latest data
+                if hasattr(self, 'controller') and self.controller:
+                    self.controller.refresh_all_frames()
+                    # Show inventory frame after refresh
+                    self.controller.show_frame(FrameNames.INVENTORY)
 
-            load_products()  # Refresh the product tree
-            
-            # Refresh the entire system to update all frames with the latest data
-            if hasattr(self, 'controller') and self.controller:
-                self.controller.refresh_all_frames()
-                # Show inventory frame after refresh
-                self.controller.show_frame(FrameNames.INVENTORY)
-                
-            # Show the order list via delegated Order UI
-            if hasattr(self, 'order_ui') and self.order_ui:
-                self.window.after(500, self.order_ui.show_order_list)
+                # Show the order list via delegated Order UI
+                if hasattr(self, 'order_ui') and self.order_ui:
+                    self.window.after(500, self.order_ui.show_order_list)
 
+            # Stock check, deduction, status change and user log in one writer queue job
+            self.db_worker.submit(self.products.approve_product, prod_id, user_id, on_done=on_approved,
+                                  on_error=lambda e: messagebox.showerror("Database Error", f"An error occurred: {e}"))
 
         def cancel_selected_product():
             "Soft Deletion of Prod (cancel order can potentially be continued later)"
@@ -1156,21 +1099,19 @@ pady=8)
             prod_id = values[0]
             prod_name = values[1]
 
-            try:
-                conn = self.db_manager.get_connection()
-                c = conn.cursor()
-
-                status = 'Cancelled'
-
-                c.execute("UPDATE products SET status_quo = ? WHERE product_id = ?", (status, prod_id))
-                messagebox.showinfo(f"Product '{prod_name}' has been cancelled.")
-
-                conn.commit()
-                conn.close()
+            def on_cancelled(result):
+                outcome, _ = result
+                if outcome == 'cancelled':
+                    messagebox.showinfo("Success", f"Product '{prod_name}' has been cancelled.")
+                else:
+                    messagebox.showerror("Error", f"Product ID {prod_id} not found in the database.")
                 load_products()  # Refresh the list
-            except Exception as e:
-                messagebox.showerror("Database Error", f"Error cancelling product: {str(e)}")
+
+            def on_failed(error):
+                messagebox.showerror("Database Error", f"Error cancelling product: {str(error)}")
                 load_products()
+
+            self.db_worker.submit(self.products.cancel_product, prod_id, on_done=on_cancelled, on_error=on_failed)
         
         def delete_selected_product():
             "Hard Deletion of Products"
@@ -1273,6 +1214,8 @@ pady=8)
     
     def load_products_and_clients(self):
         """Load products and clients for the order form dropdowns"""
+        # Products may have been edited elsewhere since the cache was filled
+        invalidate_bom()
         try:
             # Load products
             product_options = self.db_manager.get_products_for_dropdown()
@@ -1373,12 +1316,13 @@ pady=8)
         except Exception as e:
             messagebox.showerror("Database Error", f"Error creating order: {str(e)}")
         
-        export_total_amount_mats('main.db', 'C:/capstone/json_f/order_mats_ttl.json')
+        export_total_amount_mats_incremental('main.db', 'C:/capstone/json_f/order_mats_ttl.json')
 
 
     
     def edit_order(self, order_id, order_name, product_id, client_id, quantity, deadline):
         """Edit an existing order"""
+        from tkcalendar import DateEntry
         edit_window = tk.Toplevel(self.window)
         edit_window.title("Edit Order")
         edit_window.geometry("700x500")
@@ -1700,45 +1644,34 @@ pady=8)
         h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X, padx=10)
         
         # Load orders
+        order_rows = KeyedTree(order_tree)
+
+        def fill_orders(orders):
+            values = []
+            tags = []
+            for order in orders:
+                order_id, name, product_name, client_name, quantity, mats_need, deadline, order_date, product_id, client_id, status_quo = order
+
+                values.append((
+                    order_id or 'N/A',
+                    name or 'N/A',
+                    product_name or 'N/A',
+                    client_name or 'N/A',
+                    quantity or 'N/A',
+                    mats_need or 'N/A',
+                    deadline or 'N/A',
+                    format_date(order_date),
+                    status_quo or 'N/A'
+                ))
+                # Store additional data in tags for edit/delete operations
+                tags.append((product_id, client_id))
+
+            # Only changed rows are touched, so the selection and scroll position survive a reload
+            order_rows.sync(values, tags)
+
         def load_orders():
-            # Clear existing items
-            for item in order_tree.get_children():
-                order_tree.delete(item)
-                
-            try:
-                orders = self.db_manager.get_all_orders()
-                
-                for order in orders:
-                    order_id, name, product_name, client_name, quantity, mats_need, deadline, order_date, product_id, client_id, status_quo = order
-                    
-                    if order_date:
-                        try:
-                            dt = datetime.strptime(order_date, '%Y-%m-%d %H:%M:%S.%f')
-                            formatted_date = dt.strftime('%m/%d/%Y')
-                        except:
-                            try:
-                                dt = datetime.strptime(order_date, '%Y-%m-%d %H:%M:%S')
-                                formatted_date = dt.strftime('%m/%d/%Y')
-                            except:
-                                formatted_date = order_date
-                    else:
-                        formatted_date = 'N/A'
-                    
-                    # Store additional data in tags for edit/delete operations
-                    item_id = order_tree.insert('', 'end', values=(
-                        order_id or 'N/A',
-                        name or 'N/A',
-                        product_name or 'N/A',
-                        client_name or 'N/A',
-                        quantity or 'N/A',
-                        mats_need or 'N/A',
-                        deadline or 'N/A',
-                        formatted_date or 'N/A',
-                        status_quo or 'N/A'
-                    ), tags=(product_id, client_id))
-                    
-            except Exception as e:
-                messagebox.showerror("Database Error", f"Error loading orders: {str(e)}")
+            self.db_worker.submit(self.db_manager.get_all_orders, on_done=fill_orders,
+                                  on_error=lambda e: messagebox.showerror("Database Error", f"Error loading orders: {str(e)}"))
         
         load_orders()
         
@@ -1774,54 +1707,19 @@ pady=8)
 
             item = order_tree.item(selection[0])
             values = item['values']
-            order_id = values[0]
+            approve(values[0])
 
-            conn = self.db_manager.get_connection()
-            c = conn.cursor()
-            try:
-                order_info = c.execute("""
-                    SELECT o.order_id, o.status_quo, p.product_id, p.status_quo
-                    FROM orders o
-                    JOIN products p ON o.product_id = p.product_id
-                    WHERE o.order_id = ?
-                """, (order_id,)).fetchone()
-
-                if not order_info:
-                    messagebox.showerror('Not Found', f'Order ID: {order_id} cannot be found')
+        def approve(order_id, allow_cancelled=False):
+            def on_approved(result):
+                if not show_order_approval(order_id, result, lambda: approve(order_id, allow_cancelled=True)):
                     return
+                if result[0] == 'approved':
+                    export_materials_to_json_incremental("main.db", "C:/capstone/json_f/products_materials.json")
+                load_orders()
 
-                searched_order_id = order_info[0]
-                order_status = order_info[1]
-                prod_id = order_info[2]
-                prod_status = order_info[3]
-
-                if order_status == "Pending" and prod_status == "Approved":
-                    self.db_manager.deduct_materials_for_order(order_id)
-                    self.db_manager.approve_order(order_id)
-                    messagebox.showinfo("Success", f"Order ID: {searched_order_id} Approved!")
-                    export_materials_to_json("main.db", "C:/capstone/json_f/products_materials.json")
-                elif prod_status == "Pending":
-                    messagebox.showinfo("Info", f"Order ID: {searched_order_id}, Product ID {prod_id} Status: {prod_status}")
-                elif prod_status == "Cancelled":
-                    messagebox.showwarning("Warning", f"Order ID: {searched_order_id}, Product ID {prod_id} Status: {prod_status}")
-                elif order_status == "Approved":
-                    messagebox.showinfo("Info", f"Order ID: {order_id} has been already approved.")
-                elif order_status == "Cancelled":
-                    if messagebox.askyesno('Order has been cancelled. Do you want to approve?'):
-                        self.db_manager.deduct_materials_for_order(order_id)
-                        self.db_manager.approve_order(order_id)
-                        messagebox.showinfo("Success", f"Order ID: {searched_order_id} Approved!")
-                        export_materials_to_json("main.db", "C:/capstone/json_f/products_materials.json")
-
-                conn.commit()
-            except Exception as e:
-                conn.rollback()
-                messagebox.showerror('Database Error', str(e))
-                print(e)
-            finally:
-                conn.close()
-
-            load_orders()
+            # Stock check, deduction and status change in one guarded writer queue job, as on the order page
+            self.db_worker.submit(self.orders.approve_order, order_id, allow_cancelled, on_done=on_approved,
+                                  on_error=lambda e: messagebox.showerror('Database Error', str(e)))
 
 
         def cancel_selected_order():
@@ -1835,17 +1733,18 @@ pady=8)
             order_id = values[0]
 
 
-            status = 'Cancelled'
-
-            conn = self.db_manager.get_connection()
-            c = conn.cursor()
-
-            c.execute("UPDATE orders SET status_quo = ? WHERE order_id = ?", (status,  order_id))
+            def on_cancelled(result):
+                outcome, prev_status = result
+                if outcome == 'cancelled':
+                    messagebox.showinfo("Success", f"Order '{order_id}' has been cancelled successfully!")
+                elif outcome == 'not_found':
+                    messagebox.showerror("Not Found", f"Order ID: {order_id} cannot be found")
+                else:
+                    messagebox.showwarning("Cannot Cancel", f"Order '{order_id}' is {prev_status} and cannot be cancelled.")
+                load_orders()  # Refresh the list
 
-            conn.commit()
-            conn.close()
-            messagebox.showinfo("Success", f"Order '{order_id}' has been cancelled successfully!")
-            load_orders()  # Refresh the list
+            # Guarded status change through the shared writer queue
+            self.db_worker.submit(self.orders.cancel_order, order_id, on_done=on_cancelled)
 
         def delete_selected_order():
             "Hard Deletion of an Order"
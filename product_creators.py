@@ -0,0 +1,49 @@
+import json
+
+
+# user_logs.action written when a product is created (see ProductManagementSystem.create_product)
+CREATE_ACTION = 'CREATE PRODUCT '
+
+UNKNOWN_CREATOR = 'Unknown'
+
+
+def ensure_creator_index(conn):
+    """Index user_logs.action so creator lookups by product are index probes, not scans."""
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'user_logs'").fetchone()
+    if exists:
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_user_logs_action ON user_logs(action)')
+
+
+def _creator_name_sql(conn):
+    # Prefer the user's first name, then username, then the raw user id (as the session does)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(users)')}
+    if 'user_id' not in columns:
+        return 'CAST(l.user_id AS TEXT)', ''
+    names = [f"NULLIF(u.{col}, '')" for col in ('f_name', 'username') if col in columns]
+    return f"COALESCE({', '.join(names + ['CAST(l.user_id AS TEXT)'])})", 'LEFT JOIN users u ON u.user_id = l.user_id'
+
+
+def load_product_creators(conn, product_ids=None):
+    """Return {product_id: creator name} for every product (or only `product_ids`) in one query.
+
+    The creator is the user of the latest 'CREATE PRODUCT <id>' entry in
+    user_logs, joined to users for a display name. Keys are product ids as
+    strings. Replaces one get_product_creator() call per listed product;
+    products with no log entry are missing (show UNKNOWN_CREATOR).
+    """
+    name_sql, join_sql = _creator_name_sql(conn)
+    if product_ids is None:
+        where = "l.action LIKE 'CREATE PRODUCT %'"
+        params = ()
+    else:
+        where = "l.action IN (SELECT ? || value FROM json_each(?))"
+        params = (CREATE_ACTION, json.dumps([str(product_id) for product_id in product_ids]))
+
+    rows = conn.execute(f'''
+        SELECT substr(l.action, {len(CREATE_ACTION) + 1}), {name_sql}
+        FROM user_logs l {join_sql}
+        WHERE {where}
+        ORDER BY l.rowid
+    ''', params).fetchall()
+    # Later log entries win if a product id was ever reused
+    return {product_id: name for product_id, name in rows}
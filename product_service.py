@@ -0,0 +1,55 @@
+from bom import get_product_bom
+from db_pool import write
+from inventory import reserve_materials
+from timestamps import now_text
+
+
+# Writer queue jobs. Each runs in one write transaction and returns (outcome, detail).
+
+def approve_product_job(conn, product_id, user_id, timestamp):
+    """Approve a product and deduct one set of its materials from stock.
+
+    The deduction is a 'product_approval' movement per material, made with
+    the same checked compare-and-swap as order approval. Outcomes:
+    'approved' with the product name; 'not_found'; 'already_approved';
+    'no_materials'; 'insufficient' with the shortages, in which case the
+    product is set back to Pending.
+    """
+    row = conn.execute('SELECT product_name, status_quo FROM products WHERE product_id = ?', (product_id,)).fetchone()
+    if not row:
+        return 'not_found', None
+    product_name, status = row
+    if status == 'Approved':
+        return 'already_approved', product_name
+
+    materials = get_product_bom(conn, product_id)
+    if not materials:
+        return 'no_materials', product_name
+    insufficient = reserve_materials(conn, materials, ref=product_id, kind='product_approval')
+    if insufficient:
+        conn.execute("UPDATE products SET status_quo = 'Pending' WHERE product_id = ?", (product_id,))
+        return 'insufficient', insufficient
+
+    conn.execute("UPDATE products SET status_quo = 'Approved' WHERE product_id = ?", (product_id,))
+    conn.execute('INSERT INTO user_logs (user_id, action, timestamp) VALUES (?, ?, ?)',
+                 (user_id, f'APPROVE PRODUCT {product_id}', timestamp))
+    return 'approved', product_name
+
+
+def cancel_product_job(conn, product_id):
+    """Outcomes: 'cancelled' or 'not_found'."""
+    cur = conn.execute("UPDATE products SET status_quo = 'Cancelled' WHERE product_id = ?", (product_id,))
+    return ('cancelled' if cur.rowcount else 'not_found'), None
+
+
+class ProductService:
+    """Product status changes addressed by product id; see OrderService."""
+
+    def __init__(self, database='main.db'):
+        self.database = database
+
+    def approve_product(self, product_id, user_id, timestamp=None):
+        return write(approve_product_job, product_id, user_id, timestamp or now_text(), database=self.database)
+
+    def cancel_product(self, product_id):
+        return write(cancel_product_job, product_id, database=self.database)
@@ -0,0 +1,231 @@
+from timestamps import manila_to_utc
+
+
+MOVEMENT_KINDS = ('opening', 'receipt', 'order_deduction', 'product_approval', 'adjustment')
+
+# A balance snapshot is written after this many movements of one material,
+# which bounds the rows stock_as_of() has to sum
+SNAPSHOT_EVERY = 500
+
+# Stock columns of the old raw_mats table; both names are served by the view
+STOCK_COLUMNS = ('mat_volume', 'current_stock')
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%f'
+
+
+def ensure_stock_ledger(conn):
+    """Create the inventory ledger and turn raw_mats into a view over it.
+
+    stock_movements is append-only: every receipt, order deduction, product
+    approval and adjustment is one signed row, stamped in UTC by SQLite. A trigger on it keeps
+    stock_balances (current stock and a version per material) up to date and
+    writes a stock_snapshots row every SNAPSHOT_EVERY movements.
+
+    On first run the raw_mats table is split: its descriptive columns move to
+    raw_mat_master and each material's stock becomes an opening movement.
+    raw_mats is then recreated as a view with the same columns, exposing the
+    balance as both mat_volume and current_stock. INSTEAD OF triggers turn
+    inserts, updates and deletes on the view into master rows and
+    movements, so code that still writes raw_mats keeps working and leaves
+    a history.
+    """
+    c = conn.cursor()
+    c.execute(f'''
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            move_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            mat_id INTEGER NOT NULL,
+            kind TEXT NOT NULL CHECK (kind IN {MOVEMENT_KINDS}),
+            qty REAL NOT NULL,
+            ref TEXT,
+            created_at TEXT NOT NULL DEFAULT (strftime('{TIMESTAMP_FORMAT}', 'now'))
+        )
+    ''')
+    c.execute('CREATE INDEX IF NOT EXISTS idx_stock_movements_mat ON stock_movements(mat_id, move_id)')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS stock_balances (
+            mat_id INTEGER PRIMARY KEY,
+            balance REAL NOT NULL DEFAULT 0,
+            version INTEGER NOT NULL DEFAULT 0,
+            last_move_id INTEGER,
+            moves_since_snapshot INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            mat_id INTEGER NOT NULL,
+            move_id INTEGER NOT NULL,
+            taken_at TEXT NOT NULL,
+            balance REAL NOT NULL,
+            PRIMARY KEY (mat_id, move_id)
+        )
+    ''')
+    c.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS stock_movements_ai AFTER INSERT ON stock_movements BEGIN
+            INSERT OR IGNORE INTO stock_balances (mat_id) VALUES (new.mat_id);
+            UPDATE stock_balances
+            SET balance = balance + new.qty, version = version + 1,
+                last_move_id = new.move_id, moves_since_snapshot = moves_since_snapshot + 1
+            WHERE mat_id = new.mat_id;
+            INSERT INTO stock_snapshots (mat_id, move_id, taken_at, balance)
+            SELECT mat_id, new.move_id, new.created_at, balance FROM stock_balances
+            WHERE mat_id = new.mat_id AND moves_since_snapshot >= {SNAPSHOT_EVERY};
+            UPDATE stock_balances SET moves_since_snapshot = 0
+            WHERE mat_id = new.mat_id AND moves_since_snapshot >= {SNAPSHOT_EVERY};
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS stock_movements_no_update BEFORE UPDATE ON stock_movements BEGIN
+            SELECT RAISE(ABORT, 'stock_movements is append-only');
+        END
+    ''')
+    c.execute('''
+        CREATE TRIGGER IF NOT EXISTS stock_movements_no_delete BEFORE DELETE ON stock_movements BEGIN
+            SELECT RAISE(ABORT, 'stock_movements is append-only');
+        END
+    ''')
+
+    raw_mats = c.execute("SELECT type FROM sqlite_master WHERE name = 'raw_mats'").fetchone()
+    if raw_mats and raw_mats[0] == 'table':
+        _migrate_raw_mats(c)
+
+
+def _migrate_raw_mats(c):
+    columns = c.execute('PRAGMA table_info(raw_mats)').fetchall()
+    names = [col[1] for col in columns]
+    stock_col = next((name for name in STOCK_COLUMNS if name in names), None)
+    master = [col for col in columns if col[1] not in STOCK_COLUMNS + ('version',)]
+    master_names = [col[1] for col in master]
+    pk = [col[1] for col in sorted(master, key=lambda col: col[5]) if col[5]]
+
+    definitions = []
+    for _, name, col_type, notnull, default, pk_pos in master:
+        definition = f'"{name}" {col_type}'.strip()
+        if len(pk) == 1 and pk_pos:
+            definition += ' PRIMARY KEY'
+        if notnull:
+            definition += ' NOT NULL'
+        if default is not None:
+            definition += f' DEFAULT {default}'
+        definitions.append(definition)
+    if len(pk) > 1:
+        definitions.append('PRIMARY KEY (' + ', '.join(f'"{name}"' for name in pk) + ')')
+
+    cols = ', '.join(f'"{name}"' for name in master_names)
+    c.execute('SAVEPOINT migrate_raw_mats')
+    try:
+        c.execute(f'CREATE TABLE raw_mat_master ({", ".join(definitions)})')
+        c.execute(f'INSERT INTO raw_mat_master ({cols}) SELECT {cols} FROM raw_mats')
+        if stock_col:
+            c.execute(f'''
+                INSERT INTO stock_movements (mat_id, kind, qty, ref)
+                SELECT mat_id, 'opening', COALESCE("{stock_col}", 0), 'raw_mats' FROM raw_mats
+            ''')
+        c.execute('INSERT OR IGNORE INTO stock_balances (mat_id) SELECT mat_id FROM raw_mat_master')
+        c.execute('DROP TABLE raw_mats')
+
+        # Same columns in the same order as before, plus whichever stock alias was missing
+        view_cols = []
+        for name in names:
+            if name in STOCK_COLUMNS:
+                view_cols.append(f'COALESCE(b.balance, 0) AS "{name}"')
+            elif name == 'version':
+                view_cols.append('COALESCE(b.version, 0) AS version')
+            else:
+                view_cols.append(f'm."{name}"')
+        for name in STOCK_COLUMNS:
+            if name not in names:
+                view_cols.append(f'COALESCE(b.balance, 0) AS "{name}"')
+        if 'version' not in names:
+            view_cols.append('COALESCE(b.version, 0) AS version')
+        c.execute(f'''
+            CREATE VIEW raw_mats AS
+            SELECT {", ".join(view_cols)}
+            FROM raw_mat_master m LEFT JOIN stock_balances b ON b.mat_id = m.mat_id
+        ''')
+
+        new_cols = ', '.join(f'new."{name}"' for name in master_names)
+        set_cols = ', '.join(f'"{name}" = new."{name}"' for name in master_names)
+        c.execute('''
+            CREATE TRIGGER IF NOT EXISTS raw_mat_master_ai AFTER INSERT ON raw_mat_master BEGIN
+                INSERT OR IGNORE INTO stock_balances (mat_id) VALUES (new.mat_id);
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER raw_mats_ii INSTEAD OF INSERT ON raw_mats BEGIN
+                INSERT INTO raw_mat_master ({cols}) VALUES ({new_cols});
+                INSERT INTO stock_movements (mat_id, kind, qty, ref)
+                SELECT m.mat_id, 'receipt', q.qty, 'raw_mats'
+                FROM raw_mat_master m, (SELECT COALESCE(new.mat_volume, new.current_stock, 0) AS qty) q
+                WHERE m.rowid = last_insert_rowid() AND q.qty != 0;
+            END
+        ''')
+        c.execute(f'''
+            CREATE TRIGGER raw_mats_iu INSTEAD OF UPDATE ON raw_mats BEGIN
+                UPDATE raw_mat_master SET {set_cols} WHERE mat_id = old.mat_id;
+                INSERT INTO stock_movements (mat_id, kind, qty, ref)
+                SELECT new.mat_id, 'adjustment', d.qty, 'raw_mats'
+                FROM (SELECT CASE
+                          WHEN new.mat_volume IS NOT old.mat_volume THEN new.mat_volume
+                          WHEN new.current_stock IS NOT old.current_stock THEN new.current_stock
+                          ELSE old.mat_volume
+                      END - old.mat_volume AS qty) d
+                WHERE d.qty != 0;
+            END
+        ''')
+        c.execute('''
+            CREATE TRIGGER raw_mats_id INSTEAD OF DELETE ON raw_mats BEGIN
+                INSERT INTO stock_movements (mat_id, kind, qty, ref)
+                SELECT old.mat_id, 'adjustment', -old.mat_volume, 'deleted' WHERE old.mat_volume != 0;
+                DELETE FROM raw_mat_master WHERE mat_id = old.mat_id;
+            END
+        ''')
+        c.execute('RELEASE migrate_raw_mats')
+    except Exception:
+        c.execute('ROLLBACK TO migrate_raw_mats')
+        c.execute('RELEASE migrate_raw_mats')
+        raise
+
+
+def record_movement(conn, mat_id, kind, qty, ref=None):
+    """Append one signed stock movement; the ledger triggers update the balance."""
+    conn.execute('INSERT INTO stock_movements (mat_id, kind, qty, ref) VALUES (?, ?, ?, ?)',
+                 (mat_id, kind, qty, None if ref is None else str(ref)))
+
+
+def current_stock(conn, mat_id):
+    """Current balance of one material: a single primary-key lookup."""
+    row = conn.execute('SELECT balance FROM stock_balances WHERE mat_id = ?', (mat_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def stock_as_of(conn, mat_id, when):
+    """Balance of one material at `when`.
+
+    `when` is read like every other date the app stores: a naive datetime
+    or 'YYYY-MM-DD[ HH:MM:SS]' string is Manila wall-clock time (aware
+    datetimes are taken as they are). It is converted to UTC before being
+    compared with the ledger's created_at. Starts from the latest snapshot
+    taken at or before `when` and adds the movements after it, stopping at
+    the next snapshot, so at most SNAPSHOT_EVERY rows are summed however
+    long the history is.
+    """
+    when = manila_to_utc(when).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+    snapshot = conn.execute('''
+        SELECT move_id, balance FROM stock_snapshots
+        WHERE mat_id = ? AND taken_at <= ?
+        ORDER BY move_id DESC LIMIT 1
+    ''', (mat_id, when)).fetchone()
+    start_move, balance = snapshot or (0, 0)
+    next_move = conn.execute('SELECT MIN(move_id) FROM stock_snapshots WHERE mat_id = ? AND move_id > ?',
+                             (mat_id, start_move)).fetchone()[0]
+
+    query = '''
+        SELECT COALESCE(SUM(qty), 0) FROM stock_movements
+        WHERE mat_id = ? AND move_id > ? AND created_at <= ?
+    '''
+    params = [mat_id, start_move, when]
+    if next_move is not None:
+        query += ' AND move_id < ?'
+        params.append(next_move)
+    return balance + conn.execute(query, params).fetchone()[0]
@@ -0,0 +1,102 @@
+import json
+import sqlite3
+
+import exports
+from db_pool import connect
+from exports import IncrementalJsonExport, load_order_totals
+
+
+def build_database(path, n_orders):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE orders (order_id INTEGER PRIMARY KEY, mats_need TEXT)')
+    conn.execute('CREATE TABLE products (product_id TEXT PRIMARY KEY, product_name TEXT, materials TEXT)')
+    conn.executemany('INSERT INTO orders VALUES (?, ?)',
+                     ((i, json.dumps({'Steel': float(i)})) for i in range(1, n_orders + 1)))
+    conn.commit()
+    conn.close()
+
+
+def read_export(path):
+    with open(path) as f:
+        return {record['order_id']: record['mats_need'] for record in json.load(f)}
+
+
+def test_patch_matches_rebuild(tmp_path):
+    database, path = str(tmp_path / 'main.db'), str(tmp_path / 'order_mats_ttl.json')
+    build_database(database, 5)
+    export = IncrementalJsonExport(database, path, 'orders', 'order_id', load_order_totals)
+    export.refresh()
+
+    conn = connect(database)
+    conn.execute('UPDATE orders SET mats_need = ? WHERE order_id = 3', (json.dumps({'Bolt': 9.0}),))
+    conn.execute('DELETE FROM orders WHERE order_id = 4')
+    conn.commit()
+    conn.close()
+
+    assert export.refresh() == 2
+    with open(path) as f:
+        patched = f.read()
+    export.rebuild()
+    with open(path) as f:
+        assert f.read() == patched
+    assert read_export(path)[3] == {'Bolt': 9.0}
+    assert 4 not in read_export(path)
+
+
+def test_change_committed_between_reads_is_not_lost(tmp_path, monkeypatch):
+    database, path = str(tmp_path / 'main.db'), str(tmp_path / 'order_mats_ttl.json')
+    build_database(database, 3)
+    export = IncrementalJsonExport(database, path, 'orders', 'order_id', load_order_totals)
+    export.refresh()
+
+    # Touch order 1 so the next refresh has work to do
+    conn = connect(database)
+    conn.execute('UPDATE orders SET mats_need = ? WHERE order_id = 1', (json.dumps({'Steel': 10.0}),))
+    conn.commit()
+    conn.close()
+
+    class FetchedRows(list):
+        def fetchall(self):
+            return list(self)
+
+    class RacingConnection:
+        """Reader that lets another terminal commit right after the change rows are read."""
+
+        def __init__(self, conn):
+            self._conn = conn
+            self.raced = False
+
+        def __getattr__(self, name):
+            return getattr(self._conn, name)
+
+        def execute(self, sql, *args):
+            cursor = self._conn.execute(sql, *args)
+            if 'WHERE entity' in sql and not self.raced:
+                self.raced = True
+                rows = cursor.fetchall()
+                other = sqlite3.connect(database)
+                other.execute('UPDATE orders SET mats_need = ? WHERE order_id = 2', (json.dumps({'Steel': 20.0}),))
+                other.commit()
+                other.close()
+                return FetchedRows(rows)
+            return cursor
+
+    real_connect = exports.connect
+    racing = []
+
+    def racing_connect(database, readonly=False):
+        conn = real_connect(database, readonly=readonly)
+        if readonly and not racing:
+            racing.append(RacingConnection(conn))
+            return racing[0]
+        return conn
+
+    monkeypatch.setattr(exports, 'connect', racing_connect)
+    export.refresh()
+    monkeypatch.setattr(exports, 'connect', real_connect)
+    assert racing and racing[0].raced
+
+    export.refresh()
+    records = read_export(path)
+    assert records[1] == {'Steel': 10.0}
+    assert records[2] == {'Steel': 20.0}
@@ -0,0 +1,36 @@
+import pandas as pd
+
+from mrp import plan
+
+
+def make_inputs(order_lines, stock):
+    lines = pd.DataFrame([(order_id, name, qty, True) for order_id, name, qty in order_lines],
+                         columns=['order_id', 'mat_name', 'qty', 'pending'])
+    unrecorded = pd.DataFrame(columns=['order_id', 'product_id', 'quantity', 'pending'])
+    boms = pd.DataFrame(columns=['product_id', 'mat_name', 'qty'])
+    stock = pd.DataFrame(list(stock.items()), columns=['mat_name', 'on_hand'])
+    return lines, unrecorded, boms, stock
+
+
+def first_short(result, name):
+    return {row[0]: row[7] for row in result.rows()}[name]
+
+
+def test_smaller_order_fits_after_larger_one_is_skipped():
+    result = plan(*make_inputs([(1, 'Steel', 8), (2, 'Steel', 5), (3, 'Steel', 2)], {'Steel': 10}))
+    assert result.short_orders == [2]
+    assert first_short(result, 'Steel') == 2
+
+
+def test_skipped_order_takes_none_of_its_other_materials():
+    # Order 1 is short on Bolt, so its Steel stays available for order 2
+    result = plan(*make_inputs([(1, 'Steel', 6), (1, 'Bolt', 3), (2, 'Steel', 6)], {'Steel': 6, 'Bolt': 1}))
+    assert result.short_orders == [1]
+    assert first_short(result, 'Bolt') == 1
+    assert first_short(result, 'Steel') is None
+
+
+def test_nothing_short_when_everything_fits():
+    result = plan(*make_inputs([(1, 'Steel', 4), (2, 'Steel', 6)], {'Steel': 10}))
+    assert result.short_orders == []
+    assert first_short(result, 'Steel') is None
@@ -0,0 +1,127 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+
+# table -> (legacy text column, canonical epoch column)
+TIMESTAMP_COLUMNS = {
+    'orders': ('order_date', 'order_ts'),
+    'products': ('created_date', 'created_ts'),
+    'order_history': ('timestamp', 'changed_ts'),
+}
+
+DISPLAY_FORMAT = '%m/%d/%Y'
+STORED_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Other formats accepted when converting old rows (SQLite reads the ISO ones itself)
+LEGACY_FORMATS = ('%m/%d/%Y %H:%M:%S', '%m/%d/%Y')
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def ensure_timestamp_columns(conn):
+    """Add an indexed integer timestamp next to each text date column and keep it filled.
+
+    The *_ts columns hold the stored wall-clock time (Manila time, as the
+    pages write it) as seconds since 1970-01-01, i.e. what SQLite's
+    strftime('%s', text) gives. They sort and compare as integers, so date
+    filters are index range scans. Existing rows are converted in SQL; the
+    few values in formats SQLite cannot read are parsed once here. Triggers
+    fill the column for rows written later, so writers keep setting only
+    the text column.
+    """
+    for table, (text_col, ts_col) in TIMESTAMP_COLUMNS.items():
+        columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+        if text_col not in columns:
+            continue
+        if ts_col not in columns:
+            conn.execute(f'ALTER TABLE {table} ADD COLUMN {ts_col} INTEGER')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{ts_col} ON {table}({ts_col})')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_{ts_col}_ai AFTER INSERT ON {table} WHEN new.{ts_col} IS NULL BEGIN
+                UPDATE {table} SET {ts_col} = CAST(strftime('%s', new.{text_col}) AS INTEGER) WHERE rowid = new.rowid;
+            END
+        ''')
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_{ts_col}_au AFTER UPDATE OF {text_col} ON {table} BEGIN
+                UPDATE {table} SET {ts_col} = CAST(strftime('%s', new.{text_col}) AS INTEGER) WHERE rowid = new.rowid;
+            END
+        ''')
+        _backfill(conn, table, text_col, ts_col)
+
+
+def _backfill(conn, table, text_col, ts_col):
+    conn.execute(f'''
+        UPDATE {table} SET {ts_col} = CAST(strftime('%s', {text_col}) AS INTEGER)
+        WHERE {ts_col} IS NULL AND {text_col} IS NOT NULL
+    ''')
+    leftovers = conn.execute(f'''
+        SELECT rowid, {text_col} FROM {table}
+        WHERE {ts_col} IS NULL AND {text_col} IS NOT NULL AND {text_col} != ''
+    ''').fetchall()
+    updates = [(ts, rowid) for rowid, value in leftovers if (ts := _parse_legacy(value)) is not None]
+    if updates:
+        conn.executemany(f'UPDATE {table} SET {ts_col} = ? WHERE rowid = ?', updates)
+
+
+def _parse_legacy(value):
+    for fmt in LEGACY_FORMATS:
+        try:
+            return to_epoch(datetime.strptime(str(value).strip(), fmt))
+        except ValueError:
+            continue
+    return None
+
+
+def now_text():
+    """The current Manila wall-clock time, formatted as the pages store it."""
+    import pytz
+    return datetime.now(pytz.timezone('Asia/Manila')).strftime(STORED_FORMAT)
+
+
+def manila_to_utc(when):
+    """A stored Manila wall-clock time (naive datetime or 'YYYY-MM-DD[ HH:MM:SS]') as an aware UTC datetime.
+
+    Aware datetimes are only converted to UTC.
+    """
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when.strip())
+    if when.tzinfo is None:
+        import pytz
+        when = pytz.timezone('Asia/Manila').localize(when)
+    return when.astimezone(timezone.utc)
+
+
+def to_epoch(when):
+    """Seconds since 1970 for a naive wall-clock datetime, or a 'YYYY-MM-DD[ HH:MM:SS]' string."""
+    if isinstance(when, str):
+        when = datetime.fromisoformat(when.strip())
+    return int((when.replace(tzinfo=timezone.utc) - _EPOCH).total_seconds())
+
+
+def day_bounds(date_from=None, date_to=None):
+    """[start, end) epoch bounds for inclusive 'YYYY-MM-DD' days; either side may be None."""
+    start = to_epoch(date_from[:10]) if date_from else None
+    end = to_epoch(date_to[:10]) + 86400 if date_to else None
+    return start, end
+
+
+@lru_cache(maxsize=4096)
+def _format_day(day):
+    return (_EPOCH + timedelta(days=day)).strftime(DISPLAY_FORMAT)
+
+
+def format_date(value, default='N/A'):
+    """Render an epoch timestamp or a stored date string as MM/DD/YYYY.
+
+    Epoch values and canonical 'YYYY-MM-DD...' strings are converted
+    without strptime, and each distinct day is formatted once. Anything
+    else is returned unchanged, as the lists did before.
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, (int, float)):
+        return _format_day(int(value) // 86400)
+    text = str(value)
+    if len(text) >= 10 and text[4] == '-' and text[7] == '-' and text[:4].isdigit():
+        return f'{text[5:7]}/{text[8:10]}/{text[:4]}'
+    return text